@@ -1,51 +1,140 @@
 """
 API 客户端 - 支持会话复用和连接池管理
 """
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from urllib3.exceptions import NewConnectionError
 import config
+from circuit_breaker import get_breaker
+from metrics import get_metrics
+from models import decode_response
+from rate_governor import RateLimited, get_governor
+from retry_policy import DeadlineExceeded, hedge_delay, parse_retry_after, policy_for
+from warmth import mark_active
+
+
+LOGIN_ENDPOINT = "/user/login"
+
+
+def is_token_expired(data: dict) -> bool:
+    """
+    检查 token 是否失效
+
+    Args:
+        data: 接口返回的完整数据
+
+    Returns:
+        bool: token 是否失效
+    """
+    return (
+        isinstance(data, dict)
+        and data.get("errCode") == 100007
+        and "Invalid credentials used or login expired" in data.get("errCodeDes", "")
+    )
+
+
+def create_session(pool_connections=10, pool_maxsize=20) -> requests.Session:
+    """
+    创建带连接池的会话，可在多个 APIClient 之间共享
+
+    重试不在连接池层面进行，而是由 APIClient 按端点的 RetryPolicy 在截止时间内完成
+
+    Args:
+        pool_connections: 连接池中的连接数
+        pool_maxsize: 连接池最大大小
+
+    Returns:
+        requests.Session: 配置好的会话
+    """
+    session = requests.Session()
+    
+    # 配置适配器（不做自动重试）
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=0
+    )
+    
+    # 为 http 和 https 都配置适配器
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    
+    # 设置通用请求头
+    session.headers.update(config.COMMON_HEADERS)
+    
+    # 禁用 SSL 验证
+    session.verify = False
+
+    return session
+
+
+def is_unsent_error(error: Exception) -> bool:
+    """
+    判断请求异常是否发生在请求发出之前（连接未建立），此时重试非幂等请求也是安全的
+
+    Args:
+        error: requests 抛出的异常
+
+    Returns:
+        bool: 请求是否确定未被服务端收到
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+def status_error(response, url: str) -> requests.exceptions.HTTPError:
+    """
+    构造 HTTP 状态码错误（与传输实现无关，response 只需提供 status_code）
+
+    Args:
+        response: HTTP 响应
+        url: 请求地址
+
+    Returns:
+        requests.exceptions.HTTPError: 状态码错误
+    """
+    return requests.exceptions.HTTPError(f"{response.status_code} Error for url: {url}", response=response)
 
 
 class APIClient:
     """API 客户端，管理会话和连接池"""
     
-    def __init__(self, pool_connections=10, pool_maxsize=20, max_retries=3):
+    def __init__(self, pool_connections=10, pool_maxsize=20, session: requests.Session = None, policies: dict = None):
         """
         初始化 API 客户端
         
         Args:
             pool_connections: 连接池中的连接数
             pool_maxsize: 连接池最大大小
-            max_retries: 最大重试次数
+            session: 可选的共享会话（多账号共用连接池），传入时不会在 close 时关闭
+            policies: 可选的端点 -> RetryPolicy 表，覆盖 retry_policy.DEFAULT_POLICIES
         """
-        self.session = requests.Session()
+        self._owns_session = session is None
+        if session is None:
+            session = create_session(pool_connections, pool_maxsize)
+        self.session = session
+        self.policies = policies
+        # 进程内所有客户端共享的请求限流器
+        self.governor = get_governor()
+        # 对冲读使用的线程池（首次需要时创建）
+        self._hedge_pool = None
+        # 预构建的请求模板 (method, url) -> (PreparedRequest, send 参数)，token 变化时清空
+        self._templates = {}
         self.token = None
-        
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=max_retries,
-            backoff_factor=1,  # 重试间隔: 1s, 2s, 4s...
-            status_forcelist=[429, 500, 502, 503, 504],  # 这些状态码会重试
-            allowed_methods=["HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE"]
-        )
-        
-        # 配置适配器
-        adapter = HTTPAdapter(
-            pool_connections=pool_connections,
-            pool_maxsize=pool_maxsize,
-            max_retries=retry_strategy
-        )
-        
-        # 为 http 和 https 都配置适配器
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
-        
-        # 设置通用请求头
-        self.session.headers.update(config.COMMON_HEADERS)
-        
-        # 禁用 SSL 验证
-        self.session.verify = False
+        # 账号级请求头（token 等），不写入可能被共享的会话
+        self.headers = {}
+        # 登录凭据，用于 token 失效时自动重新登录
+        self.email = None
+        self.password = None
+        self.token_cache = None
+        self._reauth_lock = threading.Lock()
     
     def set_token(self, token: str):
         """
@@ -55,64 +144,288 @@ class APIClient:
             token: 认证 token
         """
         self.token = token
-        self.session.headers.update({"app-login-token": token})
+        self.headers["app-login-token"] = token
+        self._templates.clear()
     
     def clear_token(self):
         """清除认证 token"""
         self.token = None
-        if "app-login-token" in self.session.headers:
-            del self.session.headers["app-login-token"]
+        self.headers.pop("app-login-token", None)
+        self._templates.clear()
+    
+    def set_credentials(self, email: str, password: str, cache=None):
+        """
+        设置登录凭据；设置后遇到 token 失效响应时，客户端会自动重新登录并重放原请求
+        
+        Args:
+            email: 登录邮箱
+            password: 登录密码
+            cache: 可选的 TokenCache，默认使用全局缓存
+        """
+        self.email = email
+        self.password = password
+        self.token_cache = cache
+    
+    def reauthenticate(self, stale_token: str | None):
+        """
+        重新登录（单飞：多个线程同时发现 token 失效时只登录一次）
+        
+        Args:
+            stale_token: 发现失效时请求所使用的 token
+        """
+        from token_cache import get_cache, login
+        
+        with self._reauth_lock:
+            if self.token != stale_token:
+                return  # 其他线程（或后台刷新）已换上新 token
+            cache = self.token_cache or get_cache()
+            cache.mark_expired(self.email, stale_token)
+            print("Token 已失效，重新登录...")
+            token = login(self.email, self.password, client=self, cache=cache, force=True)
+            print(f"重新登录成功: {token[:10]}...")
+    
+    def _template(self, method: str, url: str) -> tuple:
+        """获取（必要时构建）请求模板：合并后的请求头、cookie 和 send 参数只计算一次"""
+        template = self._templates.get((method, url))
+        if template is None:
+            request = self.session.prepare_request(requests.Request(method, url, headers=self.headers))
+            settings = self.session.merge_environment_settings(url, {}, None, None, None)
+            template = self._templates[(method, url)] = (request, settings)
+        return template
+    
+    def prepare(self, method: str, endpoint: str):
+        """
+        预先构建端点的请求模板，把构建开销移出跟单路径（token 变化后首次发送时自动重建）
+        
+        Args:
+            method: HTTP 方法
+            endpoint: API 端点路径
+        """
+        self._template(method, f"{config.BASE_URL}{endpoint}")
+    
+    def _send(
+        self, method: str, url: str, timeout: float, headers: dict = None, body: bytes = None, **kwargs
+    ) -> requests.Response:
+        """
+        发送一次 HTTP 请求（不重试），headers 为叠加在客户端请求头上的额外请求头
+        
+        传入预编码的 body 时走快速通道：复制请求模板并替换请求体，跳过请求头合并和 JSON 序列化。
+        """
+        if body is not None and not headers and not kwargs:
+            template, settings = self._template(method, url)
+            request = template.copy()
+            request.body = body
+            request.headers["Content-Length"] = str(len(body))
+            return self.session.send(request, timeout=timeout, **settings)
+        headers = {**self.headers, **headers} if headers else self.headers
+        if body is not None:
+            kwargs["data"] = body
+        return self.session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+    
+    def _send_timed(self, endpoint: str, method: str, url: str, timeout: float, **kwargs) -> requests.Response:
+        """发送一次请求并记录单次发送的耗时（对冲的两个请求各自记录，超时按已等待的时长记录）"""
+        sent_at = time.perf_counter()
+        try:
+            response = self._send(method, url, timeout, **kwargs)
+        except requests.exceptions.Timeout:
+            get_metrics().observe_attempt(endpoint, time.perf_counter() - sent_at)
+            raise
+        get_metrics().observe_attempt(endpoint, time.perf_counter() - sent_at)
+        return response
+    
+    def _is_unsent_error(self, error: Exception) -> bool:
+        """判断异常发生时请求是否确定未发出（非幂等请求据此决定能否重试）"""
+        return is_unsent_error(error)
+    
+    def _send_hedged(self, policy, endpoint: str, method: str, url: str, timeout: float, **kwargs) -> tuple:
+        """
+        对冲读：首次请求超过单次发送的已观测 p95 仍未返回时再并发发送一次，取先成功的响应
+        
+        Returns:
+            tuple: (响应, 实际发送的请求数)
+        """
+        delay = hedge_delay(policy, get_metrics().attempt_p95(endpoint))
+        if delay >= timeout:
+            return self._send_timed(endpoint, method, url, timeout, **kwargs), 1
+        
+        if self._hedge_pool is None:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="api-hedge")
+        started = time.perf_counter()
+        primary = self._hedge_pool.submit(self._send_timed, endpoint, method, url, timeout, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result(), 1
+        if self.governor.acquire_delay(endpoint, self.email):
+            # 没有空余的请求配额时不对冲
+            return primary.result(), 1
+        
+        hedge = self._hedge_pool.submit(
+            self._send_timed, endpoint, method, url, timeout - (time.perf_counter() - started), **kwargs
+        )
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 释放落后请求占用的连接
+                    for loser in pending:
+                        loser.add_done_callback(lambda f: f.exception() is None and f.result().close())
+                    return future.result(), 2
+                error = future.exception()
+        raise error
+    
+    def _request(self, method: str, endpoint: str, timeout: float = None, decode=None, **kwargs):
+        """
+        在端点重试策略的截止时间内发送请求并返回 JSON 数据，同时记录延迟、重试次数和错误类型
+        
+        Args:
+            method: HTTP 方法
+            endpoint: API 端点路径
+            timeout: 单次尝试的超时上限（秒，可选），不超过策略的 attempt_timeout
+            decode: 可选的响应解码函数 decode(response)，默认解析 JSON
+        """
+        policy = policy_for(endpoint, self.policies)
+        url = f"{config.BASE_URL}{endpoint}"
+        attempt_timeout = min(policy.attempt_timeout, timeout) if timeout else policy.attempt_timeout
+        breaker = get_breaker(endpoint)
+        
+        started = time.perf_counter()
+        deadline = started + policy.deadline
+        attempts = 0
+        error = None
+        try:
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining < policy.min_attempt_time:
+                    raise DeadlineExceeded(f"{endpoint} 在 {policy.deadline}s 内未完成（已尝试 {attempts} 次）")
+                # 熔断器打开时快速失败，不占用请求配额
+                breaker.before_call()
+                # 按端点和账号的令牌桶等待请求配额（跟单优先于轮询和余额查询），取得后仍要留出一次尝试的时间
+                if not self.governor.acquire(endpoint, self.email, remaining - policy.min_attempt_time):
+                    limited = RateLimited(f"{endpoint} 在截止时间内未取得请求配额（已尝试 {attempts} 次）")
+                    # 释放半开状态的探测名额
+                    breaker.record(0.0, limited)
+                    raise limited
+                remaining = deadline - time.perf_counter()
+                sent_at = time.perf_counter()
+                # 连接池有真实请求时不需要保活探测
+                mark_active(self.session)
+                
+                retry_after = None
+                try:
+                    if policy.hedge:
+                        response, sent = self._send_hedged(
+                            policy, endpoint, method, url, min(attempt_timeout, remaining), **kwargs
+                        )
+                    else:
+                        response = self._send_timed(endpoint, method, url, min(attempt_timeout, remaining), **kwargs)
+                        sent = 1
+                    attempts += sent
+                except requests.exceptions.RequestException as e:
+                    breaker.record(time.perf_counter() - sent_at, e)
+                    attempts += 1
+                    retryable = policy.idempotent or self._is_unsent_error(e)
+                    if not retryable or attempts >= policy.max_attempts:
+                        raise
+                    last_error = e
+                else:
+                    breaker.record(time.perf_counter() - sent_at, status=response.status_code)
+                    self.governor.observe(endpoint, self.email, response.status_code)
+                    if not policy.should_retry_status(response.status_code) or attempts >= policy.max_attempts:
+                        if response.status_code >= 400:
+                            raise status_error(response, url)
+                        data = (decode or decode_response)(response)
+                        if is_token_expired(data):
+                            error = "TokenExpired"
+                        return data
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    last_error = status_error(response, url)
+                    response.close()
+                
+                # 退避后已没有时间再尝试一次时，直接返回最后一次的错误
+                delay = policy.backoff_delay(attempts, retry_after)
+                if time.perf_counter() + delay + policy.min_attempt_time > deadline:
+                    raise last_error
+                time.sleep(delay)
+        except requests.exceptions.HTTPError as e:
+            error = f"HTTP{e.response.status_code}"
+            raise
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            get_metrics().observe_request(endpoint, time.perf_counter() - started, max(0, attempts - 1), error)
     
-    def post(self, endpoint: str, json_data: dict = None, timeout: int = 30) -> dict:
+    def _call(self, method: str, endpoint: str, timeout: float = None, decode=None, **kwargs):
+        """发送请求；token 失效时重新登录一次并透明地重放原请求"""
+        token = self.token
+        data = self._request(method, endpoint, timeout, decode, **kwargs)
+        
+        if self.email and endpoint != LOGIN_ENDPOINT and is_token_expired(data):
+            self.reauthenticate(token)
+            data = self._request(method, endpoint, timeout, decode, **kwargs)
+        
+        return data
+    
+    def post(
+        self,
+        endpoint: str,
+        json_data: dict = None,
+        timeout: float = None,
+        headers: dict = None,
+        decode=None,
+        body: bytes = None,
+    ):
         """
         发送 POST 请求
         
         Args:
             endpoint: API 端点路径 (例如: /user/login)
             json_data: JSON 数据
-            timeout: 请求超时时间（秒）
+            timeout: 单次尝试的超时上限（秒，可选），默认由端点的 RetryPolicy 决定
+            headers: 额外的请求头（可选，例如条件请求的 If-None-Match）
+            decode: 可选的响应解码函数 decode(response)，默认解析 JSON
+            body: 预编码的 JSON 请求体（可选，传入时忽略 json_data，使用预构建的请求模板发送）
         
         Returns:
-            dict: 响应的 JSON 数据
+            dict: 响应的 JSON 数据（传入 decode 时为其返回值）
         
         Raises:
             requests.exceptions.RequestException: 请求失败
+            DeadlineExceeded: 未能在端点的截止时间内完成
         """
-        url = f"{config.BASE_URL}{endpoint}"
-        
+        if body is not None:
+            return self._call("POST", endpoint, timeout, decode, body=body, headers=headers)
         if json_data is None:
             json_data = {}
         
-        response = self.session.post(url, json=json_data, timeout=timeout)
-        response.raise_for_status()
-        
-        return response.json()
+        return self._call("POST", endpoint, timeout, decode, json=json_data, headers=headers)
     
-    def get(self, endpoint: str, params: dict = None, timeout: int = 30) -> dict:
+    def get(self, endpoint: str, params: dict = None, timeout: float = None) -> dict:
         """
         发送 GET 请求
         
         Args:
             endpoint: API 端点路径
             params: URL 参数
-            timeout: 请求超时时间（秒）
+            timeout: 单次尝试的超时上限（秒，可选），默认由端点的 RetryPolicy 决定
         
         Returns:
             dict: 响应的 JSON 数据
         
         Raises:
             requests.exceptions.RequestException: 请求失败
+            DeadlineExceeded: 未能在端点的截止时间内完成
         """
-        url = f"{config.BASE_URL}{endpoint}"
-        
-        response = self.session.get(url, params=params, timeout=timeout)
-        response.raise_for_status()
-        
-        return response.json()
+        return self._call("GET", endpoint, timeout, params=params)
     
     def close(self):
-        """关闭会话，释放连接"""
-        self.session.close()
+        """关闭会话，释放连接（共享会话由创建者负责关闭）"""
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        if self._owns_session:
+            self.session.close()
     
     def __enter__(self):
         """支持上下文管理器"""
@@ -123,6 +436,39 @@ class APIClient:
         self.close()
 
 
+def create_client(session=None, **kwargs) -> APIClient:
+    """
+    按 config.HTTP_TRANSPORT 创建 API 客户端
+
+    Args:
+        session: 可选的共享会话，须由 create_shared_session 创建
+        **kwargs: 传给客户端构造函数的其他参数
+
+    Returns:
+        APIClient: http1 时为 APIClient，http2 时为 HTTP2APIClient
+    """
+    if config.HTTP_TRANSPORT == "http2":
+        from http2_client import HTTP2APIClient
+        return HTTP2APIClient(session=session, **kwargs)
+    return APIClient(session=session, **kwargs)
+
+
+def create_shared_session(pool_size: int):
+    """
+    按 config.HTTP_TRANSPORT 创建可在多个客户端之间共享的会话
+
+    Args:
+        pool_size: 连接池大小
+
+    Returns:
+        requests.Session | httpx.Client: 共享会话（两者都提供 close()）
+    """
+    if config.HTTP_TRANSPORT == "http2":
+        from http2_client import create_http2_session
+        return create_http2_session(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return create_session(pool_maxsize=pool_size)
+
+
 # 全局客户端实例（单例模式）
 _global_client = None
 
@@ -136,7 +482,7 @@ def get_client() -> APIClient:
     """
     global _global_client
     if _global_client is None:
-        _global_client = APIClient()
+        _global_client = create_client()
     return _global_client
 
 
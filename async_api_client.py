@@ -0,0 +1,347 @@
+"""
+异步 API 客户端 - 基于 httpx.AsyncClient 的会话复用与连接池管理
+"""
+import asyncio
+import time
+
+import httpx
+import config
+from circuit_breaker import get_breaker
+from api_client import LOGIN_ENDPOINT, is_token_expired
+from metrics import get_metrics
+from models import decode_response
+from rate_governor import RateLimited, get_governor
+from retry_policy import DeadlineExceeded, hedge_delay, parse_retry_after, policy_for
+from warmth import mark_active
+
+
+def create_async_session(max_connections=20, max_keepalive_connections=10) -> httpx.AsyncClient:
+    """
+    创建带连接池的异步会话，可在多个 AsyncAPIClient 之间共享
+
+    重试不在传输层进行，而是由 AsyncAPIClient 按端点的 RetryPolicy 在截止时间内完成
+
+    Args:
+        max_connections: 连接池最大连接数
+        max_keepalive_connections: 保持活跃的空闲连接数
+
+    Returns:
+        httpx.AsyncClient: 配置好的异步会话
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+    )
+    transport = httpx.AsyncHTTPTransport(verify=False, limits=limits)
+
+    # httpx 不接受值为 None 的请求头（requests 会自动忽略）
+    headers = {k: v for k, v in config.COMMON_HEADERS.items() if v is not None}
+
+    return httpx.AsyncClient(
+        transport=transport,
+        headers=headers,
+        verify=False,
+    )
+
+
+class AsyncAPIClient:
+    """异步 API 客户端，接口与 APIClient 保持一致"""
+
+    def __init__(
+        self,
+        max_connections=20,
+        max_keepalive_connections=10,
+        session: httpx.AsyncClient = None,
+        policies: dict = None,
+    ):
+        """
+        初始化异步 API 客户端
+
+        Args:
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 保持活跃的空闲连接数
+            session: 可选的共享会话（多账号共用连接池），传入时不会在 close 时关闭
+            policies: 可选的端点 -> RetryPolicy 表，覆盖 retry_policy.DEFAULT_POLICIES
+        """
+        self._owns_session = session is None
+        if session is None:
+            session = create_async_session(max_connections, max_keepalive_connections)
+        self.session = session
+        self.policies = policies
+        # 进程内所有客户端共享的请求限流器
+        self.governor = get_governor()
+        self.token = None
+        # 账号级请求头（token 等），不写入可能被共享的会话
+        self.headers = {}
+        # 登录凭据，用于 token 失效时自动重新登录
+        self.email = None
+        self.password = None
+        self.token_cache = None
+        self._reauth_lock = asyncio.Lock()
+
+    def set_token(self, token: str):
+        """
+        设置认证 token
+
+        Args:
+            token: 认证 token
+        """
+        self.token = token
+        self.headers["app-login-token"] = token
+
+    def clear_token(self):
+        """清除认证 token"""
+        self.token = None
+        self.headers.pop("app-login-token", None)
+
+    def set_credentials(self, email: str, password: str, cache=None):
+        """
+        设置登录凭据；设置后遇到 token 失效响应时，客户端会自动重新登录并重放原请求
+
+        Args:
+            email: 登录邮箱
+            password: 登录密码
+            cache: 可选的 TokenCache，默认使用全局缓存
+        """
+        self.email = email
+        self.password = password
+        self.token_cache = cache
+
+    async def reauthenticate(self, stale_token: str | None):
+        """
+        重新登录（单飞：多个任务同时发现 token 失效时只登录一次）
+
+        Args:
+            stale_token: 发现失效时请求所使用的 token
+        """
+        from token_cache import async_login, get_cache
+
+        async with self._reauth_lock:
+            if self.token != stale_token:
+                return  # 其他任务（或后台刷新）已换上新 token
+            cache = self.token_cache or get_cache()
+            await asyncio.to_thread(cache.mark_expired, self.email, stale_token)
+            print("Token 已失效，重新登录...")
+            token = await async_login(self.email, self.password, self, cache=cache, force=True)
+            print(f"重新登录成功: {token[:10]}...")
+
+    async def _send(
+        self, method: str, url: str, timeout: float, headers: dict = None, body: bytes = None, **kwargs
+    ) -> httpx.Response:
+        """发送一次 HTTP 请求（不重试），headers 为叠加在客户端请求头上的额外请求头，body 为预编码的请求体"""
+        headers = {**self.headers, **headers} if headers else self.headers
+        if body is not None:
+            kwargs["content"] = body
+        return await self.session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+
+    async def _send_timed(self, endpoint: str, method: str, url: str, timeout: float, **kwargs) -> httpx.Response:
+        """
+        发送一次请求并记录单次发送的耗时
+
+        超时或被取消（对冲中落后的请求）时按已等待的时长记录，它是实际耗时的下界，避免 p95 被低估。
+        """
+        sent_at = time.perf_counter()
+        try:
+            response = await self._send(method, url, timeout, **kwargs)
+        except (httpx.TimeoutException, asyncio.CancelledError):
+            get_metrics().observe_attempt(endpoint, time.perf_counter() - sent_at)
+            raise
+        get_metrics().observe_attempt(endpoint, time.perf_counter() - sent_at)
+        return response
+
+    async def _send_hedged(self, policy, endpoint: str, method: str, url: str, timeout: float, **kwargs) -> tuple:
+        """
+        对冲读：首次请求超过单次发送的已观测 p95 仍未返回时再并发发送一次，取先成功的响应
+
+        Returns:
+            tuple: (响应, 实际发送的请求数)
+        """
+        delay = hedge_delay(policy, get_metrics().attempt_p95(endpoint))
+        if delay >= timeout:
+            return await self._send_timed(endpoint, method, url, timeout, **kwargs), 1
+
+        primary = asyncio.create_task(self._send_timed(endpoint, method, url, timeout, **kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result(), 1
+        if await self.governor.aacquire_delay(endpoint, self.email):
+            # 没有空余的请求配额时不对冲
+            return await primary, 1
+
+        hedge = asyncio.create_task(self._send_timed(endpoint, method, url, timeout - delay, **kwargs))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), 2
+                    error = task.exception()
+            raise error
+        finally:
+            # 取消落后的请求，释放连接
+            for task in pending:
+                task.cancel()
+
+    async def _request(self, method: str, endpoint: str, timeout: float = None, decode=None, **kwargs):
+        """
+        在端点重试策略的截止时间内发送请求并返回 JSON 数据，同时记录延迟、重试次数和错误类型
+
+        Args:
+            method: HTTP 方法
+            endpoint: API 端点路径
+            timeout: 单次尝试的超时上限（秒，可选），不超过策略的 attempt_timeout
+            decode: 可选的响应解码函数 decode(response)，默认解析 JSON
+        """
+        policy = policy_for(endpoint, self.policies)
+        url = f"{config.BASE_URL}{endpoint}"
+        attempt_timeout = min(policy.attempt_timeout, timeout) if timeout else policy.attempt_timeout
+        breaker = get_breaker(endpoint)
+
+        started = time.perf_counter()
+        deadline = started + policy.deadline
+        attempts = 0
+        error = None
+        try:
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining < policy.min_attempt_time:
+                    raise DeadlineExceeded(f"{endpoint} 在 {policy.deadline}s 内未完成（已尝试 {attempts} 次）")
+                # 熔断器打开时快速失败，不占用请求配额
+                breaker.before_call()
+                # 按端点和账号的令牌桶等待请求配额（跟单优先于轮询和余额查询），取得后仍要留出一次尝试的时间
+                if not await self.governor.aacquire(endpoint, self.email, remaining - policy.min_attempt_time):
+                    limited = RateLimited(f"{endpoint} 在截止时间内未取得请求配额（已尝试 {attempts} 次）")
+                    # 释放半开状态的探测名额
+                    breaker.record(0.0, limited)
+                    raise limited
+                remaining = deadline - time.perf_counter()
+                sent_at = time.perf_counter()
+                # 连接池有真实请求时不需要保活探测
+                mark_active(self.session)
+
+                retry_after = None
+                try:
+                    if policy.hedge:
+                        response, sent = await self._send_hedged(
+                            policy, endpoint, method, url, min(attempt_timeout, remaining), **kwargs
+                        )
+                    else:
+                        response = await self._send_timed(
+                            endpoint, method, url, min(attempt_timeout, remaining), **kwargs
+                        )
+                        sent = 1
+                    attempts += sent
+                except httpx.TransportError as e:
+                    breaker.record(time.perf_counter() - sent_at, e)
+                    attempts += 1
+                    # 连接未建立时请求确定未发出，非幂等请求也可以安全重试
+                    retryable = policy.idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                    if not retryable or attempts >= policy.max_attempts:
+                        raise
+                    last_error = e
+                else:
+                    breaker.record(time.perf_counter() - sent_at, status=response.status_code)
+                    await self.governor.aobserve(endpoint, self.email, response.status_code)
+                    if not policy.should_retry_status(response.status_code) or attempts >= policy.max_attempts:
+                        if response.status_code >= 400:
+                            response.raise_for_status()
+                        data = (decode or decode_response)(response)
+                        if is_token_expired(data):
+                            error = "TokenExpired"
+                        return data
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    last_error = httpx.HTTPStatusError(
+                        f"{response.status_code} Error for url: {url}", request=response.request, response=response
+                    )
+
+                # 退避后已没有时间再尝试一次时，直接返回最后一次的错误
+                delay = policy.backoff_delay(attempts, retry_after)
+                if time.perf_counter() + delay + policy.min_attempt_time > deadline:
+                    raise last_error
+                await asyncio.sleep(delay)
+        except httpx.HTTPStatusError as e:
+            error = f"HTTP{e.response.status_code}"
+            raise
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            get_metrics().observe_request(endpoint, time.perf_counter() - started, max(0, attempts - 1), error)
+
+    async def _call(self, method: str, endpoint: str, timeout: float = None, decode=None, **kwargs):
+        """发送请求；token 失效时重新登录一次并透明地重放原请求"""
+        token = self.token
+        data = await self._request(method, endpoint, timeout, decode, **kwargs)
+
+        if self.email and endpoint != LOGIN_ENDPOINT and is_token_expired(data):
+            await self.reauthenticate(token)
+            data = await self._request(method, endpoint, timeout, decode, **kwargs)
+
+        return data
+
+    async def post(
+        self,
+        endpoint: str,
+        json_data: dict = None,
+        timeout: float = None,
+        headers: dict = None,
+        decode=None,
+        body: bytes = None,
+    ):
+        """
+        发送 POST 请求
+
+        Args:
+            endpoint: API 端点路径 (例如: /user/login)
+            json_data: JSON 数据
+            timeout: 单次尝试的超时上限（秒，可选），默认由端点的 RetryPolicy 决定
+            headers: 额外的请求头（可选，例如条件请求的 If-None-Match）
+            decode: 可选的响应解码函数 decode(response)，默认解析 JSON
+            body: 预编码的 JSON 请求体（可选，传入时忽略 json_data）
+
+        Returns:
+            dict: 响应的 JSON 数据（传入 decode 时为其返回值）
+
+        Raises:
+            httpx.HTTPError: 请求失败
+            DeadlineExceeded: 未能在端点的截止时间内完成
+        """
+        if body is not None:
+            return await self._call("POST", endpoint, timeout, decode, body=body, headers=headers)
+        if json_data is None:
+            json_data = {}
+
+        return await self._call("POST", endpoint, timeout, decode, json=json_data, headers=headers)
+
+    async def get(self, endpoint: str, params: dict = None, timeout: float = None) -> dict:
+        """
+        发送 GET 请求
+
+        Args:
+            endpoint: API 端点路径
+            params: URL 参数
+            timeout: 单次尝试的超时上限（秒，可选），默认由端点的 RetryPolicy 决定
+
+        Returns:
+            dict: 响应的 JSON 数据
+
+        Raises:
+            httpx.HTTPError: 请求失败
+            DeadlineExceeded: 未能在端点的截止时间内完成
+        """
+        return await self._call("GET", endpoint, timeout, params=params)
+
+    async def close(self):
+        """关闭会话，释放连接（共享会话由创建者负责关闭）"""
+        if self._owns_session:
+            await self.session.aclose()
+
+    async def __aenter__(self):
+        """支持异步上下文管理器"""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """退出时自动关闭会话"""
+        await self.close()
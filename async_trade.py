@@ -0,0 +1,534 @@
+"""
+异步跟单引擎 - 轮询、跟单、重新登录和通知作为协作任务并发执行
+"""
+import asyncio
+import time
+from datetime import datetime
+
+import config
+from async_api_client import AsyncAPIClient
+from funds import parse_balance
+from journal import get_journal
+from ledger import BalanceLedger, async_reconcile_loop
+from metrics import get_metrics, start_exporter, stop_exporter
+from notifier import get_notifier
+from poll_scheduler import PollScheduler
+from seen_index import SeenShares
+from trade import (
+    CHINA_TZ,
+    FOLLOW_ENDPOINT,
+    follow_body,
+    bootstrap_retry_delay,
+    generate_followed_banner,
+    parse_follow_result,
+)
+from user import parse_user_info
+from token_cache import async_login, async_refresh_loop, get_cache
+from trade_feed import TradeFeed
+from utils import cached_parse_ip_address
+from warmth import async_keepalive_loop, async_prewarm
+
+
+async def post_login(client: AsyncAPIClient, email: str, password: str) -> str:
+    """
+    登录 API
+
+    Args:
+        client: 异步 API 客户端
+        email: 登录邮箱
+        password: 登录密码
+
+    Returns:
+        str: 登录成功后的 token
+    """
+    payload = {
+        "email": email,
+        "password": password
+    }
+
+    result = await client.post("/user/login", json_data=payload)
+
+    if not result.get("resultCode"):
+        raise Exception(f"Login failed: {result.get('errCodeDes', 'Unknown error')}")
+
+    token = result["data"]
+    client.set_token(token)
+
+    return token
+
+
+async def fetch_get_info(client: AsyncAPIClient) -> dict:
+    """
+    获取用户信息
+
+    Args:
+        client: 异步 API 客户端
+
+    Returns:
+        dict: 用户信息数据
+    """
+    return await client.post("/user/get/info", json_data={})
+
+
+async def funds_overview(client: AsyncAPIClient) -> dict:
+    """
+    获取钱包余额概览
+
+    Args:
+        client: 异步 API 客户端
+
+    Returns:
+        dict: 钱包余额数据
+    """
+    return await client.post("/funds/overview", json_data={})
+
+
+async def trade_list(client: AsyncAPIClient, is_finish: bool = False) -> dict:
+    """
+    获取交易列表
+
+    Args:
+        client: 异步 API 客户端
+        is_finish: 是否已完成，默认 False
+
+    Returns:
+        dict: 交易列表数据
+    """
+    payload = {"isFinish": is_finish}
+    return await client.post("/second/share/user/list", json_data=payload)
+
+
+async def follow_trade(client: AsyncAPIClient, share_id: str, quantity: str) -> dict:
+    """
+    跟单
+
+    Args:
+        client: 异步 API 客户端
+        share_id: 交易分享 ID
+        quantity: 跟单数量
+
+    Returns:
+        dict: 跟单结果
+    """
+    return await client.post(FOLLOW_ENDPOINT, body=follow_body(share_id, quantity))
+
+
+def _now() -> str:
+    return datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')
+
+
+async def retry_bootstrap_call(call, label: str, deadline: float):
+    """
+    异步版本的 trade.retry_bootstrap_call
+
+    Args:
+        call: 无参数、返回协程的请求函数
+        label: 打印用的请求名称
+        deadline: 截止时间（time.monotonic()）
+
+    Returns:
+        协程的结果，截止时间内未能成功时为 None
+    """
+    delay = 1.0
+    while True:
+        try:
+            return await call()
+        except Exception as e:
+            wait_time = bootstrap_retry_delay(e, delay)
+            if time.monotonic() + wait_time >= deadline:
+                print(f"{label}失败，跳过: {e}")
+                return None
+            print(f"{label}失败: {e}，{wait_time:.1f} 秒后重试...")
+            await asyncio.sleep(wait_time)
+            delay = min(delay * 2, 5.0)
+
+
+async def fetch_balance(client: AsyncAPIClient):
+    """获取并解析余额"""
+    return parse_balance(await funds_overview(client))
+
+
+class AsyncFollowEngine:
+    """
+    异步跟单引擎
+
+    轮询任务只负责发现交易并放入跟单队列；跟单任务立即消费队列；
+    Banner 通知放入独立队列由通知任务发送，IP 地理位置在后台查询，
+    token 失效由客户端自动重新登录并重放请求。
+    任何慢操作（飞书 Webhook、IP 查询）都不会推迟下一次跟单。
+    """
+
+    def __init__(
+        self,
+        client: AsyncAPIClient,
+        email: str,
+        password: str,
+        max_trades: int = 1,
+        poll_interval: tuple = None,
+        follow_concurrency: int = None,
+        until: float = None,
+    ):
+        """
+        Args:
+            client: 异步 API 客户端
+            email: 登录邮箱
+            password: 登录密码
+            max_trades: 最多跟单数量
+            poll_interval: 可选的固定轮询间隔范围（秒），默认按请求预算自适应（见 poll_scheduler）
+            follow_concurrency: 并发跟单任务数（可选，默认从环境变量读取）
+            until: 可选的结束时间（Unix 时间戳），到达后即使未完成也退出监听
+        """
+        self.client = client
+        self.email = email
+        self.password = password
+        self.max_trades = max_trades
+        self.poll_interval = poll_interval
+        self.follow_concurrency = follow_concurrency or config.FOLLOW_CONCURRENCY
+        self.until = until
+
+        # 已处理分享索引：跳过之前轮询或上次运行中已处理的分享，并恢复本时段的已跟单数
+        self.seen = SeenShares(email)
+        self.followed_count = self.seen.succeeded_since(time.time() - config.SESSION_WINDOW * 60)
+        # 增量列表：列表未变化时跳过解析，变化时只返回新出现的交易
+        self.feed = TradeFeed(is_finish=False)
+        # 轮询调度：时段开始前后和发现新分享后加速，空闲时放慢，429/5xx 时退避
+        window_start = until - config.SESSION_WINDOW * 60 if until is not None else None
+        self.scheduler = PollScheduler(window_start=window_start, account=email, interval=poll_interval)
+        self.ledger = None
+        self.login_ip = None
+        self.organization = None
+        self.country = None
+
+        self._follow_queue: asyncio.Queue = asyncio.Queue()
+        self._notify_queue: asyncio.Queue = asyncio.Queue()
+        self._pending: set = set()
+        self._done = asyncio.Event()
+        # 「已成功 + 在途」不超过 max_trades，保证跟单数量精确
+        self._slots = asyncio.Condition()
+        self._in_flight = 0
+        self._background: set = set()
+        self.cache = get_cache()
+        self.notifier = get_notifier()
+        self.metrics = get_metrics()
+        self.journal = get_journal()
+        # token 失效时由客户端自动重新登录并重放请求
+        self.client.set_credentials(email, password, cache=self.cache)
+
+    async def _lookup_location(self, login_ip: str):
+        """后台查询登录 IP 的地理位置，仅用于 Banner 展示"""
+        ip_info = await asyncio.to_thread(cached_parse_ip_address, login_ip)
+        if ip_info:
+            self.organization = ip_info.get("organization")
+            self.country = ip_info.get("country")
+            print(f"位置: {self.organization or '未知'} ({self.country or '未知'})")
+
+    def _spawn(self, coro):
+        """启动后台任务并持有引用，防止被垃圾回收"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def prepare(self):
+        """登录后并发获取用户信息和余额，计算跟单数量；IP 位置在后台查询"""
+        print("正在登录...")
+        token = await async_login(self.email, self.password, self.client, cache=self.cache)
+        print(f"登录成功: {token}")
+
+        # 失败时在 BOOTSTRAP_DEADLINE 内重试，仍失败时不结束本时段，余额由后台对账补齐
+        deadline = time.monotonic() + config.BOOTSTRAP_DEADLINE
+        info_task = asyncio.create_task(
+            retry_bootstrap_call(lambda: fetch_get_info(self.client), "获取用户信息", deadline)
+        )
+        funds_task = asyncio.create_task(
+            retry_bootstrap_call(lambda: fetch_balance(self.client), "获取余额", deadline)
+        )
+
+        self.login_ip = parse_user_info(await info_task).login_ip
+        print(f"登录IP: {self.login_ip or '未知'}")
+        if self.login_ip and config.GEO_LOOKUP:
+            self._spawn(self._lookup_location(self.login_ip))
+
+        # 本地余额账本：每笔跟单按仓位策略从账本取数量，成功后本地扣减，后台定期对账
+        self.ledger = BalanceLedger(await funds_task, account=self.email)
+
+        if self.ledger.known:
+            print(f"可用余额: {self.ledger.available:.2f} USDT")
+            print(f"跟单数量: {self.ledger.quantity():.2f} USDT（仓位策略: {self.ledger.strategy}）")
+        else:
+            print("可用余额: 未知（后台取得余额后开始跟单）")
+
+        # 为轮询和并发跟单预先建立连接
+        await async_prewarm(self.client, connections=self.follow_concurrency + 1)
+
+    async def _poll_loop(self):
+        """轮询交易列表，把新发现的交易放入跟单队列"""
+        while not self._done.is_set():
+            pages_read, items_read, unchanged = self.feed.pages_read, self.feed.items_read, self.feed.unchanged
+            polled_at = time.perf_counter()
+            error = None
+            try:
+                parsed_trades = await self.feed.aadvance(await self.feed.afetch(self.client))
+            except Exception as e:
+                # 429/5xx、超时等按退避等待；parse_trades 抛出异常说明无数据，按正常间隔继续
+                error, parsed_trades = e, []
+
+            new_trades = [
+                t for t in parsed_trades if t.id not in self._pending and self.seen.is_new(t.id)
+            ]
+            if new_trades and not self.ledger.known:
+                # 启动时未取得余额：交易留到下次轮询，等后台对账取得余额后再跟单
+                print(f"发现 {len(new_trades)} 条交易，可用余额未知，下次轮询重试")
+                for trade in new_trades:
+                    self.feed.retry(trade)
+            elif new_trades:
+                print(f"[{_now()}] 发现 {len(new_trades)} 条交易！")
+                for trade in new_trades:
+                    self.metrics.observe_detect(trade.create_time)
+                    self._pending.add(trade.id)
+                    self._follow_queue.put_nowait(trade)
+
+            requests = self.feed.pages_read - pages_read
+            if error is not None:
+                status = type(error).__name__
+            else:
+                status = "unchanged" if self.feed.unchanged > unchanged else "ok"
+            self.journal.record_poll(
+                self.email,
+                time.perf_counter() - polled_at,
+                requests,
+                self.feed.items_read - items_read,
+                len(new_trades),
+                status,
+            )
+            if error is None:
+                self.scheduler.record(requests=requests, new_trades=len(new_trades))
+                backoff = False
+            else:
+                backoff = self.scheduler.record_error(error, requests=requests)
+            wait_time = self.scheduler.next_delay()
+            if backoff:
+                print(f"[{_now()}] 获取交易列表失败: {error}，{wait_time} 秒后重试...")
+            elif not parsed_trades:
+                print(f"[{_now()}] 暂无交易，{wait_time} 秒后继续...")
+
+            try:
+                await asyncio.wait_for(self._done.wait(), timeout=wait_time)
+            except TimeoutError:
+                pass
+
+    async def _acquire_slot(self) -> bool:
+        """等待跟单名额，引擎已完成时返回 False"""
+        async with self._slots:
+            await self._slots.wait_for(
+                lambda: self._done.is_set() or self.followed_count + self._in_flight < self.max_trades
+            )
+            if self._done.is_set():
+                return False
+            self._in_flight += 1
+            return True
+
+    async def _release_slot(self, success: bool):
+        """归还跟单名额，成功时计入已跟单数量"""
+        async with self._slots:
+            self._in_flight -= 1
+            if success:
+                self.followed_count += 1
+                if self.followed_count >= self.max_trades:
+                    print(f"\n已完成 {self.max_trades} 笔跟单，退出监听")
+                    self._done.set()
+            self._slots.notify_all()
+
+    async def _follow_loop(self):
+        """消费跟单队列并跟单"""
+        while not self._done.is_set():
+            trade = await self._follow_queue.get()
+            try:
+                if not await self._acquire_slot():
+                    return
+
+                quantity = self.ledger.reserve()
+                if quantity <= 0:
+                    print(f"可用余额不足，跳过: {trade.title}")
+                    await self._release_slot(False)
+                    continue
+
+                success = False
+                rejected = False
+                message = None
+                started = time.perf_counter()
+                try:
+                    print(f"正在跟单: {trade.title}")
+                    self.seen.mark_attempted(trade.id)
+                    result = await follow_trade(self.client, trade.id, str(quantity))
+                    rejected = True
+
+                    parsed = parse_follow_result(result)
+                    message = parsed.message
+                    status = "成功" if parsed.success else "失败"
+                    print(f"跟单{status}: {parsed.message}")
+
+                    success = parsed.success
+                    if success:
+                        self.metrics.observe_follow(trade.create_time)
+                        self._notify_queue.put_nowait((trade, datetime.now(tz=CHINA_TZ), quantity))
+                except Exception as e:
+                    # 请求异常（超时、熔断等）不结束跟单任务，交易在下次轮询时重试
+                    message = f"{type(e).__name__}: {e}"
+                    print(f"跟单失败: {message}")
+                finally:
+                    self.journal.record_follow(
+                        self.email,
+                        trade.id,
+                        quantity,
+                        success,
+                        message,
+                        trade.create_time,
+                        time.perf_counter() - started,
+                    )
+                    self.seen.mark_result(trade.id, success, rejected=rejected)
+                    self.ledger.settle(quantity, success)
+                    if not success and not rejected:
+                        self.feed.retry(trade)
+                    await self._release_slot(success)
+            finally:
+                self._pending.discard(trade.id)
+                self._follow_queue.task_done()
+
+    async def _notify_loop(self):
+        """生成 Banner 并发送飞书通知，不占用跟单路径"""
+        while True:
+            trade, follow_time, quantity = await self._notify_queue.get()
+            try:
+                banner = generate_followed_banner(
+                    create_time=trade.create_time,
+                    follow_time=follow_time,
+                    share_id=trade.id,
+                    available=self.ledger.available,
+                    quantity=quantity,
+                    login_ip=self.login_ip,
+                    organization=self.organization,
+                    country=self.country,
+                )
+                print(banner)
+                self.notifier.notify(banner)
+            finally:
+                self._notify_queue.task_done()
+
+    async def run(self, notify_timeout: float = None):
+        """
+        运行引擎直到完成 max_trades 笔跟单
+
+        Args:
+            notify_timeout: 退出前等待通知发送完成的最长时间（秒，默认 config.NOTIFY_FLUSH_TIMEOUT）
+        """
+        if notify_timeout is None:
+            notify_timeout = config.NOTIFY_FLUSH_TIMEOUT
+        # 后台任务都在 try 中启动，启动途中出错也会在 finally 中取消
+        banner_task = exporter = None
+        tasks = []
+        try:
+            await self.prepare()
+            if self.followed_count:
+                print(f"本时段已跟单 {self.followed_count} 笔（从索引恢复）")
+            if self.followed_count >= self.max_trades:
+                print(f"已完成 {self.max_trades} 笔跟单，无需监听")
+                return
+            if self.poll_interval:
+                print(f"开始监听交易，每 {self.poll_interval[0]}~{self.poll_interval[1]} 秒随机检查一次...")
+            else:
+                print(f"开始监听交易，每分钟最多 {self.scheduler.budget_rpm:g} 次请求，按时段和活动自适应间隔...")
+            print("按 Ctrl+C 可随时退出\n")
+
+            banner_task = asyncio.create_task(self._notify_loop())
+            self._spawn(async_refresh_loop(self.email, self.password, self.client, cache=self.cache))
+            self._spawn(async_keepalive_loop(self.client, connections=self.follow_concurrency + 1))
+            self._spawn(async_reconcile_loop(self.ledger, self.client))
+            exporter = start_exporter()
+            workers = [asyncio.create_task(self._poll_loop())]
+            workers += [
+                asyncio.create_task(self._follow_loop())
+                for _ in range(max(1, self.follow_concurrency))
+            ]
+            done_waiter = asyncio.create_task(self._done.wait())
+            tasks = [done_waiter, *workers]
+            timeout = None if self.until is None else max(0.0, self.until - time.time())
+            finished, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not finished:
+                print(f"\n已到本场结束时间，共跟单 {self.followed_count} 笔，退出监听")
+            for task in finished:
+                if task is not done_waiter and task.exception():
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            # 等待已排队的通知交给通知器，并在截止时间内发送完毕
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + notify_timeout
+            try:
+                await asyncio.wait_for(self._notify_queue.join(), timeout=notify_timeout)
+            except TimeoutError:
+                pass
+            await asyncio.to_thread(self.notifier.flush, max(0.0, deadline - loop.time()))
+            if banner_task is not None:
+                banner_task.cancel()
+            if exporter is not None:
+                stop_exporter()
+            self.seen.close()
+            for task in list(self._background):
+                task.cancel()
+
+
+async def async_watch_and_follow(
+    email: str = None,
+    password: str = None,
+    max_trades: int = 1,
+    client: AsyncAPIClient = None,
+    poll_interval: tuple = None,
+    until: float = None,
+) -> int:
+    """
+    异步版本的 watch_and_follow
+
+    Args:
+        email: 登录邮箱（可选，默认从环境变量读取）
+        password: 登录密码（可选，默认从环境变量读取）
+        max_trades: 最多跟单数量，默认 1
+        client: 可选的异步 API 客户端（多账号时每个账号一个），默认新建并在退出时关闭
+        poll_interval: 可选的固定轮询间隔范围（秒），默认按请求预算自适应（见 poll_scheduler）
+        until: 可选的结束时间（Unix 时间戳），到达后即使未完成也退出监听
+
+    Returns:
+        int: 成功跟单的数量
+
+    Raises:
+        asyncio.CancelledError: 任务被取消（清理完成后继续抛出）
+    """
+    if email is None:
+        email = config.TRADE_EMAIL
+    if password is None:
+        password = config.TRADE_PASSWORD
+    if not email or not password:
+        raise ValueError("请在 .env 文件中设置 TRADE_EMAIL 和 TRADE_PASSWORD")
+
+    owns_client = client is None
+    client = client or AsyncAPIClient()
+    engine = AsyncFollowEngine(
+        client, email, password, max_trades=max_trades, poll_interval=poll_interval, until=until
+    )
+    try:
+        await engine.run()
+    except asyncio.CancelledError:
+        print("\n用户中断，退出监听")
+        raise
+    except Exception as e:
+        print(f"\n发生错误: {e}")
+    finally:
+        if owns_client:
+            await client.close()
+
+    return engine.followed_count
+
+
+if __name__ == "__main__":
+    asyncio.run(async_watch_and_follow())
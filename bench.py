@@ -0,0 +1,538 @@
+"""
+基准测试 - 基于本地模拟交易所测量跟单引擎的性能
+
+测量项：
+    startup     启动到第一次轮询交易列表的耗时（含登录和启动阶段）
+    latency     分享创建到跟单被确认的耗时（p50 / p95 / max）
+    throughput  一次轮询发现多条分享时的跟单吞吐量（笔/秒）
+    parse       单次轮询响应的解码 + 解析耗时与解析结果占用的内存（微基准，不经过网络）
+    send        跟单请求从发现分享到服务端收到请求的耗时：逐笔构建请求 vs 预构建模板
+
+用法：
+    python bench.py --engines sync sync-http2 async --latency 0.05 --runs 3
+    python bench.py --parse --parse-items 50
+    python bench.py --send --send-iterations 500
+"""
+import argparse
+import asyncio
+import atexit
+import contextlib
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+import config
+from mock_server import MockExchange
+
+LIST_ENDPOINT = "/second/share/user/list"
+
+
+def run_sync_engine(email: str, password: str, max_trades: int, poll_interval: tuple) -> int:
+    """使用阻塞式 watch_and_follow 运行一次"""
+    from api_client import APIClient
+    from trade import watch_and_follow
+
+    with APIClient() as client:
+        return watch_and_follow(
+            email=email,
+            password=password,
+            max_trades=max_trades,
+            client=client,
+            poll_interval=poll_interval,
+        )
+
+
+def run_sync_http2_engine(email: str, password: str, max_trades: int, poll_interval: tuple) -> int:
+    """
+    使用阻塞式 watch_and_follow + httpx 传输运行一次
+
+    模拟交易所只提供纯 HTTP，因此这里测量的是 httpx 传输本身的开销；
+    HTTP/2 多路复用的收益只在 HTTPS 的真实平台上体现。
+    """
+    from http2_client import HTTP2APIClient
+    from trade import watch_and_follow
+
+    with HTTP2APIClient() as client:
+        return watch_and_follow(
+            email=email,
+            password=password,
+            max_trades=max_trades,
+            client=client,
+            poll_interval=poll_interval,
+        )
+
+
+def run_async_engine(email: str, password: str, max_trades: int, poll_interval: tuple) -> int:
+    """使用异步引擎运行一次"""
+    from async_trade import async_watch_and_follow
+
+    return asyncio.run(async_watch_and_follow(
+        email=email,
+        password=password,
+        max_trades=max_trades,
+        poll_interval=poll_interval,
+    ))
+
+
+# 引擎名称 -> 运行函数，新引擎在此注册即可参与对比
+ENGINES = {
+    "sync": run_sync_engine,
+    "sync-http2": run_sync_http2_engine,
+    "async": run_async_engine,
+}
+
+
+@contextlib.contextmanager
+def isolated_environment(exchange: MockExchange):
+    """
+    把配置指向模拟交易所，并使用临时数据目录（冷启动：无 token 缓存）
+
+    运行日志和指标注册表也换成新的实例，退出时关闭并丢弃，
+    压测数据不会在进程退出时写入真实的 journal.db 和 metrics.jsonl / metrics.prom。
+    限流器换成不限速的实例、熔断器全部重建，测得的是引擎本身的耗时而不是令牌等待。
+
+    Args:
+        exchange: 模拟交易所
+    """
+    import api_client
+    import circuit_breaker
+    import journal
+    import metrics
+    import rate_governor
+    import token_cache
+    import utils
+
+    saved = {
+        name: getattr(config, name)
+        for name in ("BASE_URL", "DATA_PATH", "GEO_LOOKUP", "FEISHU_WEBHOOK_URL", "JOURNAL_FILE")
+    }
+    saved_journal, saved_metrics = journal._global_journal, metrics._global_metrics
+    saved_export = metrics._export_enabled
+    saved_governor, saved_breakers = rate_governor._global_governor, circuit_breaker._breakers
+    with tempfile.TemporaryDirectory() as data_dir:
+        config.BASE_URL = exchange.url
+        config.DATA_PATH = Path(data_dir)
+        config.JOURNAL_FILE = str(config.DATA_PATH / "journal.db")
+        config.GEO_LOOKUP = False
+        config.FEISHU_WEBHOOK_URL = f"{exchange.url}/hook"
+        token_cache._global_cache = None
+        utils._geo_cache = None
+        journal._global_journal = metrics._global_metrics = None
+        metrics._export_enabled = False
+        rate_governor._global_governor = rate_governor.RateGovernor(
+            rate_governor.MemoryStore(), global_rps=0, endpoint_rps=0, account_rps=0
+        )
+        circuit_breaker._breakers = {}
+        api_client.reset_client()
+        try:
+            yield
+        finally:
+            discard_background_state()
+            journal._global_journal, metrics._global_metrics = saved_journal, saved_metrics
+            metrics._export_enabled = saved_export
+            rate_governor._global_governor, circuit_breaker._breakers = saved_governor, saved_breakers
+            for name, value in saved.items():
+                setattr(config, name, value)
+            token_cache._global_cache = None
+            utils._geo_cache = None
+            api_client.reset_client()
+
+
+def discard_background_state():
+    """关闭压测期间创建的运行日志，并取消它和指标注册表在进程退出时的写入"""
+    import journal
+    import metrics
+
+    if journal._global_journal is not None:
+        journal._global_journal.close()
+        atexit.unregister(journal._global_journal.close)
+    if metrics._global_metrics is not None:
+        atexit.unregister(metrics._global_metrics.export)
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    计算百分位数（最近秩法）
+
+    Args:
+        values: 数值列表
+        q: 百分位（0~100）
+
+    Returns:
+        float: 百分位数，列表为空时返回 0
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _start_engine(engine: str, max_trades: int, poll_interval: tuple, quiet: bool) -> tuple:
+    """在后台线程运行引擎，返回 (线程, 启动时间)"""
+    runner = ENGINES[engine]
+    output = io.StringIO() if quiet else None
+
+    def target():
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            runner("bench@example.com", "bench", max_trades, poll_interval)
+
+    thread = threading.Thread(target=target, name=f"bench-{engine}", daemon=True)
+    started_at = time.time()
+    thread.start()
+    return thread, started_at
+
+
+def _wait_first_poll(exchange: MockExchange, timeout: float) -> float | None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if (first := exchange.first_request_at.get(LIST_ENDPOINT)) is not None:
+            return first
+        time.sleep(0.001)
+    return None
+
+
+def bench_latency(engine: str, exchange: MockExchange, shares: int, poll_interval: float, quiet: bool = True) -> dict:
+    """
+    逐条发布分享，测量启动耗时和「分享创建 -> 跟单确认」的延迟
+
+    Args:
+        engine: 引擎名称
+        exchange: 模拟交易所
+        shares: 发布的分享数量
+        poll_interval: 引擎轮询间隔（秒）
+        quiet: 是否屏蔽引擎输出
+
+    Returns:
+        dict: startup, latency_p50, latency_p95, latency_max, followed
+    """
+    exchange.reset()
+    with isolated_environment(exchange):
+        thread, started_at = _start_engine(engine, shares, (poll_interval, poll_interval), quiet)
+        first_poll = _wait_first_poll(exchange, timeout=30)
+
+        for _ in range(shares):
+            # 在轮询周期内的随机时刻发布，使发现延迟均匀分布
+            time.sleep(random.uniform(0, poll_interval))
+            exchange.add_share()
+            time.sleep(poll_interval)
+
+        thread.join(timeout=poll_interval * shares * 4 + 30)
+
+    latencies = [f["acked_at"] - f["createTime"] / 1000 for f in exchange.follows]
+    return {
+        "startup": (first_poll - started_at) if first_poll else None,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_max": max(latencies, default=0.0),
+        "followed": len(exchange.follows),
+    }
+
+
+def bench_burst(engine: str, exchange: MockExchange, shares: int, poll_interval: float, quiet: bool = True) -> dict:
+    """
+    一次发布多条分享，测量同一轮询内的跟单吞吐量
+
+    Args:
+        engine: 引擎名称
+        exchange: 模拟交易所
+        shares: 同时发布的分享数量
+        poll_interval: 引擎轮询间隔（秒）
+        quiet: 是否屏蔽引擎输出
+
+    Returns:
+        dict: burst_duration, follows_per_second, burst_last_latency, followed
+    """
+    exchange.reset()
+    for _ in range(shares):
+        exchange.add_share()
+
+    with isolated_environment(exchange):
+        thread, _ = _start_engine(engine, shares, (poll_interval, poll_interval), quiet)
+        thread.join(timeout=poll_interval * 4 + 60)
+
+    follows = exchange.follows
+    if not follows:
+        return {"burst_duration": None, "follows_per_second": 0.0, "burst_last_latency": None, "followed": 0}
+
+    first_received = min(f["received_at"] for f in follows)
+    last_acked = max(f["acked_at"] for f in follows)
+    duration = max(last_acked - first_received, 1e-9)
+    return {
+        "burst_duration": duration,
+        "follows_per_second": len(follows) / duration,
+        "burst_last_latency": last_acked - first_received,
+        "followed": len(follows),
+    }
+
+
+def run_benchmarks(engines: list, runs: int, latency: float, shares: int, burst: int, poll_interval: float,
+                   quiet: bool = True) -> dict:
+    """
+    对每个引擎运行 latency 和 burst 两组测试
+
+    Returns:
+        dict: 引擎名称 -> 每次运行的结果列表
+    """
+    results = {}
+    with MockExchange(latency=latency) as exchange:
+        for engine in engines:
+            results[engine] = []
+            for run in range(1, runs + 1):
+                result = {"run": run}
+                result.update(bench_latency(engine, exchange, shares, poll_interval, quiet))
+                result.update(bench_burst(engine, exchange, burst, poll_interval, quiet))
+                results[engine].append(result)
+    return results
+
+
+def _parse_trades_as_dicts(trades_data: dict) -> list:
+    """改用数据模型之前的 parse_trades（字典 + 字符串键），作为解析微基准的对照"""
+    if not trades_data.get("resultCode"):
+        raise Exception(f"获取交易列表失败: {trades_data.get('errCodeDes', 'Unknown error')}")
+    data = trades_data["data"]
+    content = data.get("showAll", []) + data.get("page", {}).get("content", [])
+    trades = {}
+    for item in content:
+        share_id = item.get("shareId")
+        if share_id not in trades:
+            trades[share_id] = {
+                "id": share_id,
+                "title": item.get("title"),
+                "createTime": item.get("createTime"),
+            }
+    return list(trades.values())
+
+
+def _list_body(items: int) -> bytes:
+    """生成一页交易列表响应体（字段参照真实接口，多余字段同样需要解码）"""
+    now = int(time.time() * 1000)
+    content = [
+        {
+            "shareId": uuid.uuid4().hex[:16],
+            "title": f"BTC/USDT 秒合约 #{i}",
+            "createTime": now - i * 60_000,
+            "symbol": "BTCUSDT",
+            "direction": random.choice(["UP", "DOWN"]),
+            "period": 60,
+            "amount": round(random.uniform(10, 1000), 2),
+            "nickName": f"trader-{i % 7}",
+            "followCount": random.randint(0, 500),
+        }
+        for i in range(items)
+    ]
+    page = {"content": content, "number": 1, "size": items, "totalElements": items, "totalPages": 1, "last": True}
+    return json.dumps({"resultCode": True, "data": {"showAll": [], "page": page}}).encode("utf-8")
+
+
+def bench_parse(items: int = 50, iterations: int = 2000) -> dict:
+    """
+    测量单次轮询的解码 + 解析耗时，以及解析结果占用的内存
+
+    Args:
+        items: 每页分享数
+        iterations: 重复次数
+
+    Returns:
+        dict: 方案名称 -> {"per_poll": 秒, "memory": 每份解析结果占用的字节数}
+    """
+    import models
+    from trade import parse_trades
+
+    body = _list_body(items)
+    variants = {
+        "dict + json": lambda: _parse_trades_as_dicts(json.loads(body)),
+        "slots + json": lambda: parse_trades(json.loads(body)),
+    }
+    if models.JSON_BACKEND != "json":
+        variants[f"slots + {models.JSON_BACKEND}"] = lambda: parse_trades(models.loads(body))
+
+    results = {}
+    for name, parse in variants.items():
+        parse()  # 预热
+        started = time.perf_counter()
+        for _ in range(iterations):
+            parse()
+        per_poll = (time.perf_counter() - started) / iterations
+
+        # 同时保留多份结果，摊薄一次性分配（解释器缓存、空闲链表）的影响
+        copies = 20
+        tracemalloc.start()
+        parsed = [parse() for _ in range(copies)]
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del parsed
+        results[name] = {"per_poll": per_poll, "memory": memory / copies}
+    return results
+
+
+def print_parse_results(results: dict, items: int):
+    """
+    打印解析微基准结果
+
+    Args:
+        results: bench_parse 的返回值
+        items: 每页分享数
+    """
+    baseline = next(iter(results.values()))["per_poll"]
+    print(f"\n========== 解析微基准（每页 {items} 条） ==========")
+    print(f"{'方案':<16}{'单次轮询':>12}{'加速':>10}{'结果内存':>12}")
+    for name, row in results.items():
+        print(
+            f"{name:<16}"
+            f"{row['per_poll'] * 1e6:10.1f}us"
+            f"{baseline / row['per_poll']:9.2f}x"
+            f"{row['memory'] / 1024:10.1f}KB"
+        )
+    print("==============================================\n")
+
+
+def bench_follow_send(iterations: int = 500) -> dict:
+    """
+    测量跟单请求「发现分享 -> 服务端收到请求」的耗时（同步客户端，已预热的连接）
+
+    对照组按原先的方式逐笔构建 payload 并以 json_data 发送；快速通道使用预编码请求体和请求模板。
+    两组交替进行，避免系统负载变化带来的偏差。
+
+    Args:
+        iterations: 每组的跟单次数
+
+    Returns:
+        dict: 方案名称 -> {"send_p50", "send_mean", "round_trip_p50"}（秒）
+    """
+    from api_client import APIClient
+    from trade import FOLLOW_ENDPOINT, follow_body
+
+    variants = {
+        "json_data": lambda client, share_id: client.post(
+            FOLLOW_ENDPOINT, json_data={"shareId": share_id, "quantity": "0.01"}
+        ),
+        "prepared": lambda client, share_id: client.post(FOLLOW_ENDPOINT, body=follow_body(share_id, "0.01")),
+    }
+    samples = {name: {"send": [], "round_trip": []} for name in variants}
+
+    with MockExchange(available=iterations * len(variants)) as exchange, isolated_environment(exchange):
+        with APIClient() as client:
+            token = client.post("/user/login", json_data={"email": "bench@example.com", "password": "bench"})["data"]
+            client.set_token(token)
+            client.prepare("POST", FOLLOW_ENDPOINT)
+            for name, send in variants.items():
+                send(client, exchange.add_share()["shareId"])  # 预热连接和代码路径
+
+            for _ in range(iterations):
+                for name, send in variants.items():
+                    share_id = exchange.add_share()["shareId"]
+                    started = time.time()
+                    send(client, share_id)
+                    finished = time.time()
+                    received_at = exchange.follows[-1]["received_at"]
+                    samples[name]["send"].append(received_at - started)
+                    samples[name]["round_trip"].append(finished - started)
+
+    return {
+        name: {
+            "send_p50": percentile(rows["send"], 50),
+            "send_mean": sum(rows["send"]) / len(rows["send"]),
+            "round_trip_p50": percentile(rows["round_trip"], 50),
+        }
+        for name, rows in samples.items()
+    }
+
+
+def print_send_results(results: dict, iterations: int):
+    """
+    打印跟单发送基准结果
+
+    Args:
+        results: bench_follow_send 的返回值
+        iterations: 每组的跟单次数
+    """
+    print(f"\n========== 跟单发送（每组 {iterations} 次） ==========")
+    print(f"{'方案':<12}{'发出p50':>12}{'发出均值':>12}{'往返p50':>12}")
+    for name, row in results.items():
+        print(
+            f"{name:<12}"
+            f"{row['send_p50'] * 1e6:10.0f}us"
+            f"{row['send_mean'] * 1e6:10.0f}us"
+            f"{row['round_trip_p50'] * 1e6:10.0f}us"
+        )
+    print("==============================================\n")
+
+
+def _fmt(value, unit: str = "s") -> str:
+    if value is None:
+        return "-"
+    if unit == "s":
+        return f"{value * 1000:8.1f}ms"
+    return f"{value:8.1f}{unit}"
+
+
+def print_results(results: dict):
+    """
+    打印基准测试结果（取各次运行的中位数）
+
+    Args:
+        results: run_benchmarks 的返回值
+    """
+    def median(rows: list, key: str):
+        values = [row[key] for row in rows if row.get(key) is not None]
+        return percentile(values, 50) if values else None
+
+    print("\n========== 基准测试结果 ==========")
+    print(f"{'引擎':<12}{'启动':>12}{'延迟p50':>12}{'延迟p95':>12}{'延迟max':>12}{'批量耗时':>12}{'吞吐':>12}")
+    for engine, rows in results.items():
+        print(
+            f"{engine:<12}"
+            f"{_fmt(median(rows, 'startup')):>12}"
+            f"{_fmt(median(rows, 'latency_p50')):>12}"
+            f"{_fmt(median(rows, 'latency_p95')):>12}"
+            f"{_fmt(median(rows, 'latency_max')):>12}"
+            f"{_fmt(median(rows, 'burst_duration')):>12}"
+            f"{_fmt(median(rows, 'follows_per_second'), '/s'):>12}"
+        )
+    print("==================================\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="跟单引擎基准测试")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--runs", type=int, default=3, help="每个引擎的运行次数")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟交易所的单次请求延迟（秒）")
+    parser.add_argument("--shares", type=int, default=5, help="延迟测试中逐条发布的分享数")
+    parser.add_argument("--burst", type=int, default=10, help="吞吐测试中同时发布的分享数")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="引擎轮询间隔（秒）")
+    parser.add_argument("--json", default=None, help="把原始结果写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="显示引擎输出")
+    parser.add_argument("--parse", action="store_true", help="只运行解码 + 解析微基准")
+    parser.add_argument("--parse-items", type=int, default=50, help="解析微基准中每页的分享数")
+    parser.add_argument("--send", action="store_true", help="只运行跟单发送基准（逐笔构建 vs 预构建模板）")
+    parser.add_argument("--send-iterations", type=int, default=500, help="跟单发送基准中每组的跟单次数")
+    args = parser.parse_args()
+
+    if args.parse:
+        print_parse_results(bench_parse(items=args.parse_items), args.parse_items)
+        raise SystemExit(0)
+    if args.send:
+        print_send_results(bench_follow_send(iterations=args.send_iterations), args.send_iterations)
+        raise SystemExit(0)
+
+    bench_results = run_benchmarks(
+        engines=args.engines,
+        runs=args.runs,
+        latency=args.latency,
+        shares=args.shares,
+        burst=args.burst,
+        poll_interval=args.poll_interval,
+        quiet=not args.verbose,
+    )
+    print_results(bench_results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(bench_results, f, indent=2, ensure_ascii=False)
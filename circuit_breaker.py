@@ -0,0 +1,217 @@
+"""
+熔断器 - 按端点跟踪平台接口的健康状态，平台故障期间快速失败，到时间后用少量探测请求检测恢复
+
+状态：
+    closed     正常放行，记录最近 BREAKER_WINDOW 秒内每次调用的结果
+    open       最近的调用中失败（5xx、超时、连接失败，或耗时超过 BREAKER_SLOW_CALL 秒）的比例
+               达到 BREAKER_ERROR_RATE 后打开，直接抛出 CircuitOpen，不再发出请求
+    half_open  打开 BREAKER_OPEN_SECONDS 秒后放行 BREAKER_PROBES 个探测请求：
+               成功则关闭，失败则重新打开，且打开时长翻倍（不超过 BREAKER_MAX_OPEN_SECONDS）
+
+429 由限流器处理，其他 4xx 说明平台在正常响应，都不计为失败。
+进程内所有客户端共享同一组熔断器，状态导出为指标 breaker_state（0 关闭 / 1 半开 / 2 打开）。
+"""
+import threading
+import time
+from collections import deque
+
+import httpx
+
+import config
+from metrics import get_metrics
+from rate_governor import RateLimited
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# 导出到指标的状态值
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(ConnectionError):
+    """熔断器打开，请求未发出"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        """
+        Args:
+            endpoint: API 端点路径
+            retry_after: 距下一次探测的秒数
+        """
+        super().__init__(f"{endpoint} 已熔断，{retry_after:.1f} 秒后探测")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def is_failure(error: Exception) -> bool:
+    """
+    判断一次调用的异常是否说明平台异常
+
+    Args:
+        error: 调用抛出的异常
+
+    Returns:
+        bool: 5xx、超时、连接失败时为 True；429/4xx、限流等待超时、熔断时为 False
+    """
+    if isinstance(error, (CircuitOpen, RateLimited)):
+        return False
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status >= 500
+    return isinstance(error, (OSError, httpx.TransportError))
+
+
+class CircuitBreaker:
+    """单个端点的熔断器（线程安全）"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        window: float = None,
+        min_calls: int = None,
+        error_rate: float = None,
+        slow_call: float = None,
+        open_seconds: float = None,
+        max_open_seconds: float = None,
+        probes: int = None,
+    ):
+        """
+        Args:
+            endpoint: API 端点路径
+            window: 统计失败率的时间窗口（秒，可选，默认 config.BREAKER_WINDOW）
+            min_calls: 窗口内至少多少次调用才会打开（可选，默认 config.BREAKER_MIN_CALLS）
+            error_rate: 打开的失败率阈值（可选，默认 config.BREAKER_ERROR_RATE）
+            slow_call: 超过该耗时（秒）的调用计为失败（可选，默认 config.BREAKER_SLOW_CALL）
+            open_seconds: 首次打开的时长（秒，可选，默认 config.BREAKER_OPEN_SECONDS）
+            max_open_seconds: 打开时长的上限（秒，可选，默认 config.BREAKER_MAX_OPEN_SECONDS）
+            probes: 半开状态同时放行的探测请求数（可选，默认 config.BREAKER_PROBES）
+        """
+        self.endpoint = endpoint
+        self.window = window or config.BREAKER_WINDOW
+        self.min_calls = min_calls or config.BREAKER_MIN_CALLS
+        self.error_rate = error_rate or config.BREAKER_ERROR_RATE
+        self.slow_call = slow_call or config.BREAKER_SLOW_CALL
+        self.open_seconds = open_seconds or config.BREAKER_OPEN_SECONDS
+        self.max_open_seconds = max_open_seconds or config.BREAKER_MAX_OPEN_SECONDS
+        self.probes = probes or config.BREAKER_PROBES
+        self.state = CLOSED
+        self.opened_at = None
+        self.open_for = self.open_seconds  # 本次打开的时长，连续探测失败时翻倍
+        self._lock = threading.Lock()
+        self._calls = deque()              # 最近的调用 (单调时钟时间, 是否失败)
+        self._failures = 0
+        self._probing = 0                  # 半开状态下在途的探测请求数
+        self._probe_at = 0.0               # 最近一次放行探测的时间
+
+    def before_call(self):
+        """
+        调用前检查，打开时快速失败
+
+        Raises:
+            CircuitOpen: 熔断器打开，或半开状态下探测请求已满
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == OPEN:
+                remaining = self.opened_at + self.open_for - now
+                if remaining > 0:
+                    raise CircuitOpen(self.endpoint, remaining)
+                self._transition(HALF_OPEN)
+            if self._probing >= self.probes and now - self._probe_at < self.open_seconds:
+                # 等待在途的探测结果（探测超过 open_seconds 仍没有结果时视为丢失，放行新的探测）
+                raise CircuitOpen(self.endpoint, min(self.open_seconds, 1.0))
+            if self._probing >= self.probes:
+                self._probing = 0
+            self._probing += 1
+            self._probe_at = now
+
+    def record(self, seconds: float, error: Exception = None, status: int = None):
+        """
+        记录一次请求的结果
+
+        Args:
+            seconds: 请求耗时（秒，只含网络往返，不含限流等待和重试退避）
+            error: 请求抛出的异常（有响应时为 None）
+            status: 响应的 HTTP 状态码
+        """
+        if error is not None:
+            failed = True if is_failure(error) else None
+        elif status is not None and status >= 500:
+            failed = True
+        elif status == 429:
+            failed = None
+        else:
+            failed = seconds >= self.slow_call
+        if failed is None:
+            # 429、熔断等不代表平台健康状况，既不计成功也不计失败
+            with self._lock:
+                if self.state == HALF_OPEN:
+                    self._probing = max(0, self._probing - 1)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = max(0, self._probing - 1)
+                if failed:
+                    self.open_for = min(self.open_for * 2, self.max_open_seconds)
+                    self._transition(OPEN)
+                else:
+                    self.open_for = self.open_seconds
+                    self._transition(CLOSED)
+                return
+            if self.state == OPEN:
+                # 打开之前发出的请求，结果不再影响状态
+                return
+
+            self._calls.append((now, failed))
+            self._failures += failed
+            while self._calls and self._calls[0][0] <= now - self.window:
+                _, old_failed = self._calls.popleft()
+                self._failures -= old_failed
+            if len(self._calls) >= self.min_calls and self._failures >= self.error_rate * len(self._calls):
+                self._transition(OPEN)
+
+    def _transition(self, state: str):
+        """切换状态并导出指标（调用方持有 self._lock）"""
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            print(f"熔断: {self.endpoint} 已打开，{self.open_for:g} 秒后探测")
+        elif state == CLOSED:
+            self._calls.clear()
+            self._failures = 0
+            print(f"熔断: {self.endpoint} 已恢复")
+        get_metrics().set_gauge("breaker_state", STATE_VALUES[state], {"endpoint": self.endpoint})
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    """
+    获取端点的熔断器（进程内所有客户端共享）
+
+    Args:
+        endpoint: API 端点路径
+
+    Returns:
+        CircuitBreaker: 熔断器
+    """
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(endpoint, CircuitBreaker(endpoint))
+    return breaker
+
+
+def health() -> dict:
+    """
+    Returns:
+        dict: 端点 -> 熔断器状态（closed / half_open / open）
+    """
+    with _breakers_lock:
+        return {endpoint: breaker.state for endpoint, breaker in _breakers.items()}
@@ -65,4 +65,112 @@ if not DATA_PATH.exists():
 
 # 定时启动配置
 SCHEDULE_TIME = os.getenv("SCHEDULE_TIME")
-ADVANCE_MINUTES = int(os.getenv("ADVANCE_MINUTES"))
+ADVANCE_MINUTES = int(os.getenv("ADVANCE_MINUTES") or 0)
+# 启动时间的随机抖动上限（秒，0 表示准点启动）
+SCHEDULE_JITTER = float(os.getenv("SCHEDULE_JITTER") or 10)
+# 按响应头 Date 校准服务端时钟及采样次数；启动前多少秒执行预热
+CLOCK_SYNC = (os.getenv("CLOCK_SYNC") or "true").lower() not in ("0", "false", "no")
+CLOCK_SYNC_SAMPLES = int(os.getenv("CLOCK_SYNC_SAMPLES") or 5)
+WARMUP_LEAD = float(os.getenv("WARMUP_LEAD") or 30)
+
+# 常驻模式（trade.py --daemon）：每天的交易时段、每个时段的监听时长（分钟）与状态文件
+SESSION_TIMES = [t.strip() for t in (os.getenv("SESSION_TIMES") or "14:30,20:30").split(",") if t.strip()]
+SESSION_WINDOW = float(os.getenv("SESSION_WINDOW") or 60)
+STATUS_FILE = os.getenv("STATUS_FILE") or str(DATA_PATH / "status.json")
+
+# 跟单引擎：sync（阻塞循环）或 async（基于 httpx.AsyncClient 的协作任务）
+ENGINE = os.getenv("ENGINE") or "sync"
+
+# 同一次轮询内的最大并发跟单数（1 表示逐笔跟单）
+FOLLOW_CONCURRENCY = int(os.getenv("FOLLOW_CONCURRENCY") or 5)
+
+# 多账号配置：账号文件（JSON 列表）与进程数
+FLEET_FILE = os.getenv("FLEET_FILE") or str(DATA_PATH / "accounts.json")
+FLEET_PROCESSES = int(os.getenv("FLEET_PROCESSES") or 1)
+
+# Token 缓存：默认有效期与提前刷新时间（秒）
+TOKEN_LIFETIME = float(os.getenv("TOKEN_LIFETIME") or 3600)
+TOKEN_REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN") or 300)
+
+# 是否查询登录 IP 的地理位置（仅用于 Banner 展示）
+GEO_LOOKUP = (os.getenv("GEO_LOOKUP") or "true").lower() not in ("0", "false", "no")
+
+# IP 地理位置缓存：成功结果有效期、失败结果有效期（秒）与最大条目数
+GEO_CACHE_TTL = float(os.getenv("GEO_CACHE_TTL") or 7 * 24 * 3600)
+GEO_CACHE_NEGATIVE_TTL = float(os.getenv("GEO_CACHE_NEGATIVE_TTL") or 600)
+GEO_CACHE_MAX_ENTRIES = int(os.getenv("GEO_CACHE_MAX_ENTRIES") or 256)
+
+# 退出前等待飞书通知发送完毕的最长时间（秒）
+NOTIFY_FLUSH_TIMEOUT = float(os.getenv("NOTIFY_FLUSH_TIMEOUT") or 15)
+
+# 指标导出：常驻模式总是导出，其他运行方式需设置 METRICS_EXPORT=true；
+# 导出间隔（秒），导出到 DATA_PATH 下的 metrics.jsonl 和 metrics.prom（多进程 fleet 为 metrics-worker<序号>.*），
+# metrics.jsonl 超过 METRICS_MAX_BYTES 字节时轮转为 metrics.jsonl.1（只保留一份）
+METRICS_EXPORT = (os.getenv("METRICS_EXPORT") or "false").lower() not in ("0", "false", "no")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL") or 60)
+METRICS_MAX_BYTES = int(os.getenv("METRICS_MAX_BYTES") or 10 * 1024 * 1024)
+
+# 单次调用的总截止时间（秒，含重试和退避）：交易列表轮询与跟单
+LIST_DEADLINE = float(os.getenv("LIST_DEADLINE") or 5)
+FOLLOW_DEADLINE = float(os.getenv("FOLLOW_DEADLINE") or 6)
+
+# 同步客户端的 HTTP 传输：http1（requests，默认）或 http2（httpx，需要 h2 包）
+HTTP_TRANSPORT = (os.getenv("HTTP_TRANSPORT") or "http1").lower()
+
+# 轮询间隙的连接保活探测间隔（秒，0 表示不保活）与 DNS 缓存有效期（秒）
+KEEPALIVE_INTERVAL = float(os.getenv("KEEPALIVE_INTERVAL") or 20)
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL") or 300)
+
+# 已处理分享索引的保留时间（秒）
+SEEN_TTL = float(os.getenv("SEEN_TTL") or 86400)
+
+# 交易列表分页：每页条数（0 表示服务端默认）、单次轮询最多翻页数、是否并发预取下一页
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE") or 0)
+LIST_MAX_PAGES = int(os.getenv("LIST_MAX_PAGES") or 10)
+LIST_PREFETCH = (os.getenv("LIST_PREFETCH") or "false").lower() not in ("0", "false", "no")
+
+# 仓位策略：percent（可用余额 × 比例）、fixed（固定数量）、capped（按比例但不超过上限）
+SIZING_STRATEGY = (os.getenv("SIZING_STRATEGY") or "percent").lower()
+SIZING_PERCENT = float(os.getenv("SIZING_PERCENT") or 0.01)
+SIZING_FIXED = float(os.getenv("SIZING_FIXED") or 10)
+SIZING_CAP = float(os.getenv("SIZING_CAP") or 50)
+# 后台与 funds_overview 对账的间隔（秒，0 表示不对账）
+BALANCE_RECONCILE_INTERVAL = float(os.getenv("BALANCE_RECONCILE_INTERVAL") or 60)
+# 启动阶段获取用户信息和余额的重试时长（秒），超时后余额按未知处理，由后台对账补齐
+BOOTSTRAP_DEADLINE = float(os.getenv("BOOTSTRAP_DEADLINE") or 30)
+
+# 自适应轮询：每个账号每分钟最多的列表请求数（含翻页）、交易时段开始前后及发现新分享后的加速时长（分钟）、
+# 空闲时的最长轮询间隔（秒）与出错（429/5xx）退避上限（秒）
+POLL_BUDGET_RPM = float(os.getenv("POLL_BUDGET_RPM") or 6)
+POLL_BOOST_MINUTES = float(os.getenv("POLL_BOOST_MINUTES") or 5)
+POLL_IDLE_INTERVAL = float(os.getenv("POLL_IDLE_INTERVAL") or 40)
+POLL_MAX_BACKOFF = float(os.getenv("POLL_MAX_BACKOFF") or 300)
+
+# 请求限流（令牌桶）：所有请求、每个端点（所有账号合计）、每个账号每个端点的每秒请求数（0 表示不限）、
+# 桶容量对应的秒数、每级优先级预留的容量比例（跟单 > 轮询 > 余额等），以及是否跨进程共享
+RATE_GLOBAL_RPS = float(os.getenv("RATE_GLOBAL_RPS") or 20)
+RATE_ENDPOINT_RPS = float(os.getenv("RATE_ENDPOINT_RPS") or 10)
+RATE_ACCOUNT_RPS = float(os.getenv("RATE_ACCOUNT_RPS") or 5)
+RATE_BURST_SECONDS = float(os.getenv("RATE_BURST_SECONDS") or 2)
+RATE_PRIORITY_RESERVE = float(os.getenv("RATE_PRIORITY_RESERVE") or 0.2)
+RATE_SHARED = (os.getenv("RATE_SHARED") or "false").lower() not in ("0", "false", "no")
+# 收到 429 后速率减半的下限，以及之后每个成功响应恢复的比例
+RATE_MIN_FACTOR = float(os.getenv("RATE_MIN_FACTOR") or 0.1)
+RATE_RECOVERY = float(os.getenv("RATE_RECOVERY") or 0.2)
+
+# 熔断器：统计失败率的时间窗口（秒）、窗口内至少多少次请求才会打开、打开的失败率阈值、
+# 计为失败的慢请求耗时（秒）、首次打开时长与上限（秒）、半开状态同时放行的探测请求数
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW") or 30)
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS") or 5)
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE") or 0.5)
+BREAKER_SLOW_CALL = float(os.getenv("BREAKER_SLOW_CALL") or 3)
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS") or 10)
+BREAKER_MAX_OPEN_SECONDS = float(os.getenv("BREAKER_MAX_OPEN_SECONDS") or 60)
+BREAKER_PROBES = int(os.getenv("BREAKER_PROBES") or 1)
+
+# 运行日志（SQLite，WAL 模式）：是否记录轮询、跟单和余额快照，数据库路径，单个事务最多写入的记录数，
+# 凑批的最长等待时间（秒）
+JOURNAL = (os.getenv("JOURNAL") or "true").lower() not in ("0", "false", "no")
+JOURNAL_FILE = os.getenv("JOURNAL_FILE") or str(DATA_PATH / "journal.db")
+JOURNAL_BATCH_SIZE = int(os.getenv("JOURNAL_BATCH_SIZE") or 200)
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL") or 1)
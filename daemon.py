@@ -0,0 +1,253 @@
+"""
+常驻模式 - 一个进程依次服务每天的多个交易时段
+
+时段之间进程不退出：token、IP 缓存和连接池保持可用，每个时段开始前只需校准时钟、
+确认 token 并预热连接，不再有每个时段的冷启动开销。运行状态写入 config.STATUS_FILE，
+可用于健康检查（updated_at 超过两个心跳间隔未更新即视为异常）。
+
+用法：
+    python trade.py --daemon
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import config
+from metrics import enable_export
+from utils import CHINA_TZ, async_wait_until, wait_until, write_json_atomic
+
+# 状态文件心跳间隔（秒）
+HEARTBEAT_INTERVAL = 30
+
+
+def next_session(session_times: list, after: datetime = None, now: datetime = None) -> tuple[str, datetime]:
+    """
+    计算下一个需要服务的交易时段
+
+    Args:
+        session_times: 时段列表，格式 "HH:MM"
+        after: 已服务过的最后一个时段的启动时间（可选），不会再次返回该时段
+        now: 当前时间（可选，默认北京时间当前时间）
+
+    Returns:
+        tuple: (时段 "HH:MM", 启动时间)；启动时间 = 时段时间 - ADVANCE_MINUTES，可能早于当前时间（时段进行中）
+    """
+    now = now or datetime.now(tz=CHINA_TZ)
+    window = timedelta(minutes=config.SESSION_WINDOW)
+    candidates = []
+    for schedule_time in session_times:
+        hour, minute = map(int, schedule_time.split(":"))
+        start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        start = start - timedelta(minutes=config.ADVANCE_MINUTES)
+        for days in (0, 1):
+            candidate = start + timedelta(days=days)
+            if now < candidate + window and (after is None or candidate > after):
+                candidates.append((candidate, schedule_time))
+                break
+    if not candidates:
+        raise ValueError("没有可用的交易时段，请检查 SESSION_TIMES")
+    start, schedule_time = min(candidates)
+    return schedule_time, start
+
+
+class DaemonStatus:
+    """常驻进程的状态文件，状态变化时立即写入，并由心跳线程定期刷新 updated_at"""
+
+    def __init__(self, session_times: list, path: str | Path = None):
+        """
+        Args:
+            session_times: 服务的交易时段列表
+            path: 状态文件路径（可选，默认 config.STATUS_FILE）
+        """
+        self.path = Path(path or config.STATUS_FILE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="daemon-status", daemon=True)
+        self.data = {
+            "pid": os.getpid(),
+            "engine": config.ENGINE,
+            "started_at": datetime.now(tz=CHINA_TZ).isoformat(),
+            "session_times": session_times,
+            "state": "starting",
+            "next_session": None,
+            "last_session": None,
+            "sessions_run": 0,
+            "total_followed": 0,
+        }
+
+    def update(self, **fields):
+        """
+        更新字段并立即写入
+
+        Args:
+            **fields: 需要更新的字段
+        """
+        with self._lock:
+            self.data.update(fields)
+            self._write()
+
+    def record_session(self, schedule_time: str, started_at: datetime, followed: int, error: str = None):
+        """
+        记录一个已结束的时段
+
+        Args:
+            schedule_time: 时段 "HH:MM"
+            started_at: 时段启动时间
+            followed: 本时段成功跟单数量
+            error: 错误信息（可选）
+        """
+        with self._lock:
+            self.data["last_session"] = {
+                "session": schedule_time,
+                "started_at": started_at.isoformat(),
+                "ended_at": datetime.now(tz=CHINA_TZ).isoformat(),
+                "followed": followed,
+                "error": error,
+            }
+            self.data["sessions_run"] += 1
+            self.data["total_followed"] += followed
+            self._write()
+
+    def _write(self):
+        self.data["updated_at"] = datetime.now(tz=CHINA_TZ).isoformat()
+        try:
+            write_json_atomic(self.path, self.data)
+        except OSError as e:
+            print(f"写入状态文件失败: {e}")
+
+    def start(self) -> "DaemonStatus":
+        """写入初始状态并启动心跳线程"""
+        self.update()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止心跳并写入最终状态"""
+        self._stop.set()
+        self.update(state="stopped")
+
+    def _run(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                self._write()
+
+
+def run_daemon(session_times: list = None):
+    """
+    常驻运行同步引擎，依次服务每个交易时段
+
+    Args:
+        session_times: 时段列表（可选，默认 config.SESSION_TIMES）
+    """
+    from api_client import get_client, reset_client
+    from token_cache import login
+    from trade import watch_and_follow
+    from warmth import ConnectionWarmer
+
+    session_times = session_times or config.SESSION_TIMES
+    email, password = config.TRADE_EMAIL, config.TRADE_PASSWORD
+    enable_export()
+    client = get_client()
+    warmer = ConnectionWarmer(client, connections=config.FOLLOW_CONCURRENCY + 1)
+    status = DaemonStatus(session_times).start()
+
+    def before_wake():
+        """时段开始前确认 token 有效并预热连接"""
+        status.update(state="warming")
+        try:
+            login(email, password, client=client)
+        except Exception as e:
+            print(f"预登录失败（时段开始后重试）: {e}")
+        warmer.prewarm()
+
+    print(f"常驻模式已启动，交易时段: {', '.join(session_times)}")
+    last_start = None
+    try:
+        while True:
+            schedule_time, start = next_session(session_times, after=last_start)
+            status.update(state="waiting", next_session=start.isoformat())
+            print(f"下一个交易时段: {schedule_time}（{start.strftime('%Y-%m-%d %H:%M')} 启动）")
+            wait_until(start, session=client.session, before_wake=before_wake)
+
+            status.update(state="running", current_session=schedule_time)
+            followed, error = 0, None
+            try:
+                followed = watch_and_follow(
+                    email=email,
+                    password=password,
+                    client=client,
+                    until=start.timestamp() + config.SESSION_WINDOW * 60,
+                )
+            except KeyboardInterrupt:
+                # 时段中的中断结束整个常驻模式，而不只是本时段
+                status.record_session(schedule_time, start, followed, "interrupted")
+                raise
+            except Exception as e:
+                error = str(e)
+                print(f"时段 {schedule_time} 运行失败: {e}")
+            status.record_session(schedule_time, start, followed, error)
+            status.update(state="idle", current_session=None)
+            last_start = start
+    except KeyboardInterrupt:
+        print("\n用户中断，退出常驻模式")
+    finally:
+        status.stop()
+        reset_client()
+
+
+async def async_run_daemon(session_times: list = None):
+    """
+    常驻运行异步引擎，依次服务每个交易时段（所有时段共用一个事件循环和 AsyncAPIClient）
+
+    Args:
+        session_times: 时段列表（可选，默认 config.SESSION_TIMES）
+    """
+    from async_api_client import AsyncAPIClient
+    from async_trade import async_watch_and_follow
+    from token_cache import async_login
+    from warmth import async_prewarm
+
+    session_times = session_times or config.SESSION_TIMES
+    email, password = config.TRADE_EMAIL, config.TRADE_PASSWORD
+    enable_export()
+    client = AsyncAPIClient()
+    status = DaemonStatus(session_times).start()
+
+    async def before_wake():
+        """时段开始前确认 token 有效并预热连接"""
+        status.update(state="warming")
+        try:
+            await async_login(email, password, client)
+        except Exception as e:
+            print(f"预登录失败（时段开始后重试）: {e}")
+        await async_prewarm(client, connections=config.FOLLOW_CONCURRENCY + 1)
+
+    print(f"常驻模式已启动，交易时段: {', '.join(session_times)}")
+    last_start = None
+    try:
+        while True:
+            schedule_time, start = next_session(session_times, after=last_start)
+            status.update(state="waiting", next_session=start.isoformat())
+            print(f"下一个交易时段: {schedule_time}（{start.strftime('%Y-%m-%d %H:%M')} 启动）")
+            # 等待在事件循环中进行（可被取消），只有最后几十毫秒的自旋交给线程
+            await async_wait_until(start, before_wake=before_wake)
+
+            status.update(state="running", current_session=schedule_time)
+            try:
+                followed = await async_watch_and_follow(
+                    email=email,
+                    password=password,
+                    client=client,
+                    until=start.timestamp() + config.SESSION_WINDOW * 60,
+                )
+            except asyncio.CancelledError:
+                status.record_session(schedule_time, start, 0, "interrupted")
+                raise
+            status.record_session(schedule_time, start, followed)
+            status.update(state="idle", current_session=None)
+            last_start = start
+    finally:
+        status.stop()
+        await client.close()
@@ -0,0 +1,204 @@
+"""
+多账号运行器 - 在一个进程内（或进程池中）同时运行多个账号，共享连接池
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import config
+from api_client import create_client, create_shared_session
+
+
+def load_accounts(path: str | Path = None) -> list:
+    """
+    从 JSON 文件加载账号列表
+
+    文件格式：
+        [
+            {"email": "a@example.com", "password": "...", "max_trades": 1},
+            ...
+        ]
+
+    Args:
+        path: 账号文件路径（可选，默认 config.FLEET_FILE）
+
+    Returns:
+        list: 账号字典列表，每个字典包含 email, password, max_trades
+    """
+    path = Path(path or config.FLEET_FILE)
+    with open(path, encoding="utf-8") as f:
+        raw_accounts = json.load(f)
+
+    accounts = []
+    for i, item in enumerate(raw_accounts, 1):
+        if not item.get("email") or not item.get("password"):
+            raise ValueError(f"账号文件第 {i} 项缺少 email 或 password")
+        accounts.append({
+            "email": item["email"],
+            "password": item["password"],
+            "max_trades": int(item.get("max_trades", 1)),
+        })
+    return accounts
+
+
+def _run_account_sync(account: dict, session) -> int:
+    """在当前线程运行单个账号，使用独立的 APIClient（独立 token）和共享会话"""
+    from trade import watch_and_follow
+
+    client = create_client(session=session)
+    try:
+        return watch_and_follow(
+            email=account["email"],
+            password=account["password"],
+            max_trades=account["max_trades"],
+            client=client,
+        )
+    except Exception as e:
+        print(f"[{account['email']}] 运行失败: {e}")
+        return 0
+    finally:
+        # 只释放账号自己的资源（对冲线程池等），共享会话由 run_fleet_threads 关闭
+        client.close()
+
+
+def run_fleet_threads(accounts: list) -> dict:
+    """
+    在当前进程内用线程运行所有账号（同步引擎）
+
+    所有账号共用一个会话的连接池（按 HTTP_TRANSPORT 选择 requests 或 HTTP/2），token 和跟单数量按账号隔离。
+
+    Args:
+        accounts: load_accounts 返回的账号列表
+
+    Returns:
+        dict: 账号邮箱 -> 成功跟单数量
+    """
+    pool_size = max(20, len(accounts) * config.FOLLOW_CONCURRENCY)
+    session = create_shared_session(pool_size)
+    try:
+        with ThreadPoolExecutor(max_workers=len(accounts)) as pool:
+            counts = pool.map(lambda account: _run_account_sync(account, session), accounts)
+            return {account["email"]: count for account, count in zip(accounts, counts)}
+    finally:
+        session.close()
+
+
+async def run_fleet_async(accounts: list) -> dict:
+    """
+    在当前进程的事件循环中运行所有账号（异步引擎）
+
+    所有账号共用一个 httpx.AsyncClient 的连接池，每个账号只占用几个协程。
+
+    Args:
+        accounts: load_accounts 返回的账号列表
+
+    Returns:
+        dict: 账号邮箱 -> 成功跟单数量
+    """
+    from async_api_client import AsyncAPIClient, create_async_session
+    from async_trade import async_watch_and_follow
+
+    pool_size = max(20, len(accounts) * config.FOLLOW_CONCURRENCY)
+    session = create_async_session(max_connections=pool_size, max_keepalive_connections=pool_size)
+
+    async def run_account(account: dict) -> int:
+        client = AsyncAPIClient(session=session)
+        try:
+            return await async_watch_and_follow(
+                email=account["email"],
+                password=account["password"],
+                max_trades=account["max_trades"],
+                client=client,
+            )
+        except Exception as e:
+            print(f"[{account['email']}] 运行失败: {e}")
+            return 0
+        finally:
+            await client.close()
+
+    try:
+        counts = await asyncio.gather(*(run_account(account) for account in accounts))
+        return {account["email"]: count for account, count in zip(accounts, counts)}
+    finally:
+        await session.aclose()
+
+
+def run_fleet_in_process(accounts: list, engine: str = None, shared_rate: bool = False, worker: int = None) -> dict:
+    """
+    在当前进程内运行一组账号
+
+    Args:
+        accounts: 账号列表
+        engine: sync 或 async（可选，默认 config.ENGINE）
+        shared_rate: 是否与其他进程共享请求限流预算（多进程运行时由 run_fleet 开启）
+        worker: 多进程运行时的进程序号，指标导出到各自的 metrics-worker<序号>.* 文件
+
+    Returns:
+        dict: 账号邮箱 -> 成功跟单数量
+    """
+    if shared_rate:
+        config.RATE_SHARED = True
+    if worker is not None:
+        from metrics import get_metrics
+
+        get_metrics().instance = f"worker{worker}"
+    engine = engine or config.ENGINE
+    if engine == "async":
+        return asyncio.run(run_fleet_async(accounts))
+    return run_fleet_threads(accounts)
+
+
+def run_fleet(accounts: list, processes: int = 1, engine: str = None) -> dict:
+    """
+    运行多账号
+
+    processes 为 1 时所有账号在当前进程内运行；大于 1 时账号被均分到进程池，
+    每个进程内部仍共享连接池，进程之间通过文件共享请求限流预算。
+
+    Args:
+        accounts: 账号列表
+        processes: 进程数
+        engine: sync 或 async（可选，默认 config.ENGINE）
+
+    Returns:
+        dict: 账号邮箱 -> 成功跟单数量
+    """
+    if not accounts:
+        return {}
+
+    processes = max(1, min(processes, len(accounts)))
+    if processes == 1:
+        return run_fleet_in_process(accounts, engine)
+
+    chunks = [accounts[i::processes] for i in range(processes)]
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for chunk_result in pool.map(
+            run_fleet_in_process, chunks, [engine] * processes, [True] * processes, range(processes)
+        ):
+            results.update(chunk_result)
+    return results
+
+
+if __name__ == "__main__":
+    from utils import wait_until_scheduled
+
+    parser = argparse.ArgumentParser(description="多账号跟单")
+    parser.add_argument("--accounts", default=None, help="账号文件路径（默认 config.FLEET_FILE）")
+    parser.add_argument("--processes", type=int, default=config.FLEET_PROCESSES, help="进程数")
+    parser.add_argument("--engine", choices=["sync", "async"], default=None, help="跟单引擎")
+    args = parser.parse_args()
+
+    fleet_accounts = load_accounts(args.accounts)
+    print(f"共加载 {len(fleet_accounts)} 个账号")
+
+    wait_until_scheduled(config.SCHEDULE_TIME, config.ADVANCE_MINUTES)
+
+    summary = run_fleet(fleet_accounts, processes=args.processes, engine=args.engine)
+
+    print("\n========== 多账号汇总 ==========")
+    for email, count in summary.items():
+        print(f"{email}: 跟单 {count} 笔")
+    print("================================\n")
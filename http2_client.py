@@ -0,0 +1,102 @@
+"""
+HTTP/2 API 客户端 - 基于 httpx.Client，同一域名的并发请求复用一条连接（多路复用）
+
+接口与 APIClient 完全一致（post/get/set_token 等），通过 HTTP_TRANSPORT=http2 启用。
+HTTP/2 依赖可选的 h2 包（pip install "httpx[http2]"），未安装时回退到 HTTP/1.1。
+"""
+import importlib.util
+
+import httpx
+import requests
+import config
+from api_client import APIClient
+
+
+def http2_available() -> bool:
+    """
+    检查是否安装了 HTTP/2 所需的 h2 包
+
+    Returns:
+        bool: 是否可以启用 HTTP/2
+    """
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_http2_session(max_connections=20, max_keepalive_connections=10) -> httpx.Client:
+    """
+    创建 HTTP/2 会话，可在多个 HTTP2APIClient 之间共享
+
+    HTTP/2 只在 HTTPS（ALPN 协商）下生效，纯 HTTP 地址仍使用 HTTP/1.1。
+
+    Args:
+        max_connections: 连接池最大连接数
+        max_keepalive_connections: 保持活跃的空闲连接数
+
+    Returns:
+        httpx.Client: 配置好的会话
+    """
+    http2 = http2_available()
+    if not http2:
+        print("未安装 h2（pip install \"httpx[http2]\"），HTTP/2 传输回退到 HTTP/1.1")
+
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+    )
+    # httpx 不接受值为 None 的请求头（requests 会自动忽略）
+    headers = {k: v for k, v in config.COMMON_HEADERS.items() if v is not None}
+
+    return httpx.Client(
+        http2=http2,
+        limits=limits,
+        headers=headers,
+        verify=False,
+    )
+
+
+class HTTP2APIClient(APIClient):
+    """
+    HTTP/2 API 客户端
+
+    重试策略、token 失效重登、对冲读和指标记录都继承自 APIClient，这里只替换传输层；
+    httpx 的异常会转换为对应的 requests 异常，调用方无需区分传输实现。
+    """
+
+    def __init__(self, max_connections=20, max_keepalive_connections=10, session: httpx.Client = None, policies: dict = None):
+        """
+        初始化 HTTP/2 API 客户端
+
+        Args:
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 保持活跃的空闲连接数
+            session: 可选的共享会话（多账号共用连接），传入时不会在 close 时关闭
+            policies: 可选的端点 -> RetryPolicy 表，覆盖 retry_policy.DEFAULT_POLICIES
+        """
+        owns_session = session is None
+        if session is None:
+            session = create_http2_session(max_connections, max_keepalive_connections)
+        super().__init__(session=session, policies=policies)
+        self._owns_session = owns_session
+
+    def prepare(self, method: str, endpoint: str):
+        """httpx 发送时合并请求头的开销很小，不构建请求模板；预编码的请求体仍然跳过 JSON 序列化"""
+
+    def _send(
+        self, method: str, url: str, timeout: float, headers: dict = None, body: bytes = None, **kwargs
+    ) -> httpx.Response:
+        """发送一次 HTTP 请求（不重试），httpx 异常转换为 requests 异常"""
+        headers = {**self.headers, **headers} if headers else self.headers
+        if body is not None:
+            kwargs["content"] = body
+        try:
+            return self.session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(str(e)) from e
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    def _is_unsent_error(self, error: Exception) -> bool:
+        """连接未建立（ConnectError/ConnectTimeout）时请求确定未发出"""
+        return isinstance(error.__cause__, (httpx.ConnectError, httpx.ConnectTimeout))
@@ -0,0 +1,331 @@
+"""
+运行日志 - 把每次轮询、每次跟单、每次余额快照追加写入 SQLite（DATA_PATH/journal.db）
+
+- record_*() 只做入队，从不阻塞调用方；后台线程按批（JOURNAL_BATCH_SIZE 条或 JOURNAL_FLUSH_INTERVAL 秒）
+  在一个事务中写入；
+- 数据库使用 WAL 模式，写入时仍可用 sqlite3 命令行或其他进程查询；
+- 各表都有时间索引，跟单表另有 shareId 索引。
+
+查询示例：
+    sqlite3 data/journal.db "SELECT share_id, quantity, success, latency_ms FROM follows ORDER BY ts DESC LIMIT 10"
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import config
+from models import Balance, dumps
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS polls (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    account TEXT,
+    latency_ms REAL,
+    pages INTEGER,
+    items INTEGER,
+    new_items INTEGER,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS polls_ts ON polls (ts);
+
+CREATE TABLE IF NOT EXISTS follows (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    account TEXT,
+    share_id TEXT NOT NULL,
+    quantity REAL,
+    success INTEGER,
+    message TEXT,
+    create_time INTEGER,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS follows_ts ON follows (ts);
+CREATE INDEX IF NOT EXISTS follows_share_id ON follows (share_id);
+
+CREATE TABLE IF NOT EXISTS balances (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    account TEXT,
+    source TEXT,
+    usdt_total REAL,
+    usdt_available REAL,
+    usdt_unavailable REAL,
+    today_income TEXT
+);
+CREATE INDEX IF NOT EXISTS balances_ts ON balances (ts);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    account TEXT,
+    kind TEXT NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (kind, ts);
+"""
+
+INSERTS = {
+    "polls": "INSERT INTO polls (ts, account, latency_ms, pages, items, new_items, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "follows": (
+        "INSERT INTO follows (ts, account, share_id, quantity, success, message, create_time, latency_ms)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "balances": (
+        "INSERT INTO balances (ts, account, source, usdt_total, usdt_available, usdt_unavailable, today_income)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "snapshots": "INSERT INTO snapshots (ts, account, kind, data) VALUES (?, ?, ?, ?)",
+}
+
+
+class Journal:
+    """
+    SQLite 运行日志后台队列
+
+    - 连接只在后台线程中使用，调用方线程（包括事件循环）只入队
+    - flush()/close() 在截止时间内等待已入队的记录写入
+    """
+
+    def __init__(self, path: str | Path = None, batch_size: int = None, flush_interval: float = None):
+        """
+        Args:
+            path: 数据库路径（可选，默认 config.JOURNAL_FILE）
+            batch_size: 单个事务最多写入的记录数（可选，默认 config.JOURNAL_BATCH_SIZE）
+            flush_interval: 凑批的最长等待时间（秒，可选，默认 config.JOURNAL_FLUSH_INTERVAL）
+        """
+        self.path = Path(path or config.JOURNAL_FILE)
+        self.batch_size = batch_size or config.JOURNAL_BATCH_SIZE
+        self.flush_interval = config.JOURNAL_FLUSH_INTERVAL if flush_interval is None else flush_interval
+
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def _put(self, table: str, row: tuple):
+        if self._closed:
+            return
+        with self._idle:
+            self._pending += 1
+        self._queue.put((table, row))
+
+    def record_poll(
+        self,
+        account: str | None,
+        latency: float,
+        pages: int = 1,
+        items: int = 0,
+        new_items: int = 0,
+        status: str = "ok",
+    ):
+        """
+        记录一次交易列表轮询
+
+        Args:
+            account: 账号
+            latency: 耗时（秒，含翻页）
+            pages: 读取的页数（列表未变化时为 0）
+            items: 解析出的交易数
+            new_items: 需要跟单的新交易数
+            status: ok / unchanged / 错误类型
+        """
+        self._put("polls", (time.time(), account, latency * 1000, pages, items, new_items, status))
+
+    def record_follow(
+        self,
+        account: str | None,
+        share_id: str,
+        quantity: float,
+        success: bool,
+        message: str,
+        create_time: int = None,
+        latency: float = None,
+    ):
+        """
+        记录一次跟单尝试
+
+        Args:
+            account: 账号
+            share_id: 交易分享 ID
+            quantity: 跟单数量（USDT）
+            success: 是否成功
+            message: 平台返回的消息或异常描述
+            create_time: 分享创建时间（毫秒时间戳，可选）
+            latency: 跟单请求耗时（秒，可选）
+        """
+        latency_ms = None if latency is None else latency * 1000
+        self._put(
+            "follows",
+            (time.time(), account, share_id, float(quantity), int(success), message, create_time, latency_ms),
+        )
+
+    def record_balance(self, account: str | None, balance: Balance, source: str = "overview"):
+        """
+        记录一次余额快照
+
+        Args:
+            account: 账号
+            balance: parse_balance 的结果
+            source: 快照来源（bootstrap / reconcile / overview）
+        """
+        self._put(
+            "balances",
+            (
+                time.time(),
+                account,
+                source,
+                balance.usdt_total,
+                balance.usdt_available,
+                balance.usdt_unavailable,
+                balance.today_income,
+            ),
+        )
+
+    def record_snapshot(self, account: str | None, kind: str, data):
+        """
+        记录一份接口原始响应（用户信息、认证状态等）
+
+        Args:
+            account: 账号
+            kind: 类型（user_info / certification / funds_overview 等）
+            data: 响应 JSON
+        """
+        self._put("snapshots", (time.time(), account, kind, dumps(data).decode("utf-8")))
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 下 NORMAL 只在断电时可能丢失最后几个事务，不会损坏数据库
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _collect_batch(self) -> list | None:
+        """取出一批待写入记录，收到停止信号时返回 None"""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # 写完本批后再退出
+                break
+            batch.append(item)
+        return batch
+
+    def _write(self, conn: sqlite3.Connection, batch: list):
+        """在一个事务中按表批量写入"""
+        rows = {}
+        for table, row in batch:
+            rows.setdefault(table, []).append(row)
+        with conn:
+            for table, table_rows in rows.items():
+                conn.executemany(INSERTS[table], table_rows)
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            print(f"运行日志不可用: {e}")
+            conn = None
+        try:
+            while True:
+                batch = self._collect_batch()
+                if batch is None:
+                    return
+                try:
+                    if conn is not None:
+                        self._write(conn, batch)
+                except sqlite3.Error as e:
+                    print(f"运行日志写入失败（丢弃 {len(batch)} 条）: {e}")
+                finally:
+                    with self._idle:
+                        self._pending -= len(batch)
+                        self._idle.notify_all()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def flush(self, timeout: float = 5) -> bool:
+        """
+        等待已入队的记录写入
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            bool: 是否在截止时间内全部写入
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def close(self, timeout: float = 5):
+        """
+        在截止时间内写入剩余记录并停止后台线程
+
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+class NullJournal:
+    """关闭运行日志（JOURNAL=false）时使用，所有记录都被忽略"""
+
+    def record_poll(self, *args, **kwargs):
+        pass
+
+    def record_follow(self, *args, **kwargs):
+        pass
+
+    def record_balance(self, *args, **kwargs):
+        pass
+
+    def record_snapshot(self, *args, **kwargs):
+        pass
+
+    def flush(self, timeout: float = 5) -> bool:
+        return True
+
+    def close(self, timeout: float = 5):
+        pass
+
+
+_global_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal() -> Journal | NullJournal:
+    """
+    获取全局运行日志（进程退出时自动在截止时间内写入剩余记录）
+
+    Returns:
+        Journal | NullJournal: 全局运行日志，JOURNAL=false 时为 NullJournal
+    """
+    global _global_journal
+    with _journal_lock:
+        if _global_journal is None:
+            if config.JOURNAL:
+                _global_journal = Journal()
+                atexit.register(_global_journal.close)
+            else:
+                _global_journal = NullJournal()
+        return _global_journal
@@ -0,0 +1,270 @@
+"""
+余额账本 - 在本地维护可用余额，跟单数量随余额变化而不增加额外请求
+
+- 每次跟单前按仓位策略从账本预留数量，成功后在本地扣减，失败时归还；
+- 后台按固定间隔调用 funds_overview 与平台余额对账（充值、手续费、其他设备的操作），
+  跟单路径上从不请求余额；每次取得的平台余额都写入运行日志（journal）；
+- 启动时未能取得余额的账本余额未知（按 0 处理，不跟单），后台每 UNKNOWN_RETRY_INTERVAL 秒重试对账。
+
+仓位策略（config.SIZING_STRATEGY）：
+    percent  可用余额 × SIZING_PERCENT（默认，与原先的 1% 一致）
+    fixed    固定 SIZING_FIXED USDT
+    capped   可用余额 × SIZING_PERCENT，但不超过 SIZING_CAP USDT
+"""
+import asyncio
+import threading
+import time
+
+import config
+from journal import get_journal
+from metrics import get_metrics
+from models import Balance
+
+SIZING_STRATEGIES = ("percent", "fixed", "capped")
+
+# 余额未知时后台对账的重试间隔（秒）
+UNKNOWN_RETRY_INTERVAL = 5
+
+
+def size_quantity(
+    available: float,
+    strategy: str = None,
+    percent: float = None,
+    fixed: float = None,
+    cap: float = None,
+) -> float:
+    """
+    按仓位策略计算跟单数量
+
+    Args:
+        available: 可用余额（USDT）
+        strategy: 仓位策略（可选，默认 config.SIZING_STRATEGY）
+        percent: percent/capped 策略的比例（可选，默认 config.SIZING_PERCENT）
+        fixed: fixed 策略的数量（可选，默认 config.SIZING_FIXED）
+        cap: capped 策略的上限（可选，默认 config.SIZING_CAP）
+
+    Returns:
+        float: 跟单数量（USDT，保留两位小数，不超过可用余额，余额不足时为 0）
+    """
+    strategy = strategy or config.SIZING_STRATEGY
+    percent = config.SIZING_PERCENT if percent is None else percent
+    if strategy == "percent":
+        quantity = available * percent
+    elif strategy == "fixed":
+        quantity = config.SIZING_FIXED if fixed is None else fixed
+    elif strategy == "capped":
+        quantity = min(available * percent, config.SIZING_CAP if cap is None else cap)
+    else:
+        raise ValueError(f"未知的仓位策略: {strategy}（可选 {', '.join(SIZING_STRATEGIES)}）")
+    return round(max(0.0, min(quantity, available)), 2)
+
+
+class BalanceLedger:
+    """
+    单个账号的本地余额账本（线程安全）
+
+    reserve()/settle() 成对使用：预留的数量在结果返回前不再参与后续的仓位计算，
+    并发跟单时每笔都按扣除在途数量后的余额计算。
+    """
+
+    def __init__(self, balance: Balance | None, account: str = None, strategy: str = None):
+        """
+        Args:
+            balance: 启动时 parse_balance 的结果（未能取得时为 None，余额未知，等待后台对账）
+            account: 账号（可选，作为指标标签）
+            strategy: 仓位策略（可选，默认 config.SIZING_STRATEGY）
+        """
+        self.known = balance is not None
+        self.available = balance.usdt_available if balance is not None else 0.0
+        self.reserved = 0.0
+        self.account = account
+        self.strategy = strategy or config.SIZING_STRATEGY
+        self.drift = 0.0               # 最近一次对账时平台余额与账本的差
+        self.reconciled_at = time.time()
+        self._lock = threading.Lock()
+        self._seq = 0                  # 本地扣减的序号
+        self._debits = []              # 最近一次对账之后的扣减 (序号, 数量)
+        self._export()
+        if balance is not None:
+            get_journal().record_balance(account, balance, source="bootstrap")
+
+    def quantity(self) -> float:
+        """
+        Returns:
+            float: 按当前可用余额（扣除在途预留）计算的跟单数量
+        """
+        with self._lock:
+            return size_quantity(self.available - self.reserved, self.strategy)
+
+    def reserve(self) -> float:
+        """
+        为一笔跟单预留数量
+
+        Returns:
+            float: 预留的数量，余额不足时为 0（不预留）
+        """
+        with self._lock:
+            quantity = size_quantity(self.available - self.reserved, self.strategy)
+            if quantity > 0:
+                self.reserved += quantity
+            return quantity
+
+    def settle(self, quantity: float, success: bool):
+        """
+        结算一笔预留：成功时扣减可用余额，失败时归还
+
+        Args:
+            quantity: reserve 返回的数量
+            success: 跟单是否成功
+        """
+        with self._lock:
+            self.reserved = max(0.0, self.reserved - quantity)
+            if success:
+                self.available -= quantity
+                self._seq += 1
+                self._debits.append((self._seq, quantity))
+        self._export()
+
+    def marker(self) -> int:
+        """
+        在请求平台余额之前调用，用于区分响应之后才发生的本地扣减
+
+        Returns:
+            int: 当前扣减序号
+        """
+        with self._lock:
+            return self._seq
+
+    def reconcile(self, balance: Balance, marker: int) -> float:
+        """
+        用平台余额校正账本
+
+        请求发出之后的扣减可能尚未反映在响应中，按未反映处理（偏保守），多扣的部分在下次对账时补回。
+
+        Args:
+            balance: parse_balance 的结果
+            marker: 请求前 marker() 的返回值
+
+        Returns:
+            float: 校正量（平台余额 - 账本余额）
+        """
+        with self._lock:
+            later = sum(quantity for seq, quantity in self._debits if seq > marker)
+            corrected = balance.usdt_available - later
+            self.drift = corrected - self.available
+            self.available = corrected
+            self.known = True
+            self._debits = [(seq, quantity) for seq, quantity in self._debits if seq > marker]
+            self.reconciled_at = time.time()
+        self._export()
+        get_journal().record_balance(self.account, balance, source="reconcile")
+        return self.drift
+
+    def _export(self):
+        labels = {"account": self.account} if self.account else None
+        metrics = get_metrics()
+        metrics.set_gauge("balance_available", self.available, labels)
+        metrics.set_gauge("balance_drift", self.drift, labels)
+
+
+class BalanceReconciler:
+    """在后台线程中定期与 funds_overview 对账"""
+
+    def __init__(self, ledger: BalanceLedger, client=None, interval: float = None):
+        """
+        Args:
+            ledger: 余额账本
+            client: 可选的 API 客户端，默认使用全局客户端
+            interval: 对账间隔（秒，默认 config.BALANCE_RECONCILE_INTERVAL，0 表示不对账）
+        """
+        from api_client import get_client
+
+        self.ledger = ledger
+        self.client = client or get_client()
+        self.interval = config.BALANCE_RECONCILE_INTERVAL if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="balance-reconcile", daemon=True)
+
+    def start(self) -> "BalanceReconciler":
+        """启动后台对账线程（余额未知时即使不对账也启动，取得余额后退出）"""
+        if self.interval > 0 or not self.ledger.known:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止后台对账线程"""
+        self._stop.set()
+
+    def reconcile_once(self) -> float:
+        """
+        立即对账一次
+
+        Returns:
+            float: 校正量
+        """
+        from funds import funds_overview, parse_balance
+
+        known = self.ledger.known
+        marker = self.ledger.marker()
+        drift = self.ledger.reconcile(parse_balance(funds_overview(self.client)), marker)
+        report_reconcile(self.ledger, drift, known)
+        return drift
+
+    def _run(self):
+        while not self._stop.wait(next_reconcile_delay(self.ledger, self.interval)):
+            try:
+                self.reconcile_once()
+            except Exception as e:
+                print(f"余额对账失败: {e}")
+                # 熔断打开时等到探测时刻，不按重试间隔空转
+                self._stop.wait(getattr(e, "retry_after", 0))
+            if self.interval <= 0 and self.ledger.known:
+                return
+
+
+def next_reconcile_delay(ledger: BalanceLedger, interval: float) -> float:
+    """
+    Args:
+        ledger: 余额账本
+        interval: 对账间隔（秒，0 表示不对账）
+
+    Returns:
+        float: 距下一次对账的秒数（余额未知时不超过 UNKNOWN_RETRY_INTERVAL）
+    """
+    if ledger.known:
+        return interval
+    return min(interval, UNKNOWN_RETRY_INTERVAL) if interval > 0 else UNKNOWN_RETRY_INTERVAL
+
+
+def report_reconcile(ledger: BalanceLedger, drift: float, was_known: bool):
+    """打印对账结果：首次取得余额或校正量不小于 0.01 时"""
+    if not was_known:
+        print(f"已取得余额: 可用 {ledger.available:.2f} USDT，跟单数量 {ledger.quantity():.2f} USDT")
+    elif abs(drift) >= 0.01:
+        print(f"余额对账: 校正 {drift:+.2f} USDT，可用 {ledger.available:.2f} USDT")
+
+
+async def async_reconcile_loop(ledger: BalanceLedger, client, interval: float = None):
+    """
+    异步后台对账任务，语义同 BalanceReconciler
+
+    Args:
+        ledger: 余额账本
+        client: 异步 API 客户端
+        interval: 对账间隔（秒，默认 config.BALANCE_RECONCILE_INTERVAL，0 表示不对账）
+    """
+    from async_trade import funds_overview
+    from funds import parse_balance
+
+    interval = config.BALANCE_RECONCILE_INTERVAL if interval is None else interval
+    while interval > 0 or not ledger.known:
+        await asyncio.sleep(next_reconcile_delay(ledger, interval))
+        try:
+            known = ledger.known
+            marker = ledger.marker()
+            drift = ledger.reconcile(parse_balance(await funds_overview(client)), marker)
+            report_reconcile(ledger, drift, known)
+        except Exception as e:
+            print(f"余额对账失败: {e}")
+            # 熔断打开时等到探测时刻，不按重试间隔空转
+            await asyncio.sleep(getattr(e, "retry_after", 0))
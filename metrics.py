@@ -0,0 +1,436 @@
+"""
+性能指标 - 按端点统计请求延迟、重试次数和错误类型，以及分享创建到跟单确认的耗时
+
+导出为 DATA_PATH 下的 JSONL 快照（metrics.jsonl）和 Prometheus textfile（metrics.prom）。
+每个进程只有一个导出线程（start_exporter / stop_exporter）；多进程运行 fleet 时每个进程设置 instance，
+写入各自的 metrics-<instance>.jsonl / .prom，Prometheus 指标带 process 标签。
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import config
+
+# 延迟分桶上界（秒），覆盖本地请求到慢速跨境请求
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75,
+    1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0, 120.0,
+)
+
+
+class Histogram:
+    """固定分桶直方图，内存占用恒定，分位数由分桶线性插值估算"""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets: 递增的分桶上界（秒）
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """
+        记录一个观测值
+
+        Args:
+            value: 观测值（秒）
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        估算分位数
+
+        Args:
+            q: 分位（0~1）
+
+        Returns:
+            float: 估算值（秒），无数据时返回 0
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: count, sum, max, p50, p95, p99
+        """
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": round(self.quantile(0.50), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+
+class Metrics:
+    """线程安全的指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency: dict[str, Histogram] = {}
+        self.attempt_latency: dict[str, Histogram] = {}  # 单次发送的耗时（不含重试和退避）
+        self.request_count: dict[str, int] = {}
+        self.retry_count: dict[str, int] = {}
+        self.error_count: dict[tuple, int] = {}  # (endpoint, 错误类型) -> 次数
+        self.detect_latency = Histogram()        # 分享创建 -> 被轮询发现
+        self.follow_latency = Histogram()        # 分享创建 -> 跟单确认
+        self.gauges: dict[tuple, float] = {}     # (名称, 标签) -> 当前值
+        self.started_at = time.time()
+        # 多进程运行时的进程标识（文件名后缀和 process 标签），单进程时为 None
+        self.instance = None
+
+    def _default_path(self, suffix: str) -> Path:
+        name = f"metrics-{self.instance}" if self.instance else "metrics"
+        return config.DATA_PATH / f"{name}{suffix}"
+
+    def observe_request(self, endpoint: str, seconds: float, retries: int = 0, error: str = None):
+        """
+        记录一次 API 请求
+
+        Args:
+            endpoint: API 端点路径
+            seconds: 耗时（秒，含重试）
+            retries: 重试次数
+            error: 错误类型（成功时为 None）
+        """
+        with self._lock:
+            histogram = self.request_latency.get(endpoint)
+            if histogram is None:
+                histogram = self.request_latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+            self.request_count[endpoint] = self.request_count.get(endpoint, 0) + 1
+            if retries:
+                self.retry_count[endpoint] = self.retry_count.get(endpoint, 0) + retries
+            if error:
+                key = (endpoint, error)
+                self.error_count[key] = self.error_count.get(key, 0) + 1
+
+    def observe_attempt(self, endpoint: str, seconds: float):
+        """
+        记录一次单独发送的耗时（对冲时机的依据）
+
+        Args:
+            endpoint: API 端点路径
+            seconds: 从发出到收到响应（或超时、被取消）的耗时（秒）
+        """
+        with self._lock:
+            histogram = self.attempt_latency.get(endpoint)
+            if histogram is None:
+                histogram = self.attempt_latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+
+    def observe_detect(self, create_time_ms: int):
+        """
+        记录分享从创建到被轮询发现的耗时
+
+        Args:
+            create_time_ms: 分享的 createTime（毫秒时间戳）
+        """
+        with self._lock:
+            self.detect_latency.observe(max(0.0, time.time() - create_time_ms / 1000))
+
+    def observe_follow(self, create_time_ms: int):
+        """
+        记录分享从创建到跟单被确认的耗时
+
+        Args:
+            create_time_ms: 分享的 createTime（毫秒时间戳）
+        """
+        with self._lock:
+            self.follow_latency.observe(max(0.0, time.time() - create_time_ms / 1000))
+
+    def set_gauge(self, name: str, value: float, labels: dict = None):
+        """
+        设置一个瞬时值指标
+
+        Args:
+            name: 指标名称（导出为 trade_<name>）
+            value: 当前值
+            labels: 可选的标签
+        """
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def attempt_p95(self, endpoint: str) -> float | None:
+        """
+        获取端点单次发送的 p95 延迟（不含重试和退避，与 request_latency 不同）
+
+        Args:
+            endpoint: API 端点路径
+
+        Returns:
+            float | None: p95（秒），尚无数据时返回 None
+        """
+        with self._lock:
+            histogram = self.attempt_latency.get(endpoint)
+            if histogram is None or histogram.count == 0:
+                return None
+            return histogram.quantile(0.95)
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: 当前所有指标的快照
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint, histogram in self.request_latency.items():
+                errors = {
+                    error: count
+                    for (error_endpoint, error), count in self.error_count.items()
+                    if error_endpoint == endpoint
+                }
+                endpoints[endpoint] = {
+                    "requests": self.request_count.get(endpoint, 0),
+                    "retries": self.retry_count.get(endpoint, 0),
+                    "errors": errors,
+                    "latency": histogram.snapshot(),
+                }
+                if endpoint in self.attempt_latency:
+                    endpoints[endpoint]["attempt_latency"] = self.attempt_latency[endpoint].snapshot()
+            return {
+                "time": time.time(),
+                "uptime": round(time.time() - self.started_at, 3),
+                "pid": os.getpid(),
+                "endpoints": endpoints,
+                "share_detect_latency": self.detect_latency.snapshot(),
+                "share_follow_latency": self.follow_latency.snapshot(),
+                "gauges": {
+                    name + "".join(f",{k}={v}" for k, v in labels): value
+                    for (name, labels), value in self.gauges.items()
+                },
+            }
+
+    def export_jsonl(self, path: str | Path = None):
+        """
+        追加一行 JSON 快照，文件超过 config.METRICS_MAX_BYTES 时先轮转为 <文件名>.1
+
+        Args:
+            path: 文件路径（可选，默认 DATA_PATH/metrics.jsonl，设置 instance 时为 metrics-<instance>.jsonl）
+        """
+        path = Path(path or self._default_path(".jsonl"))
+        line = json.dumps(self.snapshot(), ensure_ascii=False)
+        try:
+            if path.stat().st_size >= config.METRICS_MAX_BYTES:
+                os.replace(path, path.with_name(f"{path.name}.1"))
+        except FileNotFoundError:
+            pass
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _prometheus_histogram(self, lines: list, name: str, histogram: Histogram, labels: str = ""):
+        cumulative = 0
+        sep = "," if labels else ""
+        for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+        label_set = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{label_set} {histogram.sum}")
+        lines.append(f"{name}_count{label_set} {histogram.count}")
+
+    def prometheus_text(self) -> str:
+        """
+        Returns:
+            str: Prometheus 文本格式的指标
+        """
+        lines = []
+        # 多进程时每个序列都带 process 标签，避免 textfile collector 合并时冲突
+        process = f'process="{self.instance}"' if self.instance else ""
+        with self._lock:
+            lines.append("# HELP trade_request_duration_seconds API request latency including retries.")
+            lines.append("# TYPE trade_request_duration_seconds histogram")
+            for endpoint, histogram in sorted(self.request_latency.items()):
+                self._prometheus_histogram(
+                    lines, "trade_request_duration_seconds", histogram, _join_labels(process, f'endpoint="{endpoint}"')
+                )
+
+            lines.append("# HELP trade_request_attempt_duration_seconds Latency of a single send, without retries.")
+            lines.append("# TYPE trade_request_attempt_duration_seconds histogram")
+            for endpoint, histogram in sorted(self.attempt_latency.items()):
+                self._prometheus_histogram(
+                    lines,
+                    "trade_request_attempt_duration_seconds",
+                    histogram,
+                    _join_labels(process, f'endpoint="{endpoint}"'),
+                )
+
+            lines.append("# HELP trade_request_retries_total Retries performed per endpoint.")
+            lines.append("# TYPE trade_request_retries_total counter")
+            for endpoint in sorted(self.request_latency):
+                label_set = _join_labels(process, f'endpoint="{endpoint}"')
+                lines.append(f"trade_request_retries_total{{{label_set}}} {self.retry_count.get(endpoint, 0)}")
+
+            lines.append("# HELP trade_request_errors_total Failed requests per endpoint and error class.")
+            lines.append("# TYPE trade_request_errors_total counter")
+            for (endpoint, error), count in sorted(self.error_count.items()):
+                label_set = _join_labels(process, f'endpoint="{endpoint}"', f'error="{error}"')
+                lines.append(f"trade_request_errors_total{{{label_set}}} {count}")
+
+            lines.append("# HELP trade_share_detect_latency_seconds Share createTime to detection by a poll.")
+            lines.append("# TYPE trade_share_detect_latency_seconds histogram")
+            self._prometheus_histogram(lines, "trade_share_detect_latency_seconds", self.detect_latency, process)
+
+            lines.append("# HELP trade_share_follow_latency_seconds Share createTime to follow acknowledged.")
+            lines.append("# TYPE trade_share_follow_latency_seconds histogram")
+            self._prometheus_histogram(lines, "trade_share_follow_latency_seconds", self.follow_latency, process)
+
+            declared = set()
+            for (name, labels), value in sorted(self.gauges.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE trade_{name} gauge")
+                    declared.add(name)
+                label_set = _join_labels(process, *(f'{k}="{v}"' for k, v in labels))
+                lines.append(f"trade_{name}{{{label_set}}} {value}" if label_set else f"trade_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path: str | Path = None):
+        """
+        原子写入 Prometheus textfile（供 node_exporter textfile collector 采集）
+
+        Args:
+            path: 文件路径（可选，默认 DATA_PATH/metrics.prom，设置 instance 时为 metrics-<instance>.prom）
+        """
+        path = Path(path or self._default_path(".prom"))
+        # 临时文件按进程区分，多个进程写同一目录时不会互相覆盖
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def export(self):
+        """同时导出 JSONL 快照和 Prometheus textfile，失败不影响主流程"""
+        try:
+            self.export_jsonl()
+            self.export_prometheus()
+        except OSError as e:
+            print(f"导出指标失败: {e}")
+
+
+def _join_labels(*labels: str) -> str:
+    return ",".join(label for label in labels if label)
+
+
+class MetricsExporter:
+    """后台线程按固定间隔导出指标（跟单流程请使用 start_exporter，每个进程只运行一个）"""
+
+    def __init__(self, metrics: Metrics, interval: float = None):
+        """
+        Args:
+            metrics: 指标注册表
+            interval: 导出间隔（秒，默认 config.METRICS_EXPORT_INTERVAL）
+        """
+        self.metrics = metrics
+        self.interval = interval or config.METRICS_EXPORT_INTERVAL
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+
+    def start(self) -> "MetricsExporter":
+        """启动导出线程"""
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止导出线程并立即导出一次"""
+        self._stop.set()
+        self.metrics.export()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.metrics.export()
+
+
+_global_metrics = None
+_metrics_lock = threading.Lock()
+_export_enabled = False
+
+
+def get_metrics() -> Metrics:
+    """
+    获取全局指标注册表
+
+    Returns:
+        Metrics: 全局指标注册表
+    """
+    global _global_metrics
+    with _metrics_lock:
+        if _global_metrics is None:
+            _global_metrics = Metrics()
+        return _global_metrics
+
+
+def enable_export():
+    """
+    开启指标文件导出（常驻模式调用；METRICS_EXPORT=true 时由 start_exporter 开启），进程退出时再导出一次
+
+    未开启时指标只保存在内存中，一次性的命令行运行不会写入 DATA_PATH。
+    """
+    global _export_enabled
+    metrics = get_metrics()
+    with _metrics_lock:
+        if not _export_enabled:
+            _export_enabled = True
+            atexit.register(metrics.export)
+
+
+_exporter = None
+_exporter_users = 0
+_exporter_lock = threading.Lock()
+
+
+def start_exporter() -> MetricsExporter:
+    """
+    启动进程内共享的指标导出线程（多个账号共用一个，按引用计数），
+    返回值不为 None 时与 stop_exporter() 成对调用
+
+    Returns:
+        MetricsExporter | None: 导出线程，未开启导出（见 enable_export）时为 None
+    """
+    global _exporter, _exporter_users
+    if config.METRICS_EXPORT:
+        enable_export()
+    if not _export_enabled:
+        return None
+    metrics = get_metrics()
+    with _exporter_lock:
+        if _exporter_users == 0:
+            _exporter = MetricsExporter(metrics).start()
+        _exporter_users += 1
+        return _exporter
+
+
+def stop_exporter():
+    """释放 start_exporter() 的引用，最后一个使用者退出时停止导出线程并导出一次"""
+    global _exporter, _exporter_users
+    with _exporter_lock:
+        if _exporter_users == 0:
+            return
+        _exporter_users -= 1
+        if _exporter_users == 0:
+            _exporter.stop()
+            _exporter = None
@@ -0,0 +1,377 @@
+"""
+本地模拟交易所 - 实现登录、用户信息、余额、交易列表和跟单接口，用于基准测试
+
+可配置延迟、随机错误、429 限流和 token 过期，不会访问真实平台。
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EXPIRED_RESPONSE = {
+    "resultCode": False,
+    "errCode": 100007,
+    "errCodeDes": "Invalid credentials used or login expired",
+}
+
+
+class MockExchange:
+    """
+    模拟交易所状态与 HTTP 服务
+
+    示例：
+        >>> with MockExchange(latency=0.05) as exchange:
+        ...     config.BASE_URL = exchange.url
+        ...     exchange.add_share()
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1,
+        token_ttl: float = None,
+        page_size: int = 10,
+        available: float = 1000.0,
+        etag: bool = False,
+        max_rps: float = 0.0,
+    ):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口（0 表示自动分配）
+            latency: 每个请求的固定延迟（秒）
+            jitter: 叠加在延迟上的随机抖动上限（秒）
+            error_rate: 返回 HTTP 500 的概率
+            rate_limit_rate: 返回 HTTP 429 的概率
+            retry_after: 429 响应中 Retry-After 的秒数
+            token_ttl: token 有效期（秒），None 表示永不过期
+            page_size: 交易列表默认每页条数
+            available: 每个账号的初始可用余额（USDT）
+            etag: 交易列表是否返回 ETag 并支持 If-None-Match 条件请求
+            max_rps: 服务端每秒最多处理的请求数，超出时返回 429（0 表示不限）
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.page_size = page_size
+        self.available = available
+        self.etag = etag
+        self.max_rps = max_rps
+
+        self.lock = threading.Lock()
+        self.tokens = {}       # token -> (email, issued_at)
+        self.balances = {}     # email -> 可用余额
+        self.shares = []       # 按创建时间倒序
+        self.follows = []      # 跟单记录
+        self.followed = set()  # (email, shareId)
+        self.hooks = []        # 收到的 Webhook 消息
+        self.counts = {}       # 端点 -> 请求次数
+        self.first_request_at = {}  # 端点 -> 首次请求时间
+        self.accepted = deque()     # 最近 1 秒内放行的请求时间（max_rps 限流）
+        self.throttled = 0          # 因超过 max_rps 返回 429 的次数
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """服务地址，可直接作为 config.BASE_URL"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockExchange":
+        """在后台线程启动服务"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-exchange", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def add_share(self, title: str = None) -> dict:
+        """
+        发布一条新的交易分享
+
+        Args:
+            title: 标题（可选）
+
+        Returns:
+            dict: 新分享，包含 shareId, title, createTime
+        """
+        share_id = uuid.uuid4().hex[:16]
+        share = {
+            "shareId": share_id,
+            "title": title or f"mock-{share_id[:6]}",
+            "createTime": int(time.time() * 1000),
+        }
+        with self.lock:
+            self.shares.insert(0, share)
+        return share
+
+    def reset(self):
+        """清空分享、跟单和统计数据（保留 token）"""
+        with self.lock:
+            self.shares.clear()
+            self.follows.clear()
+            self.followed.clear()
+            self.hooks.clear()
+            self.counts.clear()
+            self.first_request_at.clear()
+
+    def expire_tokens(self):
+        """立即让所有已签发的 token 失效"""
+        with self.lock:
+            self.tokens.clear()
+
+    def _authenticate(self, token: str) -> str | None:
+        with self.lock:
+            entry = self.tokens.get(token)
+        if entry is None:
+            return None
+        email, issued_at = entry
+        if self.token_ttl is not None and time.time() - issued_at > self.token_ttl:
+            return None
+        return email
+
+    def _over_limit(self, now: float) -> bool:
+        """按最近 1 秒内放行的请求数判断是否超过 max_rps"""
+        with self.lock:
+            while self.accepted and self.accepted[0] <= now - 1:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.max_rps:
+                self.throttled += 1
+                return True
+            self.accepted.append(now)
+            return False
+
+    def handle(self, method: str, path: str, headers, body: dict) -> tuple:
+        """
+        处理一个请求
+
+        Returns:
+            tuple: (HTTP 状态码, 额外响应头, 响应 JSON)，响应 JSON 为 None 时没有响应体
+        """
+        received_at = time.time()
+        with self.lock:
+            self.counts[path] = self.counts.get(path, 0) + 1
+            self.first_request_at.setdefault(path, received_at)
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if path == "/hook":
+            with self.lock:
+                self.hooks.append(body)
+            return 200, {}, {"code": 0}
+
+        if self.max_rps and self._over_limit(received_at):
+            return 429, {"Retry-After": str(self.retry_after)}, {"resultCode": False, "errCodeDes": "Too Many Requests"}
+        if self.rate_limit_rate and random.random() < self.rate_limit_rate:
+            return 429, {"Retry-After": str(self.retry_after)}, {"resultCode": False, "errCodeDes": "Too Many Requests"}
+        if self.error_rate and random.random() < self.error_rate:
+            return 500, {}, {"resultCode": False, "errCodeDes": "Internal Server Error"}
+
+        if path == "/user/login":
+            email = body.get("email")
+            if not email or not body.get("password"):
+                return 200, {}, {"resultCode": False, "errCodeDes": "Invalid email or password"}
+            token = uuid.uuid4().hex
+            with self.lock:
+                self.tokens[token] = (email, time.time())
+                self.balances.setdefault(email, self.available)
+            return 200, {}, {"resultCode": True, "data": token}
+
+        email = self._authenticate(headers.get("app-login-token"))
+        if email is None:
+            return 200, {}, EXPIRED_RESPONSE
+
+        if path == "/user/get/info":
+            return 200, {}, {"resultCode": True, "data": {"email": email, "loginIp": "127.0.0.1"}}
+
+        if path == "/user/certification/status":
+            return 200, {}, {"resultCode": True, "data": {"status": "PASSED"}}
+
+        if path == "/funds/overview":
+            with self.lock:
+                available = self.balances[email]
+            return 200, {}, {
+                "resultCode": True,
+                "data": {
+                    "usdtTotal": available,
+                    "usdtAvailable": available,
+                    "usdtUnavailable": 0.0,
+                    "todayIncome": "0",
+                },
+            }
+
+        if path == "/second/share/user/list":
+            payload = self._list(body)
+            if not self.etag:
+                return 200, {}, payload
+            etag = '"' + hashlib.sha1(json.dumps(payload).encode("utf-8")).hexdigest() + '"'
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, None
+            return 200, {"ETag": etag}, payload
+
+        if path == "/second/share/user/follow":
+            return 200, {}, self._follow(email, body, received_at)
+
+        return 404, {}, {"resultCode": False, "errCodeDes": "Not Found"}
+
+    def _list(self, body: dict) -> dict:
+        page_num = max(1, int(body.get("pageNum") or 1))
+        page_size = int(body.get("pageSize") or self.page_size)
+        with self.lock:
+            shares = list(self.shares)
+        total = len(shares)
+        total_pages = max(1, -(-total // page_size))
+        content = shares[(page_num - 1) * page_size:page_num * page_size]
+        return {
+            "resultCode": True,
+            "data": {
+                "showAll": [],
+                "page": {
+                    "content": content,
+                    "number": page_num,
+                    "size": page_size,
+                    "totalElements": total,
+                    "totalPages": total_pages,
+                    "last": page_num >= total_pages,
+                },
+            },
+        }
+
+    def _follow(self, email: str, body: dict, received_at: float) -> dict:
+        share_id = body.get("shareId")
+        quantity = float(body.get("quantity") or 0)
+        with self.lock:
+            share = next((s for s in self.shares if s["shareId"] == share_id), None)
+            if share is None:
+                return {"resultCode": False, "errCodeDes": "Share not found"}
+            if (email, share_id) in self.followed:
+                return {"resultCode": False, "errCodeDes": "Already followed"}
+            if quantity <= 0 or quantity > self.balances[email]:
+                return {"resultCode": False, "errCodeDes": "Insufficient balance"}
+            self.balances[email] -= quantity
+            self.followed.add((email, share_id))
+            self.follows.append({
+                "email": email,
+                "shareId": share_id,
+                "quantity": quantity,
+                "createTime": share["createTime"],
+                "received_at": received_at,
+                "acked_at": time.time(),
+            })
+        return {"resultCode": True, "errCodeDes": "Success"}
+
+    def _handler_class(self):
+        exchange = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头和响应体分两次写出，开启 Nagle 时会与客户端的延迟 ACK 叠加出约 40ms 的额外延迟
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _dispatch(self, method: str):
+                path = self.path.split("?", 1)[0]
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else {}
+                except json.JSONDecodeError:
+                    body = {}
+
+                status, extra_headers, payload = exchange.handle(method, path, self.headers, body)
+
+                data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in extra_headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端已超时断开（例如被对冲请求取代）
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_HEAD(self):
+                # 保活探测，只计数（counts["HEAD"]）
+                with exchange.lock:
+                    exchange.counts["HEAD"] = exchange.counts.get("HEAD", 0) + 1
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟交易所")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机抖动上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="HTTP 429 概率")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="每秒最多处理的请求数，超出返回 429")
+    parser.add_argument("--token-ttl", type=float, default=None, help="token 有效期（秒）")
+    parser.add_argument("--etag", action="store_true", help="交易列表返回 ETag 并支持条件请求")
+    parser.add_argument("--share-interval", type=float, default=0.0, help="自动发布分享的间隔（秒），0 表示不发布")
+    args = parser.parse_args()
+
+    mock = MockExchange(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_rps=args.max_rps,
+        token_ttl=args.token_ttl,
+        etag=args.etag,
+    ).start()
+    print(f"模拟交易所已启动: {mock.url}（BASE_URL={mock.url}）")
+
+    try:
+        while True:
+            if args.share_interval > 0:
+                time.sleep(args.share_interval)
+                share = mock.add_share()
+                print(f"发布分享: {share['shareId']}")
+            else:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
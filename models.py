@@ -0,0 +1,137 @@
+"""
+数据模型 - 交易、余额、跟单结果和用户信息，以及统一的 JSON 解码层
+
+模型是带 __slots__ 的数据类：轮询热路径使用属性访问而不是字符串键查找，
+每个实例也不再携带 __dict__。安装了 orjson 时用它编解码 JSON（pip install orjson），
+否则回退到标准库 json。
+"""
+import json
+from dataclasses import dataclass
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 当前使用的 JSON 解码后端
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def loads(body: bytes | str):
+    """
+    解码 JSON
+
+    Args:
+        body: 响应体（bytes 或 str）
+
+    Returns:
+        解码后的对象
+
+    Raises:
+        ValueError: 不是合法的 JSON
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def dumps(obj) -> bytes:
+    """
+    编码 JSON（紧凑格式）
+
+    Args:
+        obj: 需要编码的对象
+
+    Returns:
+        bytes: UTF-8 编码的 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_response(response):
+    """
+    解码 requests 或 httpx 响应的 JSON 响应体
+
+    Args:
+        response: requests.Response 或 httpx.Response
+
+    Returns:
+        解码后的对象
+    """
+    return loads(response.content)
+
+
+@dataclass(slots=True)
+class Trade:
+    """交易分享"""
+
+    id: str
+    title: str | None
+    create_time: int  # 创建时间（毫秒时间戳），缺失时为 0
+
+
+@dataclass(slots=True)
+class Balance:
+    """钱包余额"""
+
+    usdt_total: float
+    usdt_available: float
+    usdt_unavailable: float
+    today_income: str
+
+    @classmethod
+    def from_data(cls, data: dict) -> "Balance":
+        """
+        Args:
+            data: /funds/overview 响应中的 data
+
+        Returns:
+            Balance: 余额
+        """
+        return cls(
+            data.get("usdtTotal", 0.0),
+            data.get("usdtAvailable", 0.0),
+            data.get("usdtUnavailable", 0.0),
+            data.get("todayIncome", "0"),
+        )
+
+
+@dataclass(slots=True)
+class FollowResult:
+    """跟单结果"""
+
+    success: bool
+    message: str
+
+    @classmethod
+    def from_response(cls, result: dict) -> "FollowResult":
+        """
+        Args:
+            result: /second/share/user/follow 的完整响应
+
+        Returns:
+            FollowResult: 跟单结果
+        """
+        return cls(bool(result.get("resultCode", False)), result.get("errCodeDes", "Unknown"))
+
+
+@dataclass(slots=True)
+class UserInfo:
+    """用户信息"""
+
+    email: str | None
+    login_ip: str | None
+
+    @classmethod
+    def from_data(cls, data: dict | None) -> "UserInfo":
+        """
+        Args:
+            data: /user/get/info 响应中的 data（可为空）
+
+        Returns:
+            UserInfo: 用户信息，缺失的字段为 None
+        """
+        data = data or {}
+        return cls(data.get("email"), data.get("loginIp"))
@@ -0,0 +1,185 @@
+"""
+通知管道 - 在后台线程发送飞书 Webhook，跟单路径只负责入队
+"""
+import atexit
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+
+# 合并消息之间的分隔线
+SEPARATOR = "\n" + "─" * 20 + "\n"
+
+
+class FeishuNotifier:
+    """
+    飞书通知后台队列
+
+    - notify() 只做入队，从不阻塞调用方
+    - 后台线程使用独立的连接池会话发送，失败时按指数退避有限次重试
+    - coalesce_window 秒内到达的多条消息合并成一条发送（最多 max_batch 条）
+    - flush()/close() 在截止时间内等待剩余消息发送完毕
+    """
+
+    def __init__(
+        self,
+        webhook_url: str = None,
+        max_retries: int = 3,
+        coalesce_window: float = 1.0,
+        max_batch: int = 10,
+        timeout: float = 10,
+    ):
+        """
+        Args:
+            webhook_url: 飞书机器人 Webhook 地址（可选，默认 config.FEISHU_WEBHOOK_URL）
+            max_retries: 单条消息的最大重试次数
+            coalesce_window: 合并消息的时间窗口（秒）
+            max_batch: 单次合并的最大消息数
+            timeout: 单次请求超时时间（秒）
+        """
+        self.webhook_url = webhook_url or config.FEISHU_WEBHOOK_URL
+        self.max_retries = max_retries
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="feishu-notifier", daemon=True)
+        self._thread.start()
+
+    def notify(self, content: str):
+        """
+        提交一条通知（立即返回）
+
+        Args:
+            content: 消息内容
+        """
+        if not self.webhook_url or self._closed:
+            return
+        with self._idle:
+            self._pending += 1
+        self._queue.put(content)
+
+    def _collect_batch(self) -> list | None:
+        """取出一批待发送消息，收到停止信号时返回 None"""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.coalesce_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # 发送完本批后再退出
+                break
+            batch.append(item)
+        return batch
+
+    def _send(self, content: str) -> bool:
+        """发送一条消息，按指数退避重试"""
+        payload = {
+            "msg_type": "text",
+            "content": {
+                "text": content
+            }
+        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+            except Exception as e:
+                error = e
+            else:
+                try:
+                    body = response.json()
+                except ValueError:
+                    # 2xx 但响应体不是 JSON：消息已送达，重发会产生重复通知
+                    return True
+                # 飞书在 HTTP 200 中用 code 表示业务错误（例如限流）
+                if not isinstance(body, dict) or body.get("code", 0) == 0:
+                    return True
+                error = body.get("msg")
+            if attempt < self.max_retries:
+                time.sleep(min(2 ** attempt, 8))
+        print(f"飞书消息发送失败: {error}")
+        return False
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+            try:
+                self._send(SEPARATOR.join(batch))
+            finally:
+                with self._idle:
+                    self._pending -= len(batch)
+                    self._idle.notify_all()
+
+    def flush(self, timeout: float = 15) -> bool:
+        """
+        等待已提交的通知发送完毕
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            bool: 是否在截止时间内全部发送完毕
+        """
+        with self._idle:
+            done = self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+        if not done:
+            print(f"通知发送超时，仍有 {self._pending} 条未发送")
+        return done
+
+    def close(self, timeout: float = 15):
+        """
+        在截止时间内发送剩余通知并停止后台线程
+
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        if self._closed:
+            return
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        self._queue.put(None)
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        self.session.close()
+
+
+_global_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier() -> FeishuNotifier:
+    """
+    获取全局通知器（进程退出时自动在截止时间内发送剩余通知）
+
+    Returns:
+        FeishuNotifier: 全局通知器实例
+    """
+    global _global_notifier
+    with _notifier_lock:
+        if _global_notifier is None:
+            _global_notifier = FeishuNotifier()
+            atexit.register(_global_notifier.close)
+        return _global_notifier
@@ -0,0 +1,197 @@
+"""
+自适应轮询调度 - 在每个账号的请求预算内决定下一次轮询交易列表的时间
+
+- 预算：每分钟最多 POLL_BUDGET_RPM 次列表请求（含翻页），按最近 60 秒的滑动窗口计算；
+- 交易时段开始前后 POLL_BOOST_MINUTES 分钟内、以及刚发现新分享之后，按预算允许的最短间隔轮询；
+- 之后长时间没有新分享时，间隔每过 POLL_BOOST_MINUTES 分钟翻倍，直到 POLL_IDLE_INTERVAL；
+- 列表请求返回 429/5xx 或连接失败时按指数退避，服务端给出 Retry-After 时至少等待该时长；
+- 列表接口熔断时等到熔断器下一次探测的时间。
+"""
+import random
+import time
+from collections import deque
+
+import httpx
+
+import config
+from circuit_breaker import CircuitOpen
+from metrics import get_metrics
+from retry_policy import parse_retry_after
+
+# 每次等待时间的随机抖动比例
+JITTER = 0.1
+# 需要退避的 HTTP 状态码（其他 4xx 不是过载，按正常间隔继续轮询）
+BACKOFF_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def error_status(error: Exception) -> int | None:
+    """
+    Args:
+        error: requests 或 httpx 抛出的异常
+
+    Returns:
+        int | None: HTTP 状态码，不是状态码错误时返回 None
+    """
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_overload_error(error: Exception) -> bool:
+    """
+    判断轮询错误是否需要退避
+
+    Args:
+        error: 轮询抛出的异常
+
+    Returns:
+        bool: 429/5xx、超时（含 DeadlineExceeded）或连接失败时为 True；
+        列表接口返回失败（resultCode 为假）等其他错误为 False
+    """
+    status = error_status(error)
+    if status is not None:
+        return status in BACKOFF_STATUSES
+    # requests 的异常和 DeadlineExceeded 都是 OSError 的子类
+    return isinstance(error, (OSError, httpx.TransportError))
+
+
+def error_retry_after(error: Exception) -> float | None:
+    """
+    Args:
+        error: requests 或 httpx 抛出的异常
+
+    Returns:
+        float | None: 响应头 Retry-After 给出的等待秒数，没有时返回 None
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    return parse_retry_after(response.headers.get("Retry-After"))
+
+
+class PollScheduler:
+    """
+    单个账号的轮询调度（由一个轮询循环独占使用）
+
+    每次轮询后调用 record()（成功）或 record_error()（失败），再按 next_delay() 等待。
+    """
+
+    def __init__(
+        self,
+        budget_rpm: float = None,
+        window_start: float = None,
+        boost_minutes: float = None,
+        idle_interval: float = None,
+        max_backoff: float = None,
+        account: str = None,
+        interval: tuple = None,
+    ):
+        """
+        Args:
+            budget_rpm: 每分钟最多的列表请求数（可选，默认 config.POLL_BUDGET_RPM）
+            window_start: 交易时段开始时间（Unix 时间戳，可选，默认当前时间）
+            boost_minutes: 时段开始前后、发现新分享后的加速时长（分钟，可选，默认 config.POLL_BOOST_MINUTES）
+            idle_interval: 空闲时的最长轮询间隔（秒，可选，默认 config.POLL_IDLE_INTERVAL）
+            max_backoff: 出错退避的上限（秒，可选，默认 config.POLL_MAX_BACKOFF）
+            account: 账号（可选，作为指标标签）
+            interval: 可选的固定间隔范围（秒），指定后不再自适应和限制预算，只保留出错退避
+        """
+        self.budget_rpm = budget_rpm or config.POLL_BUDGET_RPM
+        self.window_start = time.time() if window_start is None else window_start
+        self.boost = (config.POLL_BOOST_MINUTES if boost_minutes is None else boost_minutes) * 60
+        self.idle_interval = idle_interval or config.POLL_IDLE_INTERVAL
+        self.max_backoff = max_backoff or config.POLL_MAX_BACKOFF
+        self.account = account
+        self.interval = interval
+        self.min_interval = 60 / self.budget_rpm
+        self.last_activity = None           # 最近一次发现新分享的时间
+        self.failures = 0                   # 连续出错次数
+        self.retry_after = None             # 最近一次出错时服务端要求的等待秒数
+        self._sent = deque()                # 最近 60 秒内列表请求的时间（单调时钟）
+
+    def record(self, requests: int = 1, new_trades: int = 0):
+        """
+        记录一次成功的轮询
+
+        Args:
+            requests: 本次轮询发出的列表请求数（含翻页）
+            new_trades: 本次发现的新分享数
+        """
+        now = time.monotonic()
+        self._sent.extend([now] * max(1, requests))
+        self.failures = 0
+        self.retry_after = None
+        if new_trades:
+            self.last_activity = time.time()
+
+    def record_error(self, error: Exception, requests: int = 1) -> bool:
+        """
+        记录一次失败的轮询
+
+        Args:
+            error: 轮询抛出的异常
+            requests: 本次轮询发出的列表请求数
+
+        Returns:
+            bool: 是否需要退避（429/5xx、超时或连接失败）
+        """
+        if isinstance(error, CircuitOpen):
+            # 请求未发出；熔断器自己按探测结果延长打开时间，到探测时间再轮询即可
+            self.failures = 0
+            self.retry_after = error.retry_after
+            return True
+        self._sent.extend([time.monotonic()] * max(1, requests))
+        if not is_overload_error(error):
+            self.failures = 0
+            self.retry_after = None
+            return False
+        self.failures += 1
+        self.retry_after = error_retry_after(error)
+        return True
+
+    def _base_interval(self, now: float) -> float:
+        """按时段和最近的活动计算不考虑预算和退避的间隔"""
+        if self.interval is not None:
+            return random.uniform(*self.interval)
+        if abs(now - self.window_start) <= self.boost or (
+            self.last_activity is not None and now - self.last_activity <= self.boost
+        ):
+            return self.min_interval
+        if not self.boost:
+            return self.idle_interval
+        if now < self.window_start:
+            # 时段开始之前：离加速阶段越远间隔越长
+            idle = self.window_start - self.boost - now
+        else:
+            # 加速结束（时段开始或最近一次发现新分享之后）起，每过一个加速时长间隔翻倍
+            idle = now - max(self.window_start, self.last_activity or 0) - self.boost
+        return min(max(self.min_interval * 2 ** (idle / self.boost), self.min_interval), self.idle_interval)
+
+    def _budget_delay(self) -> float:
+        """最近 60 秒的请求数达到预算时，需要等待到最早的一次请求移出窗口"""
+        if self.interval is not None:
+            return 0.0
+        now = time.monotonic()
+        while self._sent and self._sent[0] <= now - 60:
+            self._sent.popleft()
+        if len(self._sent) < self.budget_rpm:
+            return 0.0
+        return self._sent[len(self._sent) - int(self.budget_rpm)] + 60 - now
+
+    def next_delay(self) -> float:
+        """
+        Returns:
+            float: 距下一次轮询的等待时间（秒）
+        """
+        delay = self._base_interval(time.time())
+        if self.interval is None:
+            delay *= random.uniform(1 - JITTER, 1 + JITTER)
+        if self.failures:
+            backoff = min(self.min_interval * 2 ** self.failures, self.max_backoff)
+            delay = max(delay, backoff * random.uniform(0.5, 1.0))
+        if self.retry_after is not None:
+            delay = max(delay, self.retry_after)
+        delay = round(max(delay, self._budget_delay()), 2)
+
+        labels = {"account": self.account} if self.account else None
+        get_metrics().set_gauge("poll_interval", delay, labels)
+        return delay
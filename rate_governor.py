@@ -0,0 +1,319 @@
+"""
+请求限流 - 按端点、按账号的令牌桶，在所有客户端（可选跨进程）之间共享请求预算
+
+每个请求依次从三层令牌桶各取一个令牌，任一层不足时等待：
+    <端点>|<账号>   单个账号对单个端点（RATE_ACCOUNT_RPS）
+    <端点>          所有账号对单个端点（RATE_ENDPOINT_RPS）
+    *               所有账号、所有端点（RATE_GLOBAL_RPS）
+
+优先级：跟单（及登录）> 轮询 > 余额等其他请求。低优先级请求不能把桶取到预留线以下，
+每降一级多预留 RATE_PRIORITY_RESERVE × 桶容量，剩下的令牌留给跟单。
+桶容量和预留线都按当前（降速后）的速率计算，降速时预留需要的等待时间不会随之变长。
+
+收到 429 时，该端点的速率减半（最低 RATE_MIN_FACTOR），之后每个成功的响应恢复 RATE_RECOVERY，
+同一端点的所有客户端一起放慢，而不是各自退避后同时重试。
+Retry-After 的等待由收到 429 的请求自己负责（见 APIClient._request），这里不再清空桶或暂停发放令牌。
+
+桶状态默认保存在进程内；RATE_SHARED 开启（或多进程运行 fleet）时保存在
+DATA_PATH/rate-buckets.json，由文件锁保护，所有进程共享同一份预算。
+异步接口（aacquire_delay / aacquire / aobserve）在共享文件时把文件锁和读写交给线程，不阻塞事件循环。
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import config
+from metrics import get_metrics
+from models import dumps, loads
+from retry_policy import DeadlineExceeded
+from utils import fcntl
+
+# 请求优先级（数值越小越优先）
+FOLLOW = 0
+POLL = 1
+BACKGROUND = 2
+
+ENDPOINT_PRIORITIES = {
+    "/second/share/user/follow": FOLLOW,
+    # token 失效时跟单要等重新登录完成
+    "/user/login": FOLLOW,
+    "/second/share/user/list": POLL,
+}
+
+# 全局桶的键
+GLOBAL_KEY = "*"
+
+
+class RateLimited(DeadlineExceeded):
+    """在截止时间内没有等到令牌"""
+
+
+def priority_for(endpoint: str) -> int:
+    """
+    Args:
+        endpoint: API 端点路径
+
+    Returns:
+        int: 请求优先级（FOLLOW / POLL / BACKGROUND）
+    """
+    return ENDPOINT_PRIORITIES.get(endpoint, BACKGROUND)
+
+
+class MemoryStore:
+    """进程内的桶状态"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    @contextmanager
+    def transaction(self):
+        """持有锁读写桶状态"""
+        with self._lock:
+            yield self._state
+
+
+class FileStore:
+    """文件中的桶状态，由文件锁保护，多个进程共享"""
+
+    def __init__(self, path: str | Path = None):
+        """
+        Args:
+            path: 状态文件路径（可选，默认 DATA_PATH/rate-buckets.json）
+        """
+        self.path = Path(path or config.DATA_PATH / "rate-buckets.json")
+        self._lock = threading.Lock()
+        # 每次请求都要读写，文件保持打开，直接对它加锁
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    @contextmanager
+    def transaction(self):
+        """持有线程锁和文件锁读写桶状态（文件损坏时所有桶视为已满）"""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                body = os.pread(self._fd, os.fstat(self._fd).st_size, 0)
+                try:
+                    state = loads(body) if body else {}
+                except ValueError:
+                    state = {}
+                yield state
+                # 读写都在锁内，不需要原子替换
+                body = dumps(state)
+                os.pwrite(self._fd, body, 0)
+                os.ftruncate(self._fd, len(body))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        """关闭状态文件"""
+        os.close(self._fd)
+
+
+class RateGovernor:
+    """
+    请求限流器（线程安全）
+
+    桶状态为 [令牌数, 更新时间, 速率系数]，时间使用墙上时钟以便跨进程共享。
+    """
+
+    def __init__(
+        self,
+        store=None,
+        global_rps: float = None,
+        endpoint_rps: float = None,
+        account_rps: float = None,
+        burst_seconds: float = None,
+        reserve: float = None,
+    ):
+        """
+        Args:
+            store: 桶状态存储（可选，默认按 config.RATE_SHARED 选择 FileStore 或 MemoryStore）
+            global_rps: 所有请求每秒的令牌数（可选，默认 config.RATE_GLOBAL_RPS，0 表示不限）
+            endpoint_rps: 每个端点每秒的令牌数（可选，默认 config.RATE_ENDPOINT_RPS，0 表示不限）
+            account_rps: 每个账号每个端点每秒的令牌数（可选，默认 config.RATE_ACCOUNT_RPS，0 表示不限）
+            burst_seconds: 桶容量对应的秒数（可选，默认 config.RATE_BURST_SECONDS）
+            reserve: 每级优先级预留的桶容量比例（可选，默认 config.RATE_PRIORITY_RESERVE）
+        """
+        self.store = store or (FileStore() if config.RATE_SHARED else MemoryStore())
+        self.global_rps = config.RATE_GLOBAL_RPS if global_rps is None else global_rps
+        self.endpoint_rps = config.RATE_ENDPOINT_RPS if endpoint_rps is None else endpoint_rps
+        self.account_rps = config.RATE_ACCOUNT_RPS if account_rps is None else account_rps
+        self.burst_seconds = burst_seconds or config.RATE_BURST_SECONDS
+        self.reserve = config.RATE_PRIORITY_RESERVE if reserve is None else reserve
+        self._recovering = set()  # 速率系数小于 1 的桶，成功响应时才需要写回
+        self._throttled_at = None  # 最近一次收到 429 的单调时钟时间
+
+    def _limits(self, endpoint: str, account: str | None) -> list:
+        """请求需要经过的桶 [(键, 每秒令牌数)]"""
+        limits = []
+        if self.account_rps > 0:
+            limits.append((f"{endpoint}|{account or '-'}", self.account_rps))
+        if self.endpoint_rps > 0:
+            limits.append((endpoint, self.endpoint_rps))
+        if self.global_rps > 0:
+            limits.append((GLOBAL_KEY, self.global_rps))
+        return limits
+
+    def _burst(self, rate: float) -> float:
+        return max(1.0, rate * self.burst_seconds)
+
+    def acquire_delay(self, endpoint: str, account: str = None, priority: int = None) -> float:
+        """
+        尝试取一个令牌
+
+        Args:
+            endpoint: API 端点路径
+            account: 账号（可选）
+            priority: 优先级（可选，默认按端点）
+
+        Returns:
+            float: 0 表示已取得令牌；否则为需要等待的秒数（未取令牌）
+        """
+        limits = self._limits(endpoint, account)
+        if not limits:
+            return 0.0
+        priority = priority_for(endpoint) if priority is None else priority
+        now = time.time()
+        delay = 0.0
+        with self.store.transaction() as state:
+            buckets = []
+            for key, rate in limits:
+                tokens, updated, factor = state.get(key) or (self._burst(rate), now, 1.0)
+                effective = rate * factor
+                burst = self._burst(effective)
+                tokens = min(burst, tokens + max(0.0, now - updated) * effective)
+                # 低优先级请求需要在预留线之上才能取令牌（桶只够一个令牌时没有预留）
+                need = min(burst, 1 + min(self.reserve * priority, 0.9) * burst)
+                if tokens < need:
+                    delay = max(delay, (need - tokens) / effective)
+                buckets.append((key, tokens, factor))
+
+            for key, tokens, factor in buckets:
+                state[key] = [tokens if delay else tokens - 1, now, factor]
+                if not delay and factor < 1:
+                    self._recovering.add(key)
+        return delay
+
+    def acquire(self, endpoint: str, account: str = None, timeout: float = None) -> bool:
+        """
+        等待并取一个令牌
+
+        Args:
+            endpoint: API 端点路径
+            account: 账号（可选）
+            timeout: 最长等待时间（秒，可选，默认一直等待）
+
+        Returns:
+            bool: 是否取得令牌（等待时间会超过 timeout 时立即返回 False）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (delay := self.acquire_delay(endpoint, account)) > 0:
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                return False
+            time.sleep(delay)
+        return True
+
+    async def _run_store(self, func, *args):
+        """在事件循环中调用会访问桶状态的方法（文件存储时交给线程执行）"""
+        if isinstance(self.store, FileStore):
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def aacquire_delay(self, endpoint: str, account: str = None, priority: int = None) -> float:
+        """
+        异步版本的 acquire_delay
+
+        Returns:
+            float: 0 表示已取得令牌；否则为需要等待的秒数（未取令牌）
+        """
+        return await self._run_store(self.acquire_delay, endpoint, account, priority)
+
+    async def aacquire(self, endpoint: str, account: str = None, timeout: float = None) -> bool:
+        """
+        异步版本的 acquire
+
+        Returns:
+            bool: 是否取得令牌
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (delay := await self.aacquire_delay(endpoint, account)) > 0:
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                return False
+            await asyncio.sleep(delay)
+        return True
+
+    def observe(self, endpoint: str, account: str = None, status: int = None):
+        """
+        根据响应调整端点的速率：429 时减半速率，成功时逐步恢复
+
+        Args:
+            endpoint: API 端点路径
+            account: 账号（可选）
+            status: HTTP 状态码
+        """
+        keys = [key for key, _ in self._limits(endpoint, account) if key != GLOBAL_KEY]
+        throttled = status == 429
+        if throttled:
+            self._throttled_at = time.monotonic()
+        if not throttled:
+            keys = [key for key in keys if key in self._recovering]
+        if not keys:
+            return
+
+        factors = {}
+        with self.store.transaction() as state:
+            for key in keys:
+                entry = state.get(key)
+                if entry is None:
+                    continue
+                tokens, updated, factor = entry
+                if throttled:
+                    factor = max(config.RATE_MIN_FACTOR, factor / 2)
+                else:
+                    factor = min(1.0, factor + config.RATE_RECOVERY)
+                state[key] = [tokens, updated, factor]
+                factors[key] = factor
+
+        metrics = get_metrics()
+        for key, factor in factors.items():
+            if factor >= 1:
+                self._recovering.discard(key)
+            metrics.set_gauge("rate_factor", factor, {"bucket": key})
+
+    async def aobserve(self, endpoint: str, account: str = None, status: int = None):
+        """异步版本的 observe"""
+        await self._run_store(self.observe, endpoint, account, status)
+
+    def throttled_within(self, seconds: float) -> bool:
+        """
+        Args:
+            seconds: 时间窗口（秒）
+
+        Returns:
+            bool: 最近 seconds 秒内本进程是否收到过 429（保活等可选请求据此暂停）
+        """
+        return self._throttled_at is not None and time.monotonic() - self._throttled_at < seconds
+
+
+_global_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> RateGovernor:
+    """
+    获取全局限流器（进程内所有客户端共享）
+
+    Returns:
+        RateGovernor: 全局限流器
+    """
+    global _global_governor
+    with _governor_lock:
+        if _global_governor is None:
+            _global_governor = RateGovernor()
+        return _global_governor
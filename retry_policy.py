@@ -0,0 +1,163 @@
+"""
+按端点的重试策略 - 每次调用有总截止时间，重试次数和退避都受截止时间约束
+"""
+import random
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import config
+
+# 服务端明确拒绝处理的状态码：即使是非幂等请求也可以安全重试
+REJECTED_STATUSES = frozenset({429})
+
+
+class DeadlineExceeded(TimeoutError):
+    """调用在截止时间内未能完成"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    单个端点的重试策略
+
+    Attributes:
+        deadline: 一次调用（含全部重试和退避）的总截止时间（秒）
+        attempt_timeout: 单次尝试的超时时间（秒）
+        max_attempts: 最大尝试次数（含首次）
+        backoff: 首次退避时间（秒），之后按 2 倍增长并加入随机抖动
+        max_backoff: 单次退避上限（秒）
+        idempotent: 是否幂等；非幂等请求只在请求确定未被处理时重试（连接失败、429）
+        retry_statuses: 会触发重试的 HTTP 状态码
+        hedge: 是否启用对冲读：首次尝试超过单次发送的已观测 p95 仍未返回时，再并发发送一次
+        hedge_min_delay: 对冲前的最短等待时间（秒）
+        min_attempt_time: 剩余时间少于它时不再发起新的尝试（秒），避免发出注定超时的请求
+    """
+    deadline: float
+    attempt_timeout: float
+    max_attempts: int
+    backoff: float = 0.2
+    max_backoff: float = 2.0
+    idempotent: bool = True
+    retry_statuses: frozenset = field(default_factory=lambda: frozenset({429, 500, 502, 503, 504}))
+    hedge: bool = False
+    hedge_min_delay: float = 0.2
+    min_attempt_time: float = 0.3
+
+    def should_retry_status(self, status: int) -> bool:
+        """
+        判断状态码是否可以重试
+
+        Args:
+            status: HTTP 状态码
+
+        Returns:
+            bool: 是否重试
+        """
+        if status not in self.retry_statuses:
+            return False
+        return self.idempotent or status in REJECTED_STATUSES
+
+    def backoff_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """
+        计算第 attempt 次失败后的等待时间
+
+        Args:
+            attempt: 已完成的尝试次数（从 1 开始）
+            retry_after: 服务端 Retry-After 给出的等待时间（秒）
+
+        Returns:
+            float: 等待时间（秒）
+        """
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.backoff * (2 ** (attempt - 1)), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+
+
+# 交易列表：短超时快速重试，可对冲
+LIST_POLICY = RetryPolicy(
+    deadline=config.LIST_DEADLINE,
+    attempt_timeout=min(2, config.LIST_DEADLINE),
+    max_attempts=3,
+    backoff=0.1,
+    hedge=True,
+)
+
+# 跟单：非幂等，只在确定未被处理时重试一次，截止时间短于分享的有效窗口
+FOLLOW_POLICY = RetryPolicy(
+    deadline=config.FOLLOW_DEADLINE,
+    attempt_timeout=min(4, config.FOLLOW_DEADLINE),
+    max_attempts=2,
+    backoff=0.1,
+    idempotent=False,
+)
+
+# 登录：允许稍长的截止时间
+LOGIN_POLICY = RetryPolicy(deadline=15, attempt_timeout=6, max_attempts=3, backoff=0.5)
+
+# 其他接口（用户信息、余额等）
+DEFAULT_POLICY = RetryPolicy(deadline=10, attempt_timeout=5, max_attempts=3, backoff=0.3)
+
+DEFAULT_POLICIES = {
+    "/second/share/user/list": LIST_POLICY,
+    "/second/share/user/follow": FOLLOW_POLICY,
+    "/user/login": LOGIN_POLICY,
+}
+
+
+def policy_for(endpoint: str, policies: dict = None) -> RetryPolicy:
+    """
+    获取端点的重试策略
+
+    Args:
+        endpoint: API 端点路径
+        policies: 可选的自定义策略表，未命中时回退到默认策略表
+
+    Returns:
+        RetryPolicy: 重试策略
+    """
+    if policies and endpoint in policies:
+        return policies[endpoint]
+    if endpoint in DEFAULT_POLICIES:
+        return DEFAULT_POLICIES[endpoint]
+    return DEFAULT_POLICY
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    解析 Retry-After 响应头（秒数或 HTTP 日期）
+
+    Args:
+        value: 响应头的值
+
+    Returns:
+        float | None: 等待秒数，无法解析时返回 None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(tz=timezone.utc)).total_seconds())
+
+
+def hedge_delay(policy: RetryPolicy, observed_p95: float | None) -> float:
+    """
+    计算对冲请求前的等待时间：已观测 p95 与最短等待时间中的较大者
+
+    Args:
+        policy: 重试策略
+        observed_p95: 端点单次发送的 p95 延迟（秒，Metrics.attempt_p95；整次调用的延迟含重试和退避，不能使用）
+
+    Returns:
+        float: 等待时间（秒）
+    """
+    if observed_p95 is None:
+        return max(policy.hedge_min_delay, policy.attempt_timeout / 2)
+    return max(policy.hedge_min_delay, observed_p95)
@@ -0,0 +1,114 @@
+"""
+高精度定时 - 估算与服务端的时钟偏差，基于单调时钟等待，唤醒误差控制在毫秒级
+"""
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+
+import config
+
+# 最后阶段改为短睡眠 + 自旋的时长（秒）
+FINE_WINDOW = 0.05
+# 粗睡眠阶段每段的最长时长（秒），每段结束后按墙上时钟重新校准，感知 NTP 跳变
+COARSE_STEP = 30
+
+
+def estimate_clock_offset(session, url: str = None, samples: int = None) -> tuple[float, float] | None:
+    """
+    根据响应头 Date 估算服务端时钟偏差（服务端时间 - 本地时间）
+
+    Date 只有秒级精度：每次采样给出偏差的一个区间 (date - t1, date + 1 - t0]，
+    在一秒内错开多次采样并求交集，可以把误差收窄到约一个往返时间。
+
+    Args:
+        session: requests.Session 或 httpx.Client（通常是 client.session，顺便预热连接）
+        url: 采样地址（可选，默认 config.BASE_URL）
+        samples: 采样次数（可选，默认 config.CLOCK_SYNC_SAMPLES）
+
+    Returns:
+        tuple | None: (偏差秒数, 误差半宽秒数)，没有可用的 Date 响应头时返回 None
+    """
+    url = url or config.BASE_URL
+    samples = samples or config.CLOCK_SYNC_SAMPLES
+    low, high = float("-inf"), float("inf")
+    midpoints = []
+
+    for i in range(samples):
+        t0 = time.time()
+        try:
+            response = session.head(url, timeout=5)
+        except Exception:
+            continue
+        t1 = time.time()
+        response.close()
+
+        date = response.headers.get("Date")
+        if not date:
+            continue
+        try:
+            server_time = parsedate_to_datetime(date).timestamp()
+        except (TypeError, ValueError):
+            continue
+
+        low = max(low, server_time - t1)
+        high = min(high, server_time + 1 - t0)
+        midpoints.append(server_time + 0.5 - (t0 + t1) / 2)
+
+        # 错开采样在秒内的相位
+        if i < samples - 1:
+            time.sleep(1 / samples)
+
+    if not midpoints:
+        return None
+    if low <= high:
+        return (low + high) / 2, (high - low) / 2
+    # 区间不相交（多台服务器时钟不一致等），退回到中点的平均值
+    return sum(midpoints) / len(midpoints), 0.5
+
+
+def sleep_until(target: float, offset: float = 0.0) -> float:
+    """
+    等待到服务端时间 target
+
+    粗睡眠阶段分段进行，每段结束后按墙上时钟 + 偏差重新换算剩余时间（感知 NTP 跳变）；
+    最后 FINE_WINDOW 秒只使用单调时钟，短睡眠后自旋到目标时刻。
+
+    Args:
+        target: 目标时间（服务端时钟的 Unix 时间戳）
+        offset: 服务端时钟偏差（秒，服务端时间 - 本地时间）
+
+    Returns:
+        float: 按服务端时钟计算的唤醒误差（秒，正数表示晚于目标）
+    """
+    while True:
+        remaining = target - (time.time() + offset)
+        if remaining <= FINE_WINDOW:
+            break
+        time.sleep(min(remaining - FINE_WINDOW, COARSE_STEP))
+
+    deadline = time.monotonic() + max(0.0, target - (time.time() + offset))
+    while (remaining := deadline - time.monotonic()) > 0.002:
+        time.sleep(remaining / 2)
+    while time.monotonic() < deadline:
+        pass
+    return time.time() + offset - target
+
+
+async def async_sleep_until(target: float, offset: float = 0.0) -> float:
+    """
+    异步版本的 sleep_until：粗睡眠阶段使用 asyncio.sleep（可被取消），
+    只有最后 FINE_WINDOW 秒的短睡眠和自旋交给线程执行
+
+    Args:
+        target: 目标时间（服务端时钟的 Unix 时间戳）
+        offset: 服务端时钟偏差（秒，服务端时间 - 本地时间）
+
+    Returns:
+        float: 按服务端时钟计算的唤醒误差（秒，正数表示晚于目标）
+    """
+    while True:
+        remaining = target - (time.time() + offset)
+        if remaining <= FINE_WINDOW:
+            break
+        await asyncio.sleep(min(remaining - FINE_WINDOW, COARSE_STEP))
+    return await asyncio.to_thread(sleep_until, target, offset)
@@ -0,0 +1,180 @@
+"""
+已处理分享索引 - 记录每个账号尝试过和跟单成功的 shareId，避免跨轮询、跨重启的重复跟单
+
+索引保存在内存中，并以追加日志（JSONL）的形式写入 DATA_PATH：
+    {"id": "...", "state": "attempted", "ts": 1700000000.0}
+启动时重放日志恢复索引（进程在写入中途退出留下的半行会被忽略），
+超过 TTL 的记录被淘汰，日志中过期或被覆盖的行超过一半时压缩重写。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import config
+from utils import file_lock
+
+# 记录状态
+ATTEMPTED = "attempted"   # 已发出跟单请求，结果未知（进程中途退出时保留此状态，不再重试）
+SUCCEEDED = "succeeded"   # 跟单成功
+REJECTED = "rejected"     # 平台明确拒绝（已跟单、余额不足等），重试没有意义
+FAILED = "failed"         # 请求异常（超时、连接失败等），下次轮询可以重试
+
+# 日志行数少于此值时不压缩
+COMPACT_MIN_LINES = 256
+
+
+class SeenShares:
+    """单个账号的已处理分享索引（线程安全）"""
+
+    def __init__(self, email: str, path: str | Path = None, ttl: float = None):
+        """
+        Args:
+            email: 登录邮箱（每个账号一个日志文件）
+            path: 日志文件路径（可选，默认 DATA_PATH/seen-<邮箱摘要>.jsonl）
+            ttl: 记录保留时间（秒，默认 config.SEEN_TTL）
+        """
+        digest = hashlib.sha1(email.encode("utf-8")).hexdigest()[:12]
+        self.path = Path(path or config.DATA_PATH / f"seen-{digest}.jsonl")
+        self.ttl = ttl or config.SEEN_TTL
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[str, float]] = {}  # shareId -> (状态, 时间)
+        self._lines = 0
+        self._file = None
+        self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")  # 与中途退出留下的半行隔开
+
+    def _load(self):
+        """重放日志恢复索引"""
+        cutoff = time.time() - self.ttl
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    self._lines += 1
+                    try:
+                        record = json.loads(line)
+                        share_id, state, ts = record["id"], record["state"], record["ts"]
+                    except (ValueError, KeyError, TypeError):
+                        continue  # 中途退出留下的半行
+                    if ts >= cutoff:
+                        self._entries[share_id] = (state, ts)
+                    else:
+                        self._entries.pop(share_id, None)
+        except FileNotFoundError:
+            return
+        self._maybe_compact()
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _maybe_compact(self):
+        """淘汰过期记录；日志中无效行超过一半时压缩"""
+        cutoff = time.time() - self.ttl
+        for share_id in [k for k, (_, ts) in self._entries.items() if ts < cutoff]:
+            del self._entries[share_id]
+        if self._lines >= COMPACT_MIN_LINES and self._lines > 2 * len(self._entries):
+            self._compact()
+
+    def _compact(self):
+        """只保留有效记录，原子重写日志（调用方持有 self._lock 或处于初始化阶段）"""
+        tmp_path = self.path.with_suffix(".tmp")
+        with file_lock(self.path.with_suffix(".lock")):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for share_id, (state, ts) in self._entries.items():
+                    f.write(json.dumps({"id": share_id, "state": state, "ts": ts}) + "\n")
+            os.replace(tmp_path, self.path)
+        self._lines = len(self._entries)
+        if self._file is not None:
+            self._file.close()
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def _record(self, share_id: str, state: str):
+        now = time.time()
+        with self._lock:
+            self._entries[share_id] = (state, now)
+            # flush 后即使进程崩溃记录也已交给操作系统；不 fsync，避免拖慢跟单路径
+            self._file.write(json.dumps({"id": share_id, "state": state, "ts": now}) + "\n")
+            self._file.flush()
+            self._lines += 1
+            if self._lines % COMPACT_MIN_LINES == 0:
+                self._maybe_compact()
+
+    def state(self, share_id: str) -> str | None:
+        """
+        Args:
+            share_id: 交易分享 ID
+
+        Returns:
+            str | None: 记录状态，未记录或已过期时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(share_id)
+        if entry is None or entry[1] < time.time() - self.ttl:
+            return None
+        return entry[0]
+
+    def is_new(self, share_id: str) -> bool:
+        """
+        判断分享是否需要跟单（从未处理过，或上次请求异常）
+
+        Args:
+            share_id: 交易分享 ID
+
+        Returns:
+            bool: 是否需要跟单
+        """
+        return self.state(share_id) in (None, FAILED)
+
+    def filter_new(self, trades: list) -> list:
+        """
+        过滤出需要跟单的交易
+
+        Args:
+            trades: parse_trades 返回的交易列表
+
+        Returns:
+            list: 需要跟单的交易
+        """
+        return [trade for trade in trades if self.is_new(trade.id)]
+
+    def mark_attempted(self, share_id: str):
+        """在发出跟单请求前记录"""
+        self._record(share_id, ATTEMPTED)
+
+    def mark_result(self, share_id: str, success: bool, rejected: bool = True):
+        """
+        记录跟单结果
+
+        Args:
+            share_id: 交易分享 ID
+            success: 是否跟单成功
+            rejected: 失败时是否为平台明确拒绝（False 表示请求异常，允许重试）
+        """
+        if success:
+            self._record(share_id, SUCCEEDED)
+        else:
+            self._record(share_id, REJECTED if rejected else FAILED)
+
+    def succeeded_since(self, since: float) -> int:
+        """
+        统计某个时间之后跟单成功的数量（用于重启后恢复本时段的已跟单数）
+
+        Args:
+            since: 起始时间（Unix 时间戳）
+
+        Returns:
+            int: 成功数量
+        """
+        with self._lock:
+            return sum(1 for state, ts in self._entries.values() if state == SUCCEEDED and ts >= since)
+
+    def close(self):
+        """关闭日志文件"""
+        with self._lock:
+            self._file.close()
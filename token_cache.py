@@ -0,0 +1,271 @@
+"""
+Token 缓存 - 持久化登录 token，启动时复用，并在过期前后台刷新
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import config
+from utils import file_lock, read_json, write_json_atomic
+
+
+class TokenCache:
+    """
+    按邮箱保存 token 及其签发时间和观察到的有效期
+
+    文件内容示例：
+        {
+            "a@example.com": {"token": "...", "issued_at": 1700000000.0, "lifetime": 3600.0}
+        }
+
+    有效期初始为 config.TOKEN_LIFETIME，之后每次发现 token 失效时，
+    以「失效时间 - 签发时间」更新为实际观察到的有效期。
+    """
+
+    def __init__(self, path: str | Path = None, default_lifetime: float = None, refresh_margin: float = None):
+        """
+        Args:
+            path: 缓存文件路径（可选，默认 DATA_PATH/tokens.json）
+            default_lifetime: 未观察到有效期时使用的默认值（秒）
+            refresh_margin: 提前刷新的时间（秒）
+        """
+        self.path = Path(path or config.DATA_PATH / "tokens.json")
+        self.default_lifetime = default_lifetime or config.TOKEN_LIFETIME
+        self.refresh_margin = refresh_margin if refresh_margin is not None else config.TOKEN_REFRESH_MARGIN
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """线程锁 + 文件锁，保证多线程和多进程下读改写的原子性"""
+        with self._lock, file_lock(self.path.with_suffix(".lock")):
+            yield
+
+    def _read(self) -> dict:
+        return read_json(self.path, {})
+
+    def _write(self, data: dict):
+        write_json_atomic(self.path, data, mode=0o600)
+
+    def entry(self, email: str) -> dict | None:
+        """
+        获取账号的缓存记录
+
+        Args:
+            email: 登录邮箱
+
+        Returns:
+            dict | None: 包含 token, issued_at, lifetime 的记录
+        """
+        with self._locked():
+            return self._read().get(email)
+
+    def refresh_at(self, email: str) -> float | None:
+        """
+        计算应当刷新 token 的时间戳
+
+        Args:
+            email: 登录邮箱
+
+        Returns:
+            float | None: 刷新时间（Unix 时间戳），无缓存时返回 None
+        """
+        entry = self.entry(email)
+        if not entry:
+            return None
+        return entry["issued_at"] + entry.get("lifetime", self.default_lifetime) - self.refresh_margin
+
+    def get(self, email: str) -> str | None:
+        """
+        获取仍然有效（距离过期超过 refresh_margin）的 token
+
+        Args:
+            email: 登录邮箱
+
+        Returns:
+            str | None: 有效 token，不存在或即将过期时返回 None
+        """
+        entry = self.entry(email)
+        if not entry:
+            return None
+        if time.time() >= entry["issued_at"] + entry.get("lifetime", self.default_lifetime) - self.refresh_margin:
+            return None
+        return entry["token"]
+
+    def put(self, email: str, token: str):
+        """
+        保存新签发的 token，保留已观察到的有效期
+
+        Args:
+            email: 登录邮箱
+            token: 新 token
+        """
+        with self._locked():
+            data = self._read()
+            lifetime = data.get(email, {}).get("lifetime", self.default_lifetime)
+            data[email] = {"token": token, "issued_at": time.time(), "lifetime": lifetime}
+            self._write(data)
+
+    def mark_expired(self, email: str, token: str):
+        """
+        记录 token 已失效，并据此更新观察到的有效期
+
+        Args:
+            email: 登录邮箱
+            token: 已失效的 token
+        """
+        with self._locked():
+            data = self._read()
+            entry = data.get(email)
+            if not entry or entry.get("token") != token:
+                return
+            observed = time.time() - entry["issued_at"]
+            # 过短的观察值通常是服务端主动踢下线，不作为有效期
+            if observed > self.refresh_margin * 2:
+                entry["lifetime"] = observed
+            entry["issued_at"] = 0
+            self._write(data)
+
+
+_global_cache = None
+
+
+def get_cache() -> TokenCache:
+    """
+    获取全局 token 缓存实例
+
+    Returns:
+        TokenCache: 全局缓存实例
+    """
+    global _global_cache
+    if _global_cache is None:
+        _global_cache = TokenCache()
+    return _global_cache
+
+
+def login(email: str, password: str, client=None, cache: TokenCache = None, force: bool = False) -> str:
+    """
+    获取 token：优先复用缓存中的有效 token，否则调用登录接口并写入缓存
+
+    Args:
+        email: 登录邮箱
+        password: 登录密码
+        client: 可选的 API 客户端，默认使用全局客户端
+        cache: 可选的 token 缓存，默认使用全局缓存
+        force: 是否忽略缓存强制登录
+
+    Returns:
+        str: 可用的 token
+    """
+    from api_client import get_client
+    from user import post_login
+
+    cache = cache or get_cache()
+    client = client or get_client()
+
+    if not force and (token := cache.get(email)):
+        client.set_token(token)
+        return token
+
+    token = post_login(email=email, password=password, client=client)
+    cache.put(email, token)
+    return token
+
+
+class TokenRefresher:
+    """在 token 过期前于后台线程中重新登录，使轮询/跟单路径不再等待登录"""
+
+    def __init__(self, email: str, password: str, client=None, cache: TokenCache = None):
+        """
+        Args:
+            email: 登录邮箱
+            password: 登录密码
+            client: 可选的 API 客户端，默认使用全局客户端
+            cache: 可选的 token 缓存，默认使用全局缓存
+        """
+        from api_client import get_client
+
+        self.email = email
+        self.password = password
+        self.client = client or get_client()
+        self.cache = cache or get_cache()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"token-refresh-{email}", daemon=True)
+
+    def start(self) -> "TokenRefresher":
+        """启动后台刷新线程"""
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            refresh_at = self.cache.refresh_at(self.email)
+            delay = 0 if refresh_at is None else max(0.0, refresh_at - time.time())
+            # 最长 60 秒检查一次，以便感知其他地方写入的新 token
+            if self._stop.wait(min(delay, 60)):
+                return
+            if refresh_at is not None and time.time() < refresh_at:
+                continue
+            try:
+                token = login(self.email, self.password, client=self.client, cache=self.cache, force=True)
+                print(f"Token 已在后台刷新: {token[:10]}...")
+            except Exception as e:
+                print(f"后台刷新 token 失败: {e}")
+                self._stop.wait(30)
+
+
+async def async_login(email: str, password: str, client, cache: TokenCache = None, force: bool = False) -> str:
+    """
+    异步版本的 login
+
+    Args:
+        email: 登录邮箱
+        password: 登录密码
+        client: 异步 API 客户端
+        cache: 可选的 token 缓存，默认使用全局缓存
+        force: 是否忽略缓存强制登录
+
+    Returns:
+        str: 可用的 token
+    """
+    from async_trade import post_login
+
+    cache = cache or get_cache()
+
+    if not force and (token := await asyncio.to_thread(cache.get, email)):
+        client.set_token(token)
+        return token
+
+    token = await post_login(client, email, password)
+    await asyncio.to_thread(cache.put, email, token)
+    return token
+
+
+async def async_refresh_loop(email: str, password: str, client, cache: TokenCache = None):
+    """
+    异步后台刷新任务，语义同 TokenRefresher
+
+    Args:
+        email: 登录邮箱
+        password: 登录密码
+        client: 异步 API 客户端
+        cache: 可选的 token 缓存，默认使用全局缓存
+    """
+    cache = cache or get_cache()
+    while True:
+        refresh_at = await asyncio.to_thread(cache.refresh_at, email)
+        delay = 0 if refresh_at is None else max(0.0, refresh_at - time.time())
+        await asyncio.sleep(min(delay, 60))
+        if refresh_at is not None and time.time() < refresh_at:
+            continue
+        try:
+            token = await async_login(email, password, client, cache=cache, force=True)
+            print(f"Token 已在后台刷新: {token[:10]}...")
+        except Exception as e:
+            print(f"后台刷新 token 失败: {e}")
+            await asyncio.sleep(30)
@@ -2,26 +2,38 @@
 交易相关 API - 使用会话复用的客户端
 """
 import time
-import random
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
-from api_client import get_client
+import requests
+from api_client import APIClient, get_client
+from models import FollowResult, Trade, dumps
+from journal import get_journal
+from metrics import get_metrics, start_exporter, stop_exporter
+from notifier import get_notifier
 import config
 
 CHINA_TZ = ZoneInfo("Asia/Shanghai")
 
+FOLLOW_ENDPOINT = "/second/share/user/follow"
 
-def trade_list(is_finish: bool = False) -> dict:
+# 后台任务线程池（IP 地理位置查询等不影响跟单的慢操作）
+_background_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="background")
+
+
+def trade_list(is_finish: bool = False, client: APIClient = None) -> dict:
     """
     获取交易列表（使用客户端中的 token）
     
     Args:
         is_finish: 是否已完成，默认 False
+        client: 可选的 API 客户端，默认使用全局客户端
     
     Returns:
         dict: 交易列表数据
     """
-    client = get_client()
+    client = client or get_client()
     payload = {"isFinish": is_finish}
     result = client.post("/second/share/user/list", json_data=payload)
     return result
@@ -35,23 +47,21 @@ def parse_trades(trades_data: dict) -> list:
         trades_data: trade_list 返回的完整数据
     
     Returns:
-        list: 包含字典的列表，每个字典包含 id, title, createTime
+        list[Trade]: 交易列表（按 shareId 去重）
     """
     if not trades_data.get("resultCode"):
         raise Exception(f"获取交易列表失败: {trades_data.get('errCodeDes', 'Unknown error')}")
     
     data = trades_data["data"]
-    # 合并 showAll 和 page.content 两个列表
+    # 合并 showAll 和 page.content 两个列表（同一分享可能同时出现在两个列表中）
     content = data.get("showAll", []) + data.get("page", {}).get("content", [])
     
-    return [
-        {
-            "id": item.get("shareId"),
-            "title": item.get("title"),
-            "createTime": item.get("createTime"),
-        }
-        for item in content
-    ]
+    trades = {}
+    for item in content:
+        share_id = item.get("shareId")
+        if share_id not in trades:
+            trades[share_id] = Trade(share_id, item.get("title"), item.get("createTime") or 0)
+    return list(trades.values())
 
 
 def print_trades(trades: list):
@@ -64,37 +74,54 @@ def print_trades(trades: list):
     print("\n========== 交易列表 ==========")
     for i, trade in enumerate(trades, 1):
         # 将毫秒时间戳转换为可读时间
-        create_time = datetime.fromtimestamp(trade['createTime'] / 1000, tz=CHINA_TZ).strftime('%Y-%m-%d %H:%M:%S')
-        print(f"{i}. {trade['title']}")
-        print(f"   ID: {trade['id']}")
+        create_time = datetime.fromtimestamp(trade.create_time / 1000, tz=CHINA_TZ).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{i}. {trade.title}")
+        print(f"   ID: {trade.id}")
         print(f"   Create Time: {create_time}")
     print(f"共 {len(trades)} 条交易")
     print("==============================\n")
 
 
-def follow_trade(share_id: str, quantity: str) -> dict:
+@lru_cache(maxsize=64)
+def _follow_body_suffix(quantity: str) -> bytes:
+    return b',"quantity":' + dumps(quantity) + b'}'
+
+
+def follow_body(share_id: str, quantity: str) -> bytes:
     """
-    跟单（使用客户端中的 token）
+    预编码跟单请求体，等价于 {"shareId": share_id, "quantity": quantity}
+    
+    数量部分按数量缓存（发现分享之前就已确定），跟单时只需编码 shareId 并拼接。
     
     Args:
         share_id: 交易分享 ID
         quantity: 跟单数量
     
     Returns:
-        dict: 跟单结果
+        bytes: JSON 请求体
     """
-    client = get_client()
+    return b'{"shareId":' + dumps(share_id) + _follow_body_suffix(quantity)
+
+
+def follow_trade(share_id: str, quantity: str, client: APIClient = None) -> dict:
+    """
+    跟单（使用客户端中的 token）
     
-    payload = {
-        "shareId": share_id,
-        "quantity": quantity,
-    }
+    请求体预先编码，并通过客户端预构建的请求模板发送（见 APIClient.prepare）
     
-    result = client.post("/second/share/user/follow", json_data=payload)
-    return result
+    Args:
+        share_id: 交易分享 ID
+        quantity: 跟单数量
+        client: 可选的 API 客户端，默认使用全局客户端
+    
+    Returns:
+        dict: 跟单结果
+    """
+    client = client or get_client()
+    return client.post(FOLLOW_ENDPOINT, body=follow_body(share_id, quantity))
 
 
-def parse_follow_result(result: dict) -> dict:
+def parse_follow_result(result: dict) -> FollowResult:
     """
     解析跟单结果
     
@@ -102,17 +129,98 @@ def parse_follow_result(result: dict) -> dict:
         result: follow_trade 返回的完整数据
     
     Returns:
-        dict: 解析后的跟单结果
+        FollowResult: 解析后的跟单结果
     """
-    return {
-        "success": result.get("resultCode", False),
-        "message": result.get("errCodeDes", "Unknown"),
-    }
+    return FollowResult.from_response(result)
+
+
+def follow_trades_concurrently(
+    trades: list,
+    quantity: str | None,
+    limit: int,
+    max_in_flight: int = 5,
+    client: APIClient = None,
+    seen=None,
+    ledger=None,
+) -> list:
+    """
+    并发跟单一次轮询发现的所有交易（共享 APIClient 的连接池）
+
+    同时在途的请求数不超过 max_in_flight，且「已成功 + 在途」始终不超过 limit，
+    因此成功跟单数恰好不会超过 limit；失败的交易会让出名额给后续交易。
+
+    Args:
+        trades: parse_trades 返回的交易列表
+        quantity: 跟单数量（传入 ledger 时忽略）
+        limit: 本批次最多成功跟单的数量
+        max_in_flight: 最大并发请求数
+        client: 可选的 API 客户端，默认使用全局客户端
+        seen: 可选的 SeenShares，发出请求前和得到结果后分别记录
+        ledger: 可选的 BalanceLedger，每笔跟单前按仓位策略预留数量，得到结果后结算
+
+    Returns:
+        list: (trade, result, quantity) 元组列表，按完成顺序排列
+    """
+    journal = get_journal()
+    metrics = get_metrics()
+    account = getattr(client, "email", None)
+    pending = list(trades)
+    completed = []
+    succeeded = 0
+    in_flight = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        while True:
+            while pending and len(in_flight) < max_in_flight and succeeded + len(in_flight) < limit:
+                trade = pending.pop(0)
+                amount = quantity
+                if ledger is not None:
+                    reserved = ledger.reserve()
+                    if reserved <= 0:
+                        print(f"可用余额不足，跳过: {trade.title}")
+                        continue
+                    amount = str(reserved)
+                print(f"正在跟单: {trade.title}")
+                if seen is not None:
+                    seen.mark_attempted(trade.id)
+                future = pool.submit(follow_trade, trade.id, amount, client)
+                in_flight[future] = (trade, amount, time.perf_counter())
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                trade, amount, started = in_flight.pop(future)
+                rejected = True
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"resultCode": False, "errCodeDes": f"{type(e).__name__}: {e}"}
+                    rejected = False
+                parsed = parse_follow_result(result)
+                success = parsed.success
+                journal.record_follow(
+                    account, trade.id, amount, success, parsed.message, trade.create_time, time.perf_counter() - started
+                )
+                if success:
+                    succeeded += 1
+                    # 每笔在自己完成时记录，不包含同批次其他跟单的耗时
+                    metrics.observe_follow(trade.create_time)
+                if seen is not None:
+                    seen.mark_result(trade.id, success, rejected=rejected)
+                if ledger is not None:
+                    ledger.settle(float(amount), success)
+                completed.append((trade, result, amount))
+
+    return completed
 
 
 def send_feishu_webhook(webhook_url: str, content: str) -> bool:
     """
-    发送飞书 Webhook 消息（使用独立的请求，不影响主会话）
+    同步发送飞书 Webhook 消息（使用独立的请求，不影响主会话）
+
+    跟单流程中请使用 notifier.get_notifier().notify()，避免阻塞下一次跟单
     
     Args:
         webhook_url: 飞书机器人 Webhook 地址
@@ -121,8 +229,6 @@ def send_feishu_webhook(webhook_url: str, content: str) -> bool:
     Returns:
         bool: 是否发送成功
     """
-    import requests
-    
     payload = {
         "msg_type": "text",
         "content": {
@@ -189,7 +295,135 @@ def generate_followed_banner(
     return banner
 
 
-def watch_and_follow(email: str = None, password: str = None, max_trades: int = 1):
+def lookup_location(login_ip: str):
+    """
+    在后台线程查询登录 IP 的地理位置，立即返回 Future
+
+    Args:
+        login_ip: 登录 IP 地址
+
+    Returns:
+        Future | None: 结果为 cached_parse_ip_address 的返回值；未启用查询或 IP 为空时返回 None
+    """
+    from utils import cached_parse_ip_address
+
+    if not login_ip or not config.GEO_LOOKUP:
+        return None
+
+    future = _background_pool.submit(cached_parse_ip_address, login_ip)
+
+    def report(done_future):
+        if (ip_info := done_future.result()):
+            print(f"位置: {ip_info.get('organization') or '未知'} ({ip_info.get('country') or '未知'})")
+
+    future.add_done_callback(report)
+    return future
+
+
+def resolved_location(location_future) -> tuple:
+    """
+    读取已完成的地理位置查询结果，未完成或失败时返回 (None, None)，从不等待
+
+    Args:
+        location_future: lookup_location 返回的 Future
+
+    Returns:
+        tuple: (organization, country)
+    """
+    if location_future is None or not location_future.done() or location_future.exception():
+        return None, None
+    ip_info = location_future.result() or {}
+    return ip_info.get("organization"), ip_info.get("country")
+
+
+def bootstrap_retry_delay(error: Exception, delay: float) -> float:
+    """
+    Args:
+        error: 启动阶段请求抛出的异常
+        delay: 按指数退避计算的等待时间（秒）
+
+    Returns:
+        float: 实际等待时间（熔断打开或服务端给出 Retry-After 时至少等待到该时刻）
+    """
+    from poll_scheduler import error_retry_after
+
+    return max(delay, getattr(error, "retry_after", None) or error_retry_after(error) or 0.0)
+
+
+def retry_bootstrap_call(call, label: str, deadline: float):
+    """
+    在截止时间内重试启动阶段的请求，最终失败时返回 None 而不是结束本时段
+
+    Args:
+        call: 无参数的请求函数
+        label: 打印用的请求名称
+        deadline: 截止时间（time.monotonic()）
+
+    Returns:
+        call 的返回值，截止时间内未能成功时为 None
+    """
+    delay = 1.0
+    while True:
+        try:
+            return call()
+        except Exception as e:
+            wait_time = bootstrap_retry_delay(e, delay)
+            if time.monotonic() + wait_time >= deadline:
+                print(f"{label}失败，跳过: {e}")
+                return None
+            print(f"{label}失败: {e}，{wait_time:.1f} 秒后重试...")
+            time.sleep(wait_time)
+            delay = min(delay * 2, 5.0)
+
+
+def bootstrap_session(client: APIClient = None, deadline: float = None) -> dict:
+    """
+    登录后的启动阶段：并发获取用户信息和钱包余额，IP 地理位置在后台查询
+
+    启动耗时为各请求中最慢的一个，而不是它们之和；地理位置查询不参与等待。
+    请求失败时在 deadline 秒内重试，仍失败时对应字段为 None（余额由后台对账补齐）。
+
+    Args:
+        client: 可选的 API 客户端，默认使用全局客户端
+        deadline: 重试时长（秒，可选，默认 config.BOOTSTRAP_DEADLINE）
+
+    Returns:
+        dict: 包含 user_info, login_ip, balance（Balance 或 None）, location（Future 或 None）
+    """
+    from user import fetch_get_info, parse_user_info
+    from funds import funds_overview, parse_balance
+
+    deadline = time.monotonic() + (config.BOOTSTRAP_DEADLINE if deadline is None else deadline)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        info_future = pool.submit(retry_bootstrap_call, lambda: fetch_get_info(client), "获取用户信息", deadline)
+        funds_future = pool.submit(
+            retry_bootstrap_call, lambda: parse_balance(funds_overview(client)), "获取余额", deadline
+        )
+
+        user_info = info_future.result()
+        login_ip = parse_user_info(user_info).login_ip
+        # 拿到 IP 后立即开始查询位置，不等待余额
+        location = lookup_location(login_ip)
+
+        balance = funds_future.result()
+
+    return {
+        "user_info": user_info,
+        "login_ip": login_ip,
+        "balance": balance,
+        "location": location,
+    }
+
+
+def watch_and_follow(
+    email: str = None,
+    password: str = None,
+    max_trades: int = 1,
+    follow_concurrency: int = None,
+    client: APIClient = None,
+    poll_interval: tuple = None,
+    until: float = None,
+) -> int:
     """
     循环监听交易列表，发现交易后跟单，然后退出
 
@@ -197,10 +431,23 @@ def watch_and_follow(email: str = None, password: str = None, max_trades: int =
         email: 登录邮箱（可选，默认从环境变量读取）
         password: 登录密码（可选，默认从环境变量读取）
         max_trades: 最多跟单数量，默认 1
+        follow_concurrency: 同一次轮询内的最大并发跟单数（可选，默认从环境变量读取）
+        client: 可选的 API 客户端（多账号时每个账号一个），默认使用全局客户端
+        poll_interval: 可选的固定轮询间隔范围（秒），默认按请求预算自适应（见 poll_scheduler）
+        until: 可选的结束时间（Unix 时间戳），到达后即使未完成也退出监听
+
+    Returns:
+        int: 成功跟单的数量
+
+    Raises:
+        KeyboardInterrupt: 用户中断（清理完成后继续抛出，调用方据此结束）
     """
-    from user import post_login, fetch_get_info
-    from funds import funds_overview, parse_balance
-    from utils import parse_ip_address
+    from ledger import BalanceLedger, BalanceReconciler
+    from poll_scheduler import PollScheduler
+    from seen_index import FAILED, SeenShares
+    from token_cache import TokenRefresher, get_cache, login
+    from trade_feed import TradeFeed
+    from warmth import ConnectionWarmer
 
     # 如果未传入，使用配置中的默认值
     if email is None:
@@ -209,139 +456,242 @@ def watch_and_follow(email: str = None, password: str = None, max_trades: int =
         password = config.TRADE_PASSWORD
     if not email or not password:
         raise ValueError("请在 .env 文件中设置 TRADE_EMAIL 和 TRADE_PASSWORD")
+    if follow_concurrency is None:
+        follow_concurrency = config.FOLLOW_CONCURRENCY
+    # 未传入客户端时使用全局客户端，并在退出时关闭
+    owns_client = client is None
+    client = client or get_client()
     
-    # 初始登录获取 token
+    cache = get_cache()
+    # token 失效时由客户端自动重新登录并重放请求
+    client.set_credentials(email, password, cache=cache)
+
+    # 初始登录获取 token（缓存中的 token 仍有效时直接复用）
     print("正在登录...")
-    token = post_login(email=email, password=password)
+    token = login(email, password, client=client, cache=cache)
     print(f"登录成功: {token}")
-    
-    # 获取登录IP并解析
-    login_ip = None
-    organization = None
-    country = None
-
-    user_info = fetch_get_info()
-    if user_info and (info_data := user_info.get("data")):
-        login_ip = info_data.get("loginIp")
-        if login_ip:
-            ip_info = parse_ip_address(login_ip)
-            organization = ip_info.get("organization")
-            country = ip_info.get("country")
-
-    # 打印登录信息
-    print(f"登录IP: {login_ip or '未知'}")
-    print(f"位置: {organization or '未知'} ({country or '未知'})")
-
-    # 获取钱包余额并计算跟单数量
-    funds_data = funds_overview()
-    balance = parse_balance(funds_data)
-    available = balance["usdt_available"]
-    quantity = round(available * 0.01, 2)
-    
-    print(f"可用余额: {available:.2f} USDT")
-    print(f"跟单数量: {quantity:.2f} USDT")
-    print("开始监听交易，每 30~40 秒随机检查一次...")
-    print("按 Ctrl+C 可随时退出\n")
-    
+
+    # 后台线程都在 try 中启动，启动途中出错也会在 finally 中停止
     followed_count = 0
-    
-    def is_token_expired(data: dict) -> bool:
-        """检查 token 是否失效"""
-        return (
-            data.get("errCode") == 100007
-            and "Invalid credentials used or login expired" in data.get("errCodeDes", "")
-        )
-    
+    seen = warmer = exporter = refresher = reconciler = None
+    notifier = get_notifier()
     try:
+        # 并发获取用户信息和钱包余额，IP 位置在后台查询
+        session = bootstrap_session(client)
+        login_ip = session["login_ip"]
+        location = session["location"]
+
+        # 打印登录信息
+        print(f"登录IP: {login_ip or '未知'}")
+
+        # 本地余额账本：每笔跟单按仓位策略从账本取数量，成功后本地扣减，后台定期对账
+        ledger = BalanceLedger(session["balance"], account=email)
+
+        if ledger.known:
+            print(f"可用余额: {ledger.available:.2f} USDT")
+            print(f"跟单数量: {ledger.quantity():.2f} USDT（仓位策略: {ledger.strategy}）")
+        else:
+            print("可用余额: 未知（后台取得余额后开始跟单）")
+        # 为轮询和并发跟单预先建立连接，并在轮询间隙保活
+        warmer = ConnectionWarmer(client, connections=follow_concurrency + 1)
+        warmer.prewarm()
+        warmer.start()
+        # 预先构建跟单请求模板，发现分享后只需替换请求体
+        client.prepare("POST", FOLLOW_ENDPOINT)
+
+        # 轮询调度：时段开始前后和发现新分享后加速，空闲时放慢，429/5xx 时退避
+        window_start = until - config.SESSION_WINDOW * 60 if until is not None else None
+        scheduler = PollScheduler(window_start=window_start, account=email, interval=poll_interval)
+        if poll_interval:
+            print(f"开始监听交易，每 {poll_interval[0]}~{poll_interval[1]} 秒随机检查一次...")
+        else:
+            print(f"开始监听交易，每分钟最多 {scheduler.budget_rpm:g} 次请求，按时段和活动自适应间隔...")
+        print("按 Ctrl+C 可随时退出\n")
+
+        # 已处理分享索引：跳过之前轮询或上次运行中已处理的分享，并恢复本时段的已跟单数
+        seen = SeenShares(email)
+        followed_count = seen.succeeded_since(time.time() - config.SESSION_WINDOW * 60)
+        if followed_count:
+            print(f"本时段已跟单 {followed_count} 笔（从索引恢复）")
+        # 增量列表：列表未变化时跳过解析，变化时只返回新出现的交易
+        feed = TradeFeed(is_finish=False)
+        metrics = get_metrics()
+        journal = get_journal()
+        exporter = start_exporter()
+        refresher = TokenRefresher(email, password, client=client, cache=cache).start()
+        reconciler = BalanceReconciler(ledger, client=client).start()
+
         while followed_count < max_trades:
+            if until is not None and time.time() >= until:
+                print(f"\n已到本场结束时间，共跟单 {followed_count} 笔，退出监听")
+                break
+
             # 获取交易列表
-            trades = trade_list(is_finish=False)
-            
-            # 检查 token 是否失效
-            if is_token_expired(trades):
-                print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] Token 已失效，重新登录...")
-                token = post_login(email=email, password=password)
-                print(f"重新登录成功: {token[:10]}...")
-                continue  # 重新获取交易列表
-            
+            pages_read, items_read, unchanged = feed.pages_read, feed.items_read, feed.unchanged
+            polled_at = time.perf_counter()
             try:
-                parsed_trades = parse_trades(trades)
-            except Exception:
-                # parse_trades 抛出异常说明无数据或其他错误，跳过本次循环
-                wait_time = round(random.uniform(30, 40), 2)
-                print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] 暂无交易，{wait_time} 秒后继续...")
+                parsed_trades = feed.advance(feed.fetch(client))
+            except Exception as e:
+                journal.record_poll(
+                    email, time.perf_counter() - polled_at, feed.pages_read - pages_read, status=type(e).__name__
+                )
+                # 429/5xx、超时等按退避等待；parse_trades 抛出异常说明无数据，按正常间隔继续
+                backoff = scheduler.record_error(e, requests=feed.pages_read - pages_read)
+                wait_time = scheduler.next_delay()
+                if backoff:
+                    print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] 获取交易列表失败: {e}，{wait_time} 秒后重试...")
+                else:
+                    print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] 暂无交易，{wait_time} 秒后继续...")
                 time.sleep(wait_time)
                 continue
             
-            if parsed_trades:
-                print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] 发现 {len(parsed_trades)} 条交易！")
-                
-                # 跟单
-                for trade in parsed_trades:
-                    print(f"正在跟单: {trade['title']}")
-                    result = follow_trade(trade['id'], str(quantity))
-                    
-                    # 检查 token 是否失效
-                    if is_token_expired(result):
-                        print("Token 已失效，重新登录...")
-                        token = post_login(email=email, password=password)
-                        print(f"重新登录成功: {token[:10]}...")
-                        continue  # 重新跟单
-                    
-                    parsed = parse_follow_result(result)
-                    status = "成功" if parsed["success"] else "失败"
-                    print(f"跟单{status}: {parsed['message']}")
-                    
-                    if parsed["success"]:
-                        # 生成并打印跟单成功 Banner
-                        banner = generate_followed_banner(
-                            create_time=trade['createTime'],
-                            follow_time=datetime.now(tz=CHINA_TZ),
-                            share_id=trade['id'],
-                            available=available,
-                            quantity=quantity,
-                            login_ip=login_ip,
-                            organization=organization,
-                            country=country,
-                        )
-                        print(banner)
-                        
-                        # 发送飞书通知
-                        send_feishu_webhook(
-                            webhook_url=config.FEISHU_WEBHOOK_URL,
-                            content=banner,
-                        )
-                        
-                        followed_count += 1
-                        if followed_count >= max_trades:
-                            print(f"\n已完成 {max_trades} 笔跟单，退出监听")
-                            break
-                
-                if followed_count >= max_trades:
-                    break
-            else:
-                wait_time = round(random.uniform(30, 40), 2)
-                print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] 暂无交易，{wait_time} 秒后继续...")
+            try:
+                # 只处理从未跟单过（或上次请求异常）的分享
+                parsed_trades = seen.filter_new(parsed_trades)
+                scheduler.record(requests=feed.pages_read - pages_read, new_trades=len(parsed_trades))
+                journal.record_poll(
+                    email,
+                    time.perf_counter() - polled_at,
+                    feed.pages_read - pages_read,
+                    feed.items_read - items_read,
+                    len(parsed_trades),
+                    "unchanged" if feed.unchanged > unchanged else "ok",
+                )
+
+                if parsed_trades and not ledger.known:
+                    # 启动时未取得余额：交易留到下次轮询，等后台对账取得余额后再跟单
+                    print(f"发现 {len(parsed_trades)} 条交易，可用余额未知，下次轮询重试")
+                    for trade in parsed_trades:
+                        feed.retry(trade)
+                elif parsed_trades:
+                    print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] 发现 {len(parsed_trades)} 条交易！")
+                    for trade in parsed_trades:
+                        metrics.observe_detect(trade.create_time)
+
+                    # 并发跟单
+                    results = follow_trades_concurrently(
+                        parsed_trades,
+                        None,
+                        limit=max_trades - followed_count,
+                        max_in_flight=follow_concurrency,
+                        client=client,
+                        seen=seen,
+                        ledger=ledger,
+                    )
+
+                    for trade, result, amount in results:
+                        parsed = parse_follow_result(result)
+                        status = "成功" if parsed.success else "失败"
+                        print(f"跟单{status}: {parsed.message}")
+                        # 请求异常的交易已低于列表高水位，交给增量列表在下次轮询时重新返回
+                        if seen.state(trade.id) == FAILED:
+                            feed.retry(trade)
+
+                        if parsed.success:
+                            # 生成并打印跟单成功 Banner（位置查询未完成时显示未知）
+                            organization, country = resolved_location(location)
+                            banner = generate_followed_banner(
+                                create_time=trade.create_time,
+                                follow_time=datetime.now(tz=CHINA_TZ),
+                                share_id=trade.id,
+                                available=ledger.available,
+                                quantity=float(amount),
+                                login_ip=login_ip,
+                                organization=organization,
+                                country=country,
+                            )
+                            print(banner)
+
+                            # 飞书通知交给后台队列发送
+                            notifier.notify(banner)
+
+                            followed_count += 1
+
+                    if followed_count >= max_trades:
+                        print(f"\n已完成 {max_trades} 笔跟单，退出监听")
+                        break
+            except Exception as e:
+                # 单次处理出错（通知、Banner 等）不结束监听，下次轮询继续
+                print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] 处理交易时发生错误: {type(e).__name__}: {e}")
             
-            # 等待随机间隔
-            wait_time = round(random.uniform(30, 40), 2)
+            # 按调度等待下一次轮询
+            wait_time = scheduler.next_delay()
+            if not parsed_trades:
+                print(f"[{datetime.now(tz=CHINA_TZ).strftime('%H:%M:%S')}] 暂无交易，{wait_time} 秒后继续...")
             time.sleep(wait_time)
     
     except KeyboardInterrupt:
         print("\n用户中断，退出监听")
+        raise
     except Exception as e:
         print(f"\n发生错误: {e}")
     finally:
+        for component in (refresher, reconciler, warmer):
+            if component is not None:
+                component.stop()
+        if exporter is not None:
+            stop_exporter()
+        if seen is not None:
+            seen.close()
+        # 在截止时间内发送剩余通知
+        notifier.flush(timeout=config.NOTIFY_FLUSH_TIMEOUT)
         # 清理：关闭客户端会话
-        from api_client import get_client
-        get_client().close()
+        if owns_client:
+            client.close()
+
+    return followed_count
 
 
 if __name__ == "__main__":
+    import argparse
     from utils import wait_until_scheduled
+    from warmth import ConnectionWarmer, cache_dns
+
+    parser = argparse.ArgumentParser(description="自动跟单")
+    parser.add_argument("--daemon", action="store_true", help="常驻模式：依次服务 SESSION_TIMES 中的每个交易时段")
+    args = parser.parse_args()
+
+    if args.daemon:
+        from daemon import async_run_daemon, run_daemon
+
+        if config.ENGINE == "async":
+            import asyncio
 
-    # 等待到指定时间
-    wait_until_scheduled(config.SCHEDULE_TIME, config.ADVANCE_MINUTES)
+            try:
+                asyncio.run(async_run_daemon())
+            except KeyboardInterrupt:
+                print("\n用户中断，退出常驻模式")
+        else:
+            run_daemon()
+        raise SystemExit(0)
+
+    # 等待到指定时间（按服务端时钟），启动前预热 DNS 和连接
+    if config.ENGINE == "async":
+        wait_until_scheduled(
+            config.SCHEDULE_TIME,
+            config.ADVANCE_MINUTES,
+            before_wake=lambda: cache_dns(config.BASE_URL),
+        )
+    else:
+        warmer = ConnectionWarmer(get_client(), connections=config.FOLLOW_CONCURRENCY + 1)
+        wait_until_scheduled(
+            config.SCHEDULE_TIME,
+            config.ADVANCE_MINUTES,
+            session=get_client().session,
+            before_wake=warmer.prewarm,
+        )
 
     # 执行跟单
-    watch_and_follow()
+    if config.ENGINE == "async":
+        import asyncio
+        from async_trade import async_watch_and_follow
+
+        try:
+            asyncio.run(async_watch_and_follow())
+        except KeyboardInterrupt:
+            print("\n用户中断，退出监听")
+    else:
+        try:
+            watch_and_follow()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,431 @@
+"""
+增量交易列表 - 轮询时只解析并返回新出现的交易
+
+交易列表绝大多数时候没有变化：
+- 服务端返回 ETag/Last-Modified 时试探一次条件请求，确认支持（返回 304）后才持续发送；
+  服务端忽略或拒绝（412 等 4xx）条件请求时清除验证器、不再发送；
+- 始终对响应体求摘要，与上次相同时直接跳过，不解析 JSON；
+- 列表变化时只返回 createTime 超过高水位的交易。
+
+列表按创建时间倒序分页：新分享总是出现在第一页，第一页未变化即整个列表没有新分享；
+第一页变化时逐页向后读取，读到早于高水位的分享即停止，不会每次轮询都下载全部分页。
+"""
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from models import Trade, loads
+from trade import parse_trades
+
+LIST_ENDPOINT = "/second/share/user/list"
+
+
+def page_payload(is_finish: bool, page_num: int = 1, page_size: int = None) -> dict:
+    """
+    构建交易列表请求体
+
+    Args:
+        is_finish: 是否已完成
+        page_num: 页码（从 1 开始）
+        page_size: 每页条数（可选，默认 config.LIST_PAGE_SIZE，0 表示服务端默认）
+
+    Returns:
+        dict: 请求体（第一页与原有请求保持一致，不带页码）
+    """
+    payload = {"isFinish": is_finish}
+    if page_num > 1:
+        payload["pageNum"] = page_num
+    page_size = config.LIST_PAGE_SIZE if page_size is None else page_size
+    if page_size:
+        payload["pageSize"] = page_size
+    return payload
+
+
+def is_last_page(data: dict, page_num: int, max_pages: int) -> bool:
+    """
+    判断是否已经是最后一页（或已达到翻页上限）
+
+    Args:
+        data: 当前页的完整响应
+        page_num: 当前页码
+        max_pages: 最多读取的页数
+
+    Returns:
+        bool: 是否不再继续翻页（没有分页信息的响应视为只有一页）
+    """
+    page = (data.get("data") or {}).get("page") or {}
+    if page.get("last", True) or page_num >= max_pages:
+        return True
+    total_pages = page.get("totalPages")
+    return total_pages is not None and page_num >= total_pages
+
+
+def page_repeats(previous: dict, data: dict) -> bool:
+    """
+    判断翻页后是否仍是上一页（服务端不认 pageNum 时每页都返回第一页）
+
+    页码字段按 pageNum/pageSize（从 1 开始）发送，这是根据现有接口推测的；
+    Spring 分页通常是从 0 开始的 page/size，字段名不符时服务端会忽略页码。
+
+    Args:
+        previous: 上一页的完整响应
+        data: 新读取的一页
+
+    Returns:
+        bool: 页码没有前进，或分享与上一页完全相同时为 True（应停止翻页）
+    """
+    def page_of(response: dict) -> dict:
+        return (response.get("data") or {}).get("page") or {}
+
+    def share_ids(page: dict) -> list:
+        return [item.get("shareId") for item in page.get("content") or []]
+
+    prev_page, page = page_of(previous), page_of(data)
+    number, prev_number = page.get("number"), prev_page.get("number")
+    if number is not None and prev_number is not None and number <= prev_number:
+        return True
+    ids = share_ids(page)
+    return bool(ids) and ids == share_ids(prev_page)
+
+
+def reaches_before(data: dict, create_time: int) -> bool:
+    """
+    判断当前页是否已包含早于 create_time 的分享（之后的页只会更旧）
+
+    只看 page.content：showAll 中的置顶分享不按时间排序，不能作为停止依据。
+
+    Args:
+        data: 当前页的完整响应
+        create_time: 时间界限（毫秒时间戳）
+
+    Returns:
+        bool: 是否可以停止翻页
+    """
+    content = ((data.get("data") or {}).get("page") or {}).get("content") or []
+    return any((item.get("createTime") or 0) < create_time for item in content)
+
+
+def iter_pages(fetch_page, first_page: dict, max_pages: int = None, prefetch: bool = None):
+    """
+    惰性地逐页产出交易列表响应，调用方停止迭代后不再请求后续页；
+    读到与上一页相同的页（服务端忽略页码）时停止
+
+    Args:
+        fetch_page: 获取第 n 页完整响应的函数 fetch_page(page_num)
+        first_page: 已获取的第一页
+        max_pages: 最多读取的页数（可选，默认 config.LIST_MAX_PAGES）
+        prefetch: 产出当前页时是否在后台线程预取下一页（可选，默认 config.LIST_PREFETCH）
+
+    Yields:
+        dict: 每一页的完整响应
+    """
+    max_pages = max_pages or config.LIST_MAX_PAGES
+    prefetch = config.LIST_PREFETCH if prefetch is None else prefetch
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="list-prefetch") if prefetch else None
+    data, page_num = first_page, 1
+    try:
+        while True:
+            last = is_last_page(data, page_num, max_pages)
+            next_page = pool.submit(fetch_page, page_num + 1) if pool and not last else None
+            yield data
+            if last:
+                return
+            previous, data = data, next_page.result() if next_page else fetch_page(page_num + 1)
+            if page_repeats(previous, data):
+                print(f"交易列表第 {page_num + 1} 页与上一页相同（服务端可能忽略页码），停止翻页")
+                return
+            page_num += 1
+    finally:
+        if pool is not None:
+            # 提前停止时不等待预取中的请求
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def aiter_pages(fetch_page, first_page: dict, max_pages: int = None, prefetch: bool = None):
+    """
+    异步版本的 iter_pages，预取在单独的任务中进行
+
+    Args:
+        fetch_page: 获取第 n 页完整响应的协程函数 fetch_page(page_num)
+        first_page: 已获取的第一页
+        max_pages: 最多读取的页数（可选，默认 config.LIST_MAX_PAGES）
+        prefetch: 产出当前页时是否预取下一页（可选，默认 config.LIST_PREFETCH）
+
+    Yields:
+        dict: 每一页的完整响应
+    """
+    max_pages = max_pages or config.LIST_MAX_PAGES
+    prefetch = config.LIST_PREFETCH if prefetch is None else prefetch
+    data, page_num = first_page, 1
+    next_page = None
+    try:
+        while True:
+            last = is_last_page(data, page_num, max_pages)
+            next_page = asyncio.create_task(fetch_page(page_num + 1)) if prefetch and not last else None
+            yield data
+            if last:
+                return
+            previous, data = data, await (next_page or fetch_page(page_num + 1))
+            next_page = None
+            if page_repeats(previous, data):
+                print(f"交易列表第 {page_num + 1} 页与上一页相同（服务端可能忽略页码），停止翻页")
+                return
+            page_num += 1
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+
+
+class TradeFeed:
+    """
+    单个账号的增量交易列表（由一个轮询循环独占使用）
+
+    fetch()/afetch() 请求第一页，列表未变化时返回 None，否则返回惰性的分页迭代器；
+    advance()/aadvance() 消费分页并返回其中新出现的交易。
+    """
+
+    def __init__(self, is_finish: bool = False, max_pages: int = None, prefetch: bool = None):
+        """
+        Args:
+            is_finish: 是否已完成，默认 False
+            max_pages: 单次轮询最多读取的页数（可选，默认 config.LIST_MAX_PAGES）
+            prefetch: 是否并发预取下一页（可选，默认 config.LIST_PREFETCH）
+        """
+        self.is_finish = is_finish
+        self.max_pages = max_pages
+        self.prefetch = prefetch
+        self.etag = None
+        self.last_modified = None
+        self.conditional = None             # 服务端是否支持条件请求：None 未确认，True 返回过 304，False 忽略或拒绝
+        self.digest = None
+        self.high_water = 0                 # 已返回交易的最大 createTime（毫秒）
+        self._at_high_water = set()         # createTime 等于高水位的 shareId（同一毫秒的多条分享）
+        self._pending = None                # 本次响应的 (etag, last_modified, digest)，解析成功后才生效
+        self._retry = {}                    # 需要在下次轮询重新返回的交易
+        self.unchanged = 0                  # 列表未变化而跳过的次数
+        self.pages_read = 0                 # 累计读取的页数
+        self.items_read = 0                 # 累计解析的交易数
+
+    def request_headers(self) -> dict:
+        """
+        Returns:
+            dict: 条件请求头（服务端未提供验证器或不支持条件请求时为空）
+        """
+        headers = {}
+        if self.conditional is False:
+            return headers
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def decode(self, response) -> dict | None:
+        """
+        解码第一页的响应（作为客户端 post 的 decode 参数）
+
+        Args:
+            response: requests 或 httpx 的响应
+
+        Returns:
+            dict | None: 响应 JSON；列表未变化（304 或响应体摘要相同）时返回 None
+        """
+        if response.status_code == 304:
+            self.conditional = True
+            return None
+        body = response.content
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if digest == self.digest:
+            if self.conditional is None and self.request_headers():
+                # 带验证器的请求返回了相同的响应体：服务端忽略条件请求，之后只依赖摘要
+                self._drop_validators()
+            return None
+        self._pending = (response.headers.get("ETag"), response.headers.get("Last-Modified"), digest)
+        return loads(body)
+
+    def _drop_validators(self):
+        """停止发送条件请求（服务端忽略或拒绝验证器）"""
+        self.etag = self.last_modified = None
+        self.conditional = False
+
+    def _rejects_conditional(self, error: Exception, headers: dict) -> bool:
+        """
+        判断失败是否由条件请求引起（POST 带验证器可能返回 412，见 RFC 9110 §13.1.2）
+
+        Returns:
+            bool: 请求带了验证器且返回 4xx（429 除外）时为 True，此时已清除验证器
+        """
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        if not headers or status is None or not 400 <= status < 500 or status == 429:
+            return False
+        print(f"交易列表条件请求返回 HTTP {status}，不再发送条件请求头")
+        self._drop_validators()
+        return True
+
+    def fetch(self, client=None):
+        """
+        请求交易列表第一页（条件请求 + 摘要比对）
+
+        Args:
+            client: 可选的 API 客户端，默认使用全局客户端
+
+        Returns:
+            Iterator | None: 从第一页开始的惰性分页迭代器，交给 advance；列表未变化时为 None
+        """
+        from api_client import get_client
+
+        client = client or get_client()
+        headers = self.request_headers()
+        try:
+            first_page = client.post(
+                LIST_ENDPOINT, json_data=page_payload(self.is_finish), headers=headers, decode=self.decode
+            )
+        except Exception as e:
+            if not self._rejects_conditional(e, headers):
+                raise
+            first_page = client.post(LIST_ENDPOINT, json_data=page_payload(self.is_finish), decode=self.decode)
+        if first_page is None:
+            return None
+
+        def fetch_page(page_num: int) -> dict:
+            return client.post(LIST_ENDPOINT, json_data=page_payload(self.is_finish, page_num))
+
+        return iter_pages(fetch_page, first_page, self.max_pages, self.prefetch)
+
+    async def afetch(self, client):
+        """
+        异步版本的 fetch
+
+        Args:
+            client: 异步 API 客户端
+
+        Returns:
+            AsyncIterator | None: 惰性分页迭代器，交给 aadvance；列表未变化时为 None
+        """
+        headers = self.request_headers()
+        try:
+            first_page = await client.post(
+                LIST_ENDPOINT, json_data=page_payload(self.is_finish), headers=headers, decode=self.decode
+            )
+        except Exception as e:
+            if not self._rejects_conditional(e, headers):
+                raise
+            first_page = await client.post(LIST_ENDPOINT, json_data=page_payload(self.is_finish), decode=self.decode)
+        if first_page is None:
+            return None
+
+        async def fetch_page(page_num: int) -> dict:
+            return await client.post(LIST_ENDPOINT, json_data=page_payload(self.is_finish, page_num))
+
+        return aiter_pages(fetch_page, first_page, self.max_pages, self.prefetch)
+
+    def _collect(self, data: dict, found: dict) -> bool:
+        """
+        收集一页中高于高水位的交易
+
+        Returns:
+            bool: 是否可以停止翻页
+        """
+        self.pages_read += 1
+        trades = parse_trades(data)
+        self.items_read += len(trades)
+        for trade in trades:
+            create_time = trade.create_time
+            if create_time > self.high_water or (
+                create_time == self.high_water and trade.id not in self._at_high_water
+            ):
+                found.setdefault(trade.id, trade)
+        return bool(self.high_water) and reaches_before(data, self.high_water)
+
+    def _commit(self, found: dict) -> list:
+        """全部分页解析成功后更新验证器和高水位"""
+        # 失败响应（token 失效等）不会更新验证器，下一次轮询不会被跳过
+        etag, last_modified, self.digest = self._pending
+        if self.conditional is not False:
+            self.etag, self.last_modified = etag, last_modified
+
+        new_trades = list(found.values())
+        for trade in new_trades:
+            create_time = trade.create_time
+            if create_time > self.high_water:
+                self.high_water = create_time
+                self._at_high_water = set()
+            if create_time == self.high_water:
+                self._at_high_water.add(trade.id)
+
+        return [trade for trade in self._take_retry() if trade.id not in found] + new_trades
+
+    def advance(self, pages) -> list:
+        """
+        消费 fetch 返回的分页，读到早于高水位的分享后停止翻页
+
+        Args:
+            pages: fetch 的返回值
+
+        Returns:
+            list[Trade]: 新出现的交易
+
+        Raises:
+            Exception: 列表接口返回失败（同 parse_trades）
+        """
+        if pages is None:
+            self.unchanged += 1
+            return self._take_retry()
+
+        found = {}
+        try:
+            for data in pages:
+                if self._collect(data, found):
+                    break
+        finally:
+            pages.close()
+        return self._commit(found)
+
+    async def aadvance(self, pages) -> list:
+        """
+        异步版本的 advance
+
+        Args:
+            pages: afetch 的返回值
+
+        Returns:
+            list: 新出现的交易
+        """
+        if pages is None:
+            self.unchanged += 1
+            return self._take_retry()
+
+        found = {}
+        try:
+            async for data in pages:
+                if self._collect(data, found):
+                    break
+        finally:
+            await pages.aclose()
+        return self._commit(found)
+
+    def _take_retry(self) -> list:
+        retry, self._retry = list(self._retry.values()), {}
+        return retry
+
+    def retry(self, trade: Trade):
+        """
+        让交易在下次轮询时重新返回（跟单请求异常、需要重试时使用）
+
+        Args:
+            trade: 交易
+        """
+        self._retry[trade.id] = trade
+
+    def poll(self, client=None) -> list:
+        """
+        获取新出现的交易
+
+        Args:
+            client: 可选的 API 客户端，默认使用全局客户端
+
+        Returns:
+            list: 新出现的交易
+        """
+        return self.advance(self.fetch(client))
@@ -3,21 +3,23 @@
 """
 import json
 import config
-from api_client import get_client
+from api_client import APIClient, get_client
+from models import UserInfo
 
 
-def post_login(email: str, password: str) -> str:
+def post_login(email: str, password: str, client: APIClient = None) -> str:
     """
     登录 API
     
     Args:
         email: 登录邮箱
         password: 登录密码
+        client: 可选的 API 客户端，默认使用全局客户端
     
     Returns:
         str: 登录成功后的 token
     """
-    client = get_client()
+    client = client or get_client()
     
     payload = {
         "email": email,
@@ -37,32 +39,52 @@ def post_login(email: str, password: str) -> str:
     return token
 
 
-def fetch_get_info() -> dict:
+def fetch_get_info(client: APIClient = None) -> dict:
     """
     获取用户信息（使用客户端中的 token）
     
+    Args:
+        client: 可选的 API 客户端，默认使用全局客户端
+    
     Returns:
         dict: 用户信息数据
     """
-    client = get_client()
+    client = client or get_client()
     result = client.post("/user/get/info", json_data={})
     return result
 
 
-def fetch_certification_status() -> dict:
+def parse_user_info(user_info: dict | None) -> UserInfo:
+    """
+    解析用户信息（获取失败时各字段为 None，不影响跟单）
+    
+    Args:
+        user_info: fetch_get_info 返回的完整数据
+    
+    Returns:
+        UserInfo: 解析后的用户信息
+    """
+    return UserInfo.from_data((user_info or {}).get("data"))
+
+
+def fetch_certification_status(client: APIClient = None) -> dict:
     """
     获取认证状态（使用客户端中的 token）
     
+    Args:
+        client: 可选的 API 客户端，默认使用全局客户端
+    
     Returns:
         dict: 认证状态数据
     """
-    client = get_client()
+    client = client or get_client()
     result = client.post("/user/certification/status", json_data={})
     return result
 
 
 if __name__ == "__main__":
     from funds import funds_overview, parse_balance, print_balance
+    from journal import get_journal
 
     # 从配置读取登录信息
     if not config.TRADE_EMAIL or not config.TRADE_PASSWORD:
@@ -70,31 +92,29 @@ if __name__ == "__main__":
 
     token = post_login(email=config.TRADE_EMAIL, password=config.TRADE_PASSWORD)
     print(f"Token: {token}")
-    
-    # 获取并保存用户信息
+    # 原始响应追加到运行日志（data/journal.db 的 snapshots 表），不再覆盖 JSON 文件
+    journal = get_journal()
+
+    # 获取并记录用户信息
     info_return = fetch_get_info()
-    info_json = json.dumps(info_return, indent=2, ensure_ascii=False)
     print("User Info:")
-    print(info_json)
-    with open(config.DATA_PATH / "user_info.json", encoding="utf-8", mode="+w") as f:
-        f.write(info_json)
-    
-    # 获取并保存认证状态
+    print(json.dumps(info_return, indent=2, ensure_ascii=False))
+    journal.record_snapshot(config.TRADE_EMAIL, "user_info", info_return)
+
+    # 获取并记录认证状态
     certification_return = fetch_certification_status()
-    certification_json = json.dumps(certification_return, indent=2, ensure_ascii=False)
     print("Certification Status:")
-    print(certification_json)
-    with open(config.DATA_PATH / "certification.json", encoding="utf-8", mode="+w") as f:
-        f.write(certification_json)
-    
-    # 获取并保存钱包余额
+    print(json.dumps(certification_return, indent=2, ensure_ascii=False))
+    journal.record_snapshot(config.TRADE_EMAIL, "certification", certification_return)
+
+    # 获取并记录钱包余额
     funds_return = funds_overview()
-    funds_json = json.dumps(funds_return, indent=2, ensure_ascii=False)
     print("Funds Overview:")
-    print(funds_json)
-    with open(config.DATA_PATH / "funds_overview.json", encoding="utf-8", mode="+w") as f:
-        f.write(funds_json)
-    
+    print(json.dumps(funds_return, indent=2, ensure_ascii=False))
+    journal.record_snapshot(config.TRADE_EMAIL, "funds_overview", funds_return)
+
     # 解析并打印余额
     balance = parse_balance(funds_return)
+    journal.record_balance(config.TRADE_EMAIL, balance, source="overview")
     print_balance(balance)
+    journal.close()
@@ -1,28 +1,107 @@
 """
 工具函数模块
 """
+import asyncio
+import os
 import secrets
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from pathlib import Path
 from zoneinfo import ZoneInfo
 
 import json
 import httpx
 
+import config
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台仅使用线程锁
+    fcntl = None
+
 CHINA_TZ = ZoneInfo("Asia/Shanghai")
 
 
-def wait_until_scheduled(schedule_time: str, advance_minutes: int) -> None:
+@contextmanager
+def file_lock(path: Path):
+    """
+    基于 flock 的跨进程文件锁（非 POSIX 平台为空操作）
+
+    Args:
+        path: 锁文件路径
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_json(path: Path, default=None):
+    """
+    读取 JSON 文件，文件不存在或已损坏时返回默认值
+
+    Args:
+        path: 文件路径
+        default: 默认值
+
+    Returns:
+        解析后的数据或默认值
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def write_json_atomic(path: Path, data, mode: int = None):
+    """
+    原子写入 JSON 文件：先写临时文件再替换，避免进程中断留下半个文件
+
+    Args:
+        path: 文件路径
+        data: 要写入的数据
+        mode: 可选的文件权限（例如 0o600）
+    """
+    tmp_path = path.with_suffix(".tmp")
+    # 创建时就带上权限，写入 token 等内容之前其他用户无法读取临时文件
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666 if mode is None else mode)
+    if mode is not None:
+        # 残留的旧临时文件不会按 O_CREAT 的权限重建
+        os.fchmod(fd, mode)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def wait_until_scheduled(schedule_time: str, advance_minutes: int, session=None, before_wake=None) -> None:
     """
     等待到指定时间前 X 分钟
 
+    按服务端时钟计时（根据响应头 Date 估算偏差），基于单调时钟等待，并打印唤醒误差。
+
     Args:
         schedule_time: 目标时间，格式 "HH:MM"
         advance_minutes: 提前启动的分钟数
+        session: 用于估算时钟偏差的会话（可选，默认临时创建一个）
+        before_wake: 可选的回调，在目标时间前 config.WARMUP_LEAD 秒调用（例如预热连接）
     """
+    from scheduler import estimate_clock_offset
+
     target_hour, target_minute = map(int, schedule_time.split(':'))
 
-    now = datetime.now(tz=CHINA_TZ)
+    offset = 0.0
+    if config.CLOCK_SYNC:
+        offset = _clock_offset(session, estimate_clock_offset)
+
+    now = datetime.fromtimestamp(time.time() + offset, tz=CHINA_TZ)
     target = now.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
     target = target - timedelta(minutes=advance_minutes)
 
@@ -32,18 +111,116 @@ def wait_until_scheduled(schedule_time: str, advance_minutes: int) -> None:
         print(f"目标时间 {schedule_time} (提前{advance_minutes}分钟) 已过，立即开始执行...")
         return
 
-    # 添加1~10秒的随机抖动，更像人类行为
-    jitter = secrets.SystemRandom().uniform(1, 10)
-    target = target + timedelta(seconds=jitter)
+    wait_until(target, session=session, before_wake=before_wake, offset=offset)
+
+
+def wait_until(target: datetime, session=None, before_wake=None, offset: float = None) -> None:
+    """
+    等待到指定时刻（加上随机抖动），目标已过时立即返回
+
+    Args:
+        target: 目标时刻（带时区）
+        session: 用于估算时钟偏差的会话（可选，默认临时创建一个）
+        before_wake: 可选的回调，在目标时间前 config.WARMUP_LEAD 秒调用（例如预热连接）
+        offset: 已估算的服务端时钟偏差（秒，可选，默认按 config.CLOCK_SYNC 估算）
+    """
+    from scheduler import estimate_clock_offset, sleep_until
+
+    if offset is None:
+        offset = _clock_offset(session, estimate_clock_offset) if config.CLOCK_SYNC else 0.0
+
+    plan = _plan_wake(target, offset)
+    if plan is None:
+        return
+    target_ts, wait_seconds = plan
+    if before_wake is not None and wait_seconds > config.WARMUP_LEAD:
+        sleep_until(target_ts - config.WARMUP_LEAD, offset)
+        # 长时间等待后重新估算一次偏差，再执行预热
+        if config.CLOCK_SYNC:
+            offset = _clock_offset(session, estimate_clock_offset)
+        before_wake()
+    elif before_wake is not None:
+        before_wake()
+
+    error = sleep_until(target_ts, offset)
+    print(f"开始执行 watch_and_follow...（唤醒误差 {error * 1000:+.1f}ms）")
+
+
+async def async_wait_until(target: datetime, before_wake=None, offset: float = None) -> None:
+    """
+    异步版本的 wait_until：长时间等待都在事件循环中进行，可随时取消（Ctrl+C、停止常驻进程）
+
+    Args:
+        target: 目标时刻（带时区）
+        before_wake: 可选的协程函数，在目标时间前 config.WARMUP_LEAD 秒在事件循环中等待执行
+        offset: 已估算的服务端时钟偏差（秒，可选，默认按 config.CLOCK_SYNC 估算）
+    """
+    from scheduler import async_sleep_until, estimate_clock_offset
+
+    async def clock_offset() -> float:
+        return await asyncio.to_thread(_clock_offset, None, estimate_clock_offset) if config.CLOCK_SYNC else 0.0
+
+    if offset is None:
+        offset = await clock_offset()
+
+    plan = _plan_wake(target, offset)
+    if plan is None:
+        return
+    target_ts, wait_seconds = plan
+    if before_wake is not None and wait_seconds > config.WARMUP_LEAD:
+        await async_sleep_until(target_ts - config.WARMUP_LEAD, offset)
+        # 长时间等待后重新估算一次偏差，再执行预热
+        offset = await clock_offset()
+        await before_wake()
+    elif before_wake is not None:
+        await before_wake()
+
+    error = await async_sleep_until(target_ts, offset)
+    print(f"开始执行 watch_and_follow...（唤醒误差 {error * 1000:+.1f}ms）")
+
+
+def _plan_wake(target: datetime, offset: float) -> tuple | None:
+    """
+    在目标时刻上加随机抖动并打印等待计划
+
+    Returns:
+        tuple | None: (目标 Unix 时间戳, 等待秒数)，目标已过时为 None
+    """
+    now = datetime.fromtimestamp(time.time() + offset, tz=CHINA_TZ)
+    if now >= target:
+        return None
+
+    # 添加随机抖动，更像人类行为（SCHEDULE_JITTER=0 时准点启动）
+    if config.SCHEDULE_JITTER > 0:
+        jitter = secrets.SystemRandom().uniform(min(1, config.SCHEDULE_JITTER), config.SCHEDULE_JITTER)
+        target = target + timedelta(seconds=jitter)
 
     wait_seconds = (target - now).total_seconds()
 
     print(f"当前时间: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"计划启动时间: {target.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"计划启动时间: {target.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
     print(f"等待 {wait_seconds / 60:.2f} 分钟后开始...")
+    return target.timestamp(), wait_seconds
+
+
+def _clock_offset(session, estimate) -> float:
+    """估算服务端时钟偏差，失败时返回 0"""
+    from api_client import create_session
+
+    owned = session is None
+    session = session or create_session()
+    try:
+        result = estimate(session)
+    finally:
+        if owned:
+            session.close()
+    if result is None:
+        print("无法获取服务端时间，使用本地时钟")
+        return 0.0
+    offset, error = result
+    print(f"服务端时钟偏差: {offset * 1000:+.0f}ms（±{error * 1000:.0f}ms）")
+    return offset
 
-    time.sleep(wait_seconds)
-    print("开始执行 watch_and_follow...")
 
 def parse_ip_address(
         ip: str,
@@ -112,6 +289,118 @@ def parse_ip_address(
 
     return None
 
+class GeoCache:
+    """
+    IP 地理位置的磁盘缓存
+
+    - 按 IP 缓存 parse_ip_address 的结果，有效期为 ttl 秒
+    - 查询失败也会缓存（negative_ttl 秒），避免对失败的服务反复请求
+    - 超过 max_entries 时淘汰最久未使用的记录（LRU）
+    - 命中只更新内存中的使用时间，随下一次 put 一并写入，读缓存不写文件
+
+    文件内容示例：
+        {
+            "1.2.3.4": {"result": {...}, "fetched_at": 1700000000.0, "used_at": 1700000100.0}
+        }
+    """
+
+    def __init__(
+        self,
+        path: str | Path = None,
+        ttl: float = None,
+        negative_ttl: float = None,
+        max_entries: int = None,
+    ):
+        """
+        Args:
+            path: 缓存文件路径（可选，默认 DATA_PATH/geoip_cache.json）
+            ttl: 成功结果的有效期（秒）
+            negative_ttl: 失败结果的有效期（秒）
+            max_entries: 最多缓存的 IP 数量
+        """
+        self.path = Path(path or config.DATA_PATH / "geoip_cache.json")
+        self.ttl = ttl if ttl is not None else config.GEO_CACHE_TTL
+        self.negative_ttl = negative_ttl if negative_ttl is not None else config.GEO_CACHE_NEGATIVE_TTL
+        self.max_entries = max_entries or config.GEO_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+        self._used = {}  # IP -> 尚未写入文件的使用时间
+
+    def _is_fresh(self, entry: dict, now: float) -> bool:
+        ttl = self.ttl if entry.get("result") is not None else self.negative_ttl
+        return now - entry.get("fetched_at", 0) < ttl
+
+    def get(self, ip: str) -> tuple:
+        """
+        查询缓存
+
+        Args:
+            ip: IP 地址
+
+        Returns:
+            tuple: (是否命中, 结果)，命中失败记录时结果为 None
+        """
+        now = time.time()
+        # 文件总是整体原子替换，读取不需要文件锁
+        entry = read_json(self.path, {}).get(ip)
+        if not entry or not self._is_fresh(entry, now):
+            return False, None
+        with self._lock:
+            self._used[ip] = now
+        return True, entry.get("result")
+
+    def put(self, ip: str, result: dict | None):
+        """
+        写入缓存并按 LRU 淘汰多余记录，同时清理已过期的记录
+
+        Args:
+            ip: IP 地址
+            result: 查询结果，失败时为 None
+        """
+        now = time.time()
+        with self._lock, file_lock(self.path.with_suffix(".lock")):
+            data = read_json(self.path, {})
+            # 合并命中时记录在内存中的使用时间
+            for used_ip, used_at in self._used.items():
+                if used_ip in data:
+                    data[used_ip]["used_at"] = max(data[used_ip].get("used_at", 0), used_at)
+            self._used.clear()
+            data[ip] = {"result": result, "fetched_at": now, "used_at": now}
+            data = {k: v for k, v in data.items() if self._is_fresh(v, now)}
+            if len(data) > self.max_entries:
+                by_recency = sorted(data.items(), key=lambda item: item[1].get("used_at", 0), reverse=True)
+                data = dict(by_recency[:self.max_entries])
+            write_json_atomic(self.path, data)
+
+
+_geo_cache = None
+
+
+def cached_parse_ip_address(ip: str, timeout: int = 10) -> dict | None:
+    """
+    带磁盘缓存的 parse_ip_address，同一 IP 在有效期内不再请求外部服务
+
+    Args:
+        ip: 要查询的 IP 地址
+        timeout: 请求超时时间（秒），默认 10 秒
+
+    Returns:
+        同 parse_ip_address
+    """
+    global _geo_cache
+    if not ip:
+        return None
+    if _geo_cache is None:
+        _geo_cache = GeoCache()
+
+    hit, result = _geo_cache.get(ip)
+    if hit:
+        return result
+
+    result = parse_ip_address(ip, timeout=timeout)
+    _geo_cache.put(ip, result)
+    return result
+
+
 if __name__ == "__main__":
     # 示例：查询 IP 地址地理位置
     result = parse_ip_address("2406:da18:1d9a:c37c:e94f:9129:1753:9283")
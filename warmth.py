@@ -0,0 +1,383 @@
+"""
+连接预热 - 在交易窗口前解析并缓存 DNS、建立连接池中的连接，轮询间隙用轻量探测保持连接
+
+首次轮询和每次跟单都能复用已完成 TCP/TLS 握手的连接；连接复用率写入指标。
+
+保活探测只在连接池空闲满一个间隔时发送（有真实请求时连接本来就是热的），
+轮询/跟单端点熔断或近期收到 429 时跳过，保活端点自身经熔断器检查后再从限流器取后台优先级的令牌；
+同一连接池（fleet 中多个账号共享的会话）只有一个保活线程。
+"""
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import config
+from circuit_breaker import CLOSED, CircuitOpen, get_breaker
+from metrics import get_metrics
+from rate_governor import BACKGROUND, RateLimited, get_governor
+
+# 保活探测的端点（HEAD BASE_URL），用于限流和熔断
+KEEPALIVE_ENDPOINT = "/"
+# 这些端点熔断时平台不正常，不发送保活探测（其他端点可能已不再调用，熔断器不会再转为半开）
+TRAFFIC_ENDPOINTS = ("/second/share/user/list", "/second/share/user/follow")
+
+_original_getaddrinfo = socket.getaddrinfo
+_dns_cache = {}      # getaddrinfo 参数 -> (过期时间, 结果)
+_dns_hosts = set()   # 启用缓存的主机名
+_dns_lock = threading.Lock()
+
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    """带 TTL 的 getaddrinfo，只缓存已注册的主机；解析失败时返回过期的旧结果"""
+    if host not in _dns_hosts:
+        return _original_getaddrinfo(host, port, *args, **kwargs)
+
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        entry = _dns_cache.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    try:
+        result = _original_getaddrinfo(host, port, *args, **kwargs)
+    except socket.gaierror:
+        if entry is not None:
+            return entry[1]
+        raise
+    with _dns_lock:
+        _dns_cache[key] = (now + config.DNS_CACHE_TTL, result)
+    return result
+
+
+def cache_dns(url: str) -> list:
+    """
+    为 URL 的主机启用 DNS 缓存并立即解析一次
+
+    Args:
+        url: 目标地址（例如 config.BASE_URL）
+
+    Returns:
+        list: 解析出的 IP 地址
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    with _dns_lock:
+        _dns_hosts.add(host)
+        socket.getaddrinfo = _cached_getaddrinfo
+    infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    return sorted({info[4][0] for info in infos})
+
+
+_last_active = {}    # id(会话) -> 最近一次发出请求（含保活探测）的单调时钟时间
+_active_lock = threading.Lock()
+
+
+def mark_active(session):
+    """
+    记录会话发出了一次请求（客户端每次发送前调用）
+
+    Args:
+        session: 客户端的会话（连接池）
+    """
+    _last_active[id(session)] = time.monotonic()
+
+
+def keepalive_budget(session, interval: float, connections: int) -> int:
+    """
+    计算本轮可以发送的保活探测数，返回值大于 0 时同时把本轮记为会话的一次活动
+
+    - interval 秒内会话发出过请求（包括其他账号的保活探测）时跳过：连接仍然是热的
+    - 轮询/跟单端点的熔断器未关闭，或 interval 秒内收到过 429 时跳过
+    - 保活端点的熔断器经 before_call 检查（打开期满后转为半开，只探测一次），打开时跳过且不取令牌
+    - 每个探测从限流器取一个后台优先级的令牌，取不到时少探测
+
+    Args:
+        session: 客户端的会话（连接池）
+        interval: 保活间隔（秒）
+        connections: 需要保持的连接数
+
+    Returns:
+        int: 探测数（0 表示跳过本轮）
+    """
+    governor = get_governor()
+    with _active_lock:
+        if time.monotonic() - _last_active.get(id(session), 0.0) < interval:
+            return 0
+        if governor.throttled_within(interval) or any(
+            get_breaker(endpoint).state != CLOSED for endpoint in TRAFFIC_ENDPOINTS
+        ):
+            return 0
+        breaker = get_breaker(KEEPALIVE_ENDPOINT)
+        try:
+            breaker.before_call()
+        except CircuitOpen:
+            return 0
+        if breaker.state != CLOSED:
+            connections = 1
+        count = 0
+        while count < connections and governor.acquire_delay(KEEPALIVE_ENDPOINT, priority=BACKGROUND) == 0:
+            count += 1
+        if count:
+            mark_active(session)
+        else:
+            # 释放半开状态的探测名额
+            breaker.record(0.0, RateLimited(f"{KEEPALIVE_ENDPOINT} 未取得请求配额"))
+        return count
+
+
+def pool_stats(session) -> dict | None:
+    """
+    统计 requests 会话连接池的新建连接数和请求数
+
+    Args:
+        session: requests.Session（其他会话类型返回 None）
+
+    Returns:
+        dict | None: connections_opened, requests, reuse_rate
+    """
+    adapters = getattr(session, "adapters", None)
+    if adapters is None:
+        return None
+
+    opened = requests_sent = 0
+    for adapter in {id(a): a for a in adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            requests_sent += pool.num_requests
+    return {
+        "connections_opened": opened,
+        "requests": requests_sent,
+        "reuse_rate": 1 - opened / requests_sent if requests_sent else 0.0,
+    }
+
+
+class ConnectionWarmer:
+    """
+    同步客户端的连接预热与保活
+
+    - prewarm(): 解析并缓存 DNS，并发发送 HEAD 探测，使连接池中有 connections 条已握手的连接
+    - start()/stop(): 后台线程每 interval 秒检查一次，连接池空闲满 interval 秒时探测（见 keepalive_budget），
+      防止空闲连接被服务端或中间设备断开；共享同一会话的多个 ConnectionWarmer 只运行一个线程
+    """
+
+    def __init__(self, client, connections: int = 2, interval: float = None):
+        """
+        Args:
+            client: API 客户端（APIClient 或 HTTP2APIClient）
+            connections: 需要保持的连接数（通常为跟单并发数 + 1 条轮询连接）
+            interval: 保活探测间隔（秒，默认 config.KEEPALIVE_INTERVAL，0 表示不保活）
+        """
+        self.client = client
+        self.connections = max(1, connections)
+        self.interval = config.KEEPALIVE_INTERVAL if interval is None else interval
+        self.probes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="connection-warmer", daemon=True)
+        self._users = 0          # 共享本线程的 ConnectionWarmer 数（只在运行线程的实例上使用）
+        self._runner = None      # 实际运行保活线程的 ConnectionWarmer
+
+    def _open(self, breaker=None):
+        """发送一次 HEAD 探测并暂不释放连接（流式响应会占住连接直到 close），传入 breaker 时记录结果"""
+        session = self.client.session
+        started = time.perf_counter()
+        try:
+            if hasattr(session, "build_request"):  # httpx.Client
+                response = session.send(session.build_request("HEAD", config.BASE_URL, timeout=5), stream=True)
+            else:
+                response = session.head(config.BASE_URL, timeout=5, stream=True)
+        except Exception as e:
+            if breaker is not None:
+                breaker.record(time.perf_counter() - started, e)
+            return None
+        if breaker is not None:
+            breaker.record(time.perf_counter() - started, status=response.status_code)
+        return response
+
+    def probe(self, count: int = None, breaker=None) -> int:
+        """
+        同时发送 count 个 HEAD 探测：全部返回后才释放，保证每个探测占用（或新建）一条不同的连接
+
+        Args:
+            count: 探测数（默认 self.connections）
+            breaker: 可选的熔断器，记录每个探测的结果
+
+        Returns:
+            int: 成功的探测数
+        """
+        count = count or self.connections
+        self.probes += count
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix="warm-probe") as pool:
+            responses = [r for r in pool.map(lambda _: self._open(breaker), range(count)) if r is not None]
+        for response in responses:
+            response.close()
+        return len(responses)
+
+    def prewarm(self) -> float:
+        """
+        解析并缓存 DNS，建立 connections 条连接
+
+        Returns:
+            float: 预热耗时（秒）
+        """
+        started = time.perf_counter()
+        try:
+            addresses = cache_dns(config.BASE_URL)
+        except OSError as e:
+            print(f"DNS 预解析失败: {e}")
+            addresses = []
+        warmed = self.probe()
+        elapsed = time.perf_counter() - started
+        print(f"连接预热完成: {warmed}/{self.connections} 条连接, DNS {', '.join(addresses) or '未知'}, 耗时 {elapsed * 1000:.0f}ms")
+        return elapsed
+
+    def keepalive(self) -> int:
+        """
+        执行一轮保活：连接池空闲满 interval 秒且平台正常时，经限流器和熔断器探测
+
+        Returns:
+            int: 成功的探测数（跳过本轮时为 0）
+        """
+        count = keepalive_budget(self.client.session, self.interval, self.connections)
+        if not count:
+            return 0
+        return self.probe(count, breaker=get_breaker(KEEPALIVE_ENDPOINT))
+
+    def start(self) -> "ConnectionWarmer":
+        """启动后台保活线程（同一会话已有保活线程时共用，保持的连接数取较大者）"""
+        if self.interval <= 0:
+            return self
+        key = id(self.client.session)
+        with _warmers_lock:
+            runner = _warmers.get(key)
+            if runner is None:
+                runner = _warmers[key] = self
+                self._thread.start()
+            runner._users += 1
+            runner.connections = max(runner.connections, self.connections)
+            self._runner = runner
+        return self
+
+    def stop(self) -> dict | None:
+        """
+        停止保活（最后一个共享者停止时线程才退出），打印并记录连接复用率
+
+        Returns:
+            dict | None: pool_stats 的结果
+        """
+        runner, self._runner = self._runner, None
+        if runner is not None:
+            with _warmers_lock:
+                runner._users -= 1
+                if runner._users == 0:
+                    runner._stop.set()
+                    del _warmers[id(self.client.session)]
+        stats = self.stats()
+        if stats is not None:
+            print(
+                f"连接复用: 新建 {stats['connections_opened']} 条连接 / {stats['requests']} 次请求"
+                f"（含 {self.probes} 次探测）, 复用率 {stats['reuse_rate']:.1%}"
+            )
+        return stats
+
+    def stats(self) -> dict | None:
+        """
+        获取连接复用统计并写入指标
+
+        Returns:
+            dict | None: connections_opened, requests, reuse_rate（会话不支持统计时为 None）
+        """
+        stats = pool_stats(self.client.session)
+        if stats is not None:
+            metrics = get_metrics()
+            metrics.set_gauge("connections_opened", stats["connections_opened"])
+            metrics.set_gauge("pool_requests", stats["requests"])
+            metrics.set_gauge("connection_reuse_ratio", stats["reuse_rate"])
+        return stats
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.keepalive()
+
+
+# id(会话) -> 运行保活线程的 ConnectionWarmer
+_warmers = {}
+_warmers_lock = threading.Lock()
+
+
+async def _async_probe(client, count: int, breaker=None) -> int:
+    """同时发送 count 个 HEAD 探测，全部返回后才释放连接，传入 breaker 时记录结果"""
+    session = client.session
+
+    async def open_one():
+        started = time.perf_counter()
+        try:
+            response = await session.send(session.build_request("HEAD", config.BASE_URL, timeout=5), stream=True)
+        except Exception as e:
+            if breaker is not None:
+                breaker.record(time.perf_counter() - started, e)
+            return None
+        if breaker is not None:
+            breaker.record(time.perf_counter() - started, status=response.status_code)
+        return response
+
+    responses = [r for r in await asyncio.gather(*(open_one() for _ in range(count))) if r is not None]
+    for response in responses:
+        await response.aclose()
+    return len(responses)
+
+
+async def async_prewarm(client, connections: int = 2) -> float:
+    """
+    异步版本的 ConnectionWarmer.prewarm
+
+    Args:
+        client: 异步 API 客户端
+        connections: 需要建立的连接数
+
+    Returns:
+        float: 预热耗时（秒）
+    """
+    started = time.perf_counter()
+    try:
+        addresses = await asyncio.to_thread(cache_dns, config.BASE_URL)
+    except OSError as e:
+        print(f"DNS 预解析失败: {e}")
+        addresses = []
+    connections = max(1, connections)
+    warmed = await _async_probe(client, connections)
+    elapsed = time.perf_counter() - started
+    print(f"连接预热完成: {warmed}/{connections} 条连接, DNS {', '.join(addresses) or '未知'}, 耗时 {elapsed * 1000:.0f}ms")
+    return elapsed
+
+
+async def async_keepalive_loop(client, connections: int = 2, interval: float = None):
+    """
+    异步保活任务，语义同 ConnectionWarmer 的后台线程
+
+    共享同一会话的多个任务按 keepalive_budget 认领每一轮，同一间隔内只有一个任务探测。
+
+    Args:
+        client: 异步 API 客户端
+        connections: 需要保持的连接数
+        interval: 保活探测间隔（秒，默认 config.KEEPALIVE_INTERVAL，0 表示不保活）
+    """
+    interval = config.KEEPALIVE_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return
+    breaker = get_breaker(KEEPALIVE_ENDPOINT)
+    while True:
+        await asyncio.sleep(interval)
+        # 限流器共享状态文件时会加文件锁，放到线程中执行
+        count = await asyncio.to_thread(keepalive_budget, client.session, interval, max(1, connections))
+        if not count:
+            continue
+        await _async_probe(client, count, breaker=breaker)